@@ -2,9 +2,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import abc
+from itertools import islice, takewhile
 
 from pyhocon import ConfigTree
-from typing import Any
+from typing import Any, Iterable, Iterator, List
 
 from databuilder import Scoped
 
@@ -25,5 +26,39 @@ class Extractor(Scoped):
         """
         return None
 
+    def extract_batch(self, max_records: int) -> List[Any]:
+        """
+        Extracts up to max_records records at once. By default it calls extract, and extractors can override it to
+        extract records in bulk. See DefaultTask.
+        :param max_records:
+        :return: Records in the order of extract, or empty list if no more to extract
+        """
+        records: List[Any] = []
+        while len(records) < max_records:
+            record = self.extract()
+            if not record:
+                break
+            records.append(record)
+        return records
+
     def get_scope(self) -> str:
         return 'extractor'
+
+
+def iter_records(records: Iterable[Any]) -> Iterator[Any]:
+    """
+    :param records:
+    :return: Iterator of records that ends for good at the first falsy record, as extract ends at it. Records after it
+    are never read.
+    """
+    return takewhile(bool, records)
+
+
+def take_batch(records: Iterator[Any], max_records: int) -> List[Any]:
+    """
+    Implements extract_batch for an extractor that extracts from an iterator.
+    :param records: Iterator of records created by iter_records, so that extraction ends at a falsy record
+    :param max_records:
+    :return: Up to max_records records
+    """
+    return list(islice(records, max_records))
@@ -2,11 +2,11 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import importlib
-from typing import Iterable, Any
+from typing import Iterable, Any, List
 
 from pyhocon import ConfigTree
 
-from databuilder.extractor.base_extractor import Extractor
+from databuilder.extractor.base_extractor import Extractor, iter_records, take_batch
 
 
 class GenericExtractor(Extractor):
@@ -35,6 +35,7 @@ class GenericExtractor(Extractor):
             self._iter = iter(results)
         else:
             self._iter = iter(self.values)
+        self._batch_iter = iter_records(self._iter)
 
     def extract(self) -> Any:
         """
@@ -48,5 +49,8 @@ class GenericExtractor(Extractor):
         except StopIteration:
             return None
 
+    def extract_batch(self, max_records: int) -> List[Any]:
+        return take_batch(self._batch_iter, max_records)
+
     def get_scope(self) -> str:
         return 'extractor.generic'
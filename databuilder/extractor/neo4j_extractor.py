@@ -3,13 +3,14 @@
 
 import importlib
 import logging
-from typing import Any, Iterator, Union
+from typing import Any, Iterator, Tuple, Union
 
 from pyhocon import ConfigTree, ConfigFactory
 from neo4j import GraphDatabase
 import neo4j
 
 from databuilder.extractor.base_extractor import Extractor
+from databuilder.utils import resource_pool
 
 LOGGER = logging.getLogger(__name__)
 
@@ -41,7 +42,8 @@ class Neo4jExtractor(Extractor):
         self.conf = conf.with_fallback(Neo4jExtractor.DEFAULT_CONFIG)
         self.graph_url = conf.get_string(Neo4jExtractor.GRAPH_URL_CONFIG_KEY)
         self.cypher_query = conf.get_string(Neo4jExtractor.CYPHER_QUERY_CONFIG_KEY)
-        self.driver = self._get_driver()
+        # Shared with other components connecting to the same Neo4j if they run together, e.g: in JobGraph
+        self.driver, self._is_shared_driver = resource_pool.get_or_create(self._get_driver_key(), self._get_driver)
 
         self._extract_iter: Union[None, Iterator] = None
 
@@ -55,11 +57,24 @@ class Neo4jExtractor(Extractor):
         """
         close connection to neo4j cluster
         """
+        if getattr(self, '_is_shared_driver', False):
+            return
         try:
             self.driver.close()
         except Exception as e:
             LOGGER.error("Exception encountered while closing the graph driver", e)
 
+    def _get_driver_key(self) -> Tuple[Any, ...]:
+        """
+        :return: What the driver connects with, in the same form as Neo4jCsvPublisher so that they share a driver
+        """
+        trust = neo4j.TRUST_SYSTEM_CA_SIGNED_CERTIFICATES if self.conf.get_bool(Neo4jExtractor.NEO4J_VALIDATE_SSL) \
+            else neo4j.TRUST_ALL_CERTIFICATES
+        return ('neo4j', self.graph_url, self.conf.get_int(Neo4jExtractor.NEO4J_MAX_CONN_LIFE_TIME_SEC),
+                (self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_USER),
+                 self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_PW)),
+                self.conf.get_bool(Neo4jExtractor.NEO4J_ENCRYPTED), trust)
+
     def _get_driver(self) -> Any:
         """
         Create a Neo4j connection to Database
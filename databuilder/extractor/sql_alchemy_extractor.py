@@ -5,9 +5,9 @@ import importlib
 from sqlalchemy import create_engine
 
 from pyhocon import ConfigTree
-from typing import Any
+from typing import Any, List
 
-from databuilder.extractor.base_extractor import Extractor
+from databuilder.extractor.base_extractor import Extractor, iter_records, take_batch
 
 
 class SQLAlchemyExtractor(Extractor):
@@ -57,6 +57,7 @@ class SQLAlchemyExtractor(Extractor):
         else:
             results = self.results
         self.iter = iter(results)
+        self._batch_iter = iter_records(self.iter)
 
     def extract(self) -> Any:
         """
@@ -70,5 +71,8 @@ class SQLAlchemyExtractor(Extractor):
         except Exception as e:
             raise e
 
+    def extract_batch(self, max_records: int) -> List[Any]:
+        return take_batch(self._batch_iter, max_records)
+
     def get_scope(self) -> str:
         return 'extractor.sqlalchemy'
@@ -6,11 +6,11 @@ import abc
 from pyhocon import ConfigTree
 
 from databuilder import Scoped
-from databuilder.utils.closer import Closer
+from databuilder.utils.closer import ThreadLocalCloser
 
 
 class Job(Scoped):
-    closer = Closer()
+    closer = ThreadLocalCloser()
 
     """
     A Databuilder job that represents single work unit.
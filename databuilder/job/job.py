@@ -11,6 +11,7 @@ from databuilder.job.base_job import Job
 from databuilder.publisher.base_publisher import NoopPublisher
 from databuilder.publisher.base_publisher import Publisher
 from databuilder.task.base_task import Task
+from databuilder.utils import dedupe_cache, stage_metrics
 
 LOGGER = logging.getLogger(__name__)
 
@@ -19,6 +20,11 @@ class DefaultJob(Job):
     # Config keys
     IS_STATSD_ENABLED = 'is_statsd_enabled'
     JOB_IDENTIFIER = 'identifier'
+    # Maximum number of nodes and relations remembered by the job's de-dupe cache. See dedupe_cache.DedupeCache
+    DEDUPE_CACHE_SIZE = 'dedupe_cache_size'
+    # Path of a JSON file to write the time, records and bytes of each stage into at the end of the job. See
+    # stage_metrics.JobMetrics
+    METRICS_JSON_PATH = 'metrics_json_path'
 
     """
     Default job that expects a task, and optional publisher
@@ -26,6 +32,10 @@ class DefaultJob(Job):
     amundsen.databuilder.job.[identifier] .
     Note that job.identifier is part of metrics prefix and choose unique & readable identifier for the job.
 
+    Time spent in extract, transform, load and publish, with records and bytes of each, is logged at the end of the
+    job, sent through statsd if enabled (e.g: amundsen.databuilder.job.[identifier].extract.total), and written into
+    metrics_json_path if configured.
+
     To configure statsd itself, use environment variable: https://statsd.readthedocs.io/en/v3.2.1/configure.html
     """
 
@@ -60,6 +70,11 @@ class DefaultJob(Job):
         logging.info('Launching a job')
         #  Using nested try finally to make sure task get closed as soon as possible as well as to guarantee all the
         #  closeable get closed.
+        # Models consult the cache of the job, which starts empty so that nothing is suppressed from previous job
+        cache = dedupe_cache.reset_dedupe_cache(
+            self.scoped_conf.get_int(DefaultJob.DEDUPE_CACHE_SIZE, dedupe_cache.DEFAULT_MAX_SIZE))
+        # Task and publisher record the time spent in each stage into the metrics of the job
+        metrics = stage_metrics.reset_job_metrics()
         try:
             is_success = True
             self._init()
@@ -70,7 +85,7 @@ class DefaultJob(Job):
 
             self.publisher.init(Scoped.get_scoped_conf(self.conf, self.publisher.get_scope()))
             Job.closer.register(self.publisher.close)
-            self.publisher.publish()
+            metrics.stage(stage_metrics.PUBLISH).call(self.publisher.publish)
 
         except Exception as e:
             is_success = False
@@ -84,7 +99,15 @@ class DefaultJob(Job):
                 else:
                     LOGGER.info('Publishing job metrics for failure')
                     self.statsd.incr('fail')
-
+                self.statsd.gauge('dedupe_hit_rate', cache.hit_rate)
+                metrics.send_statsd(self.statsd)
+
+            cache.log_stats()
+            metrics.log_summary()
+            metrics_json_path = self.scoped_conf.get_string(DefaultJob.METRICS_JSON_PATH, None)
+            if metrics_json_path:
+                metrics.write_json(metrics_json_path)
+            dedupe_cache.reset_dedupe_cache()
             Job.closer.close()
 
         logging.info('Job completed')
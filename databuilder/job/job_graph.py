@@ -0,0 +1,119 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from pyhocon import ConfigTree
+from typing import Dict, Iterable, List, Set
+
+from databuilder.job.base_job import Job
+from databuilder.utils import resource_pool
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JobGraph(Job):
+    """
+    Runs jobs in the order of their dependencies, where jobs that do not depend on each other run concurrently on up
+    to max_concurrency threads, e.g: several extract jobs into Neo4j, then an Elasticsearch index job that depends on
+    all of them.
+
+    While it runs, components connecting to the same Neo4j share a driver instead of each opening their own (see
+    resource_pool), which is closed once all jobs are finished. Each job still has its own de-dupe cache and closes
+    what it registered to Job.closer, as those are per thread.
+
+    If a job fails, jobs not started yet are skipped, the running ones are waited for, and the first failure is
+    raised.
+    """
+
+    def __init__(self, max_concurrency: int = 4) -> None:
+        """
+        :param max_concurrency: Maximum number of jobs running at the same time
+        """
+        self._max_concurrency = max_concurrency
+        self._jobs: Dict[str, Job] = {}
+        self._dependencies: Dict[str, Set[str]] = {}
+
+    def init(self, conf: ConfigTree) -> None:
+        pass
+
+    def add_job(self,
+                name: str,
+                job: Job,
+                depends_on: Iterable[str] = ()) -> 'JobGraph':
+        """
+        :param name: Unique name of the job in the graph
+        :param job:
+        :param depends_on: Names of jobs that should finish successfully before the job starts
+        :return: The graph, so that calls can be chained
+        """
+        if name in self._jobs:
+            raise ValueError('Job {} is already added'.format(name))
+        self._jobs[name] = job
+        self._dependencies[name] = set(depends_on)
+        return self
+
+    def launch(self) -> None:
+        """
+        Launches jobs as their dependencies are finished.
+        :return:
+        """
+        self._validate()
+        LOGGER.info('Launching {} jobs with concurrency {}'.format(len(self._jobs), self._max_concurrency))
+
+        remaining = {name: set(dependencies) for name, dependencies in self._dependencies.items()}
+        finished: Set[str] = set()
+        errors: List[Exception] = []
+        with resource_pool.shared_resources(), \
+                ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix='job_graph') as executor:
+            running: Dict[Future, str] = {}
+            while True:
+                if not errors:
+                    for name in [name for name, dependencies in remaining.items() if dependencies <= finished]:
+                        del remaining[name]
+                        running[executor.submit(self._launch_job, name)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        finished.add(name)
+                    except Exception as e:
+                        LOGGER.exception('Job {} failed'.format(name))
+                        errors.append(e)
+
+        if errors:
+            if remaining:
+                LOGGER.info('Skipped jobs {}'.format(sorted(remaining)))
+            raise errors[0]
+        LOGGER.info('Launched all {} jobs'.format(len(self._jobs)))
+
+    def _launch_job(self, name: str) -> None:
+        LOGGER.info('Launching job {}'.format(name))
+        start = time.time()
+        self._jobs[name].launch()
+        LOGGER.info('Job {} finished in {:.1f} seconds'.format(name, time.time() - start))
+
+    def _validate(self) -> None:
+        """
+        Checks that dependencies are added, and that there's no cycle.
+        :return:
+        """
+        for name, dependencies in self._dependencies.items():
+            unknown = dependencies - set(self._jobs)
+            if unknown:
+                raise ValueError('Job {} depends on jobs not added: {}'.format(name, sorted(unknown)))
+
+        # Removes jobs whose dependencies are all removed, until none is left unless there's a cycle
+        remaining = {name: set(dependencies) for name, dependencies in self._dependencies.items()}
+        while remaining:
+            ready = [name for name, dependencies in remaining.items() if not dependencies & set(remaining)]
+            if not ready:
+                raise ValueError('Jobs have a dependency cycle: {}'.format(sorted(remaining)))
+            for name in ready:
+                del remaining[name]
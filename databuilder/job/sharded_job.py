@@ -0,0 +1,182 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from databuilder import Scoped
+from databuilder.job.base_job import Job
+from databuilder.job.job import DefaultJob
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.publisher.base_publisher import NoopPublisher, Publisher
+from databuilder.task.base_task import Task
+from databuilder.task.task import DefaultTask
+from databuilder.utils import dedupe_cache, neo4j_csv_manifest, stage_metrics
+from databuilder.utils.closer import ThreadLocalCloser
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ShardedJob(DefaultJob):
+    """
+    Same as DefaultJob, but runs one logical job across processes: the source is split into shards by shard_func, and
+    a DefaultTask created by task_factory runs for each shard in a process pool of NUM_PROCESSES processes. Once all
+    shards are finished, the publisher publishes once.
+
+    shard_func takes the job config and returns config overrides of each shard, e.g: a where clause suffix per list of
+    schemas for a SQL metastore extractor, or a project id per BigQuery project. Each override is applied on top of
+    the job config for the task of the shard.
+
+    The loader of the task should be FsNeo4jCSVLoader, which is configured to write into its own partition (the index
+    of the shard), so that Neo4jCsvPublisher publishes all of them. Partition directories are deleted once the job is
+    finished, unless delete_created_directories of the loader is False. As all partitions are published, the job
+    fails if any partition directory already exists, e.g: left by a crashed run, unless force_create_directory of the
+    loader is True.
+
+    task_factory is called in each process, so it should be picklable, e.g: a module level function or a
+    functools.partial of it, but not a lambda.
+
+    Stage metrics (see stage_metrics) of each shard are merged into the metrics of the job once the shard is finished,
+    so the duration of a stage is the sum across processes, while elapsed time of the job is wall clock.
+    """
+    # Config keys
+    # Number of processes to run shards on. Number of CPUs if not set.
+    NUM_PROCESSES = 'num_processes'
+
+    def __init__(self,
+                 conf: ConfigTree,
+                 task_factory: Callable[[], DefaultTask],
+                 shard_func: Callable[[ConfigTree], Iterable[Mapping[str, Any]]],
+                 publisher: Publisher = NoopPublisher()) -> None:
+        """
+        :param conf: Job config
+        :param task_factory: Creates an uninitialized task for a shard
+        :param shard_func: Returns config overrides of each shard, given the job config
+        :param publisher: Publishes once all shards are finished
+        """
+        scoped_conf = Scoped.get_scoped_conf(conf, self.get_scope())
+        task = _ShardedTask(task_factory=task_factory,
+                            shard_func=shard_func,
+                            num_processes=scoped_conf.get_int(ShardedJob.NUM_PROCESSES, None),
+                            dedupe_cache_size=scoped_conf.get_int(DefaultJob.DEDUPE_CACHE_SIZE,
+                                                                  dedupe_cache.DEFAULT_MAX_SIZE))
+        super(ShardedJob, self).__init__(conf=conf, task=task, publisher=publisher)
+
+
+class _ShardedTask(Task):
+    """
+    Runs a task per shard in a process pool. See ShardedJob.
+    """
+
+    def __init__(self,
+                 task_factory: Callable[[], DefaultTask],
+                 shard_func: Callable[[ConfigTree], Iterable[Mapping[str, Any]]],
+                 num_processes: Optional[int],
+                 dedupe_cache_size: int) -> None:
+        self._task_factory = task_factory
+        self._shard_func = shard_func
+        self._num_processes = num_processes
+        self._dedupe_cache_size = dedupe_cache_size
+
+    def init(self, conf: ConfigTree) -> None:
+        # The loader of the task is validated in each shard, where the task is created
+        loader_scope = FsNeo4jCSVLoader().get_scope()
+        loader_conf = Scoped.get_scoped_conf(conf, loader_scope).with_fallback(FsNeo4jCSVLoader._DEFAULT_CONFIG)
+        dir_paths = [loader_conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH),
+                     loader_conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH)]
+
+        if not loader_conf.get_bool(FsNeo4jCSVLoader.FORCE_CREATE_DIR):
+            existing_dirs = [partition_dir for dir_path in dir_paths if os.path.isdir(dir_path)
+                             for partition_dir in neo4j_csv_manifest.list_partition_dirs(dir_path)]
+            if existing_dirs:
+                raise RuntimeError('Partition directories should not exist: {}'.format(existing_dirs))
+
+        shard_overrides = list(self._shard_func(conf))
+        self._shard_confs = [_get_shard_conf(conf, shard, loader_scope, partition, len(shard_overrides))
+                             for partition, shard in enumerate(shard_overrides)]
+
+        if loader_conf.get_bool(FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR):
+            partition_dirs = [neo4j_csv_manifest.get_partition_dir(dir_path, partition)
+                              for partition in range(len(self._shard_confs))
+                              for dir_path in dir_paths]
+            # Directories should be deleted after publish is finished
+            Job.closer.register(lambda: _delete_dirs(partition_dirs))
+
+    def run(self) -> None:
+        LOGGER.info('Running {} shards on {} processes'.format(len(self._shard_confs),
+                                                               self._num_processes or 'all CPU'))
+        metrics = stage_metrics.get_job_metrics()
+        with ProcessPoolExecutor(max_workers=self._num_processes) as executor:
+            futures: Dict[Future, int] = {
+                executor.submit(_run_shard, self._task_factory, shard_conf, self._dedupe_cache_size):
+                    partition
+                for partition, shard_conf in enumerate(self._shard_confs)}
+            try:
+                for count, future in enumerate(as_completed(futures), start=1):
+                    seconds, shard_stages = future.result()
+                    metrics.merge(shard_stages)
+                    LOGGER.info('Shard {} finished in {:.1f} seconds ({} of {} shards)'
+                                .format(futures[future], seconds, count, len(futures)))
+            except Exception:
+                LOGGER.exception('Failed in a shard. Cancelling shards not started yet')
+                for future in futures:
+                    future.cancel()
+                raise
+
+
+def _get_shard_conf(conf: ConfigTree,
+                    shard: Mapping[str, Any],
+                    loader_scope: str,
+                    partition: int,
+                    num_partitions: int) -> ConfigTree:
+    """
+    :return: Job config with the overrides of the shard, where the loader writes into the partition and leaves its
+    directories for the job to delete
+    """
+    overrides = dict(shard)
+    overrides['{}.{}'.format(loader_scope, FsNeo4jCSVLoader.PARTITION)] = partition
+    overrides['{}.{}'.format(loader_scope, FsNeo4jCSVLoader.NUM_PARTITIONS)] = num_partitions
+    overrides['{}.{}'.format(loader_scope, FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR)] = False
+    return ConfigFactory.from_dict(overrides).with_fallback(conf)
+
+
+def _run_shard(task_factory: Callable[[], DefaultTask],
+               conf: ConfigTree,
+               dedupe_cache_size: int) -> Tuple[float, Dict[str, stage_metrics.StageMetrics]]:
+    """
+    Runs the task of a shard. Runs on a process of the pool.
+    :return: Seconds taken, and metrics of each stage of the shard to be merged into the metrics of the job
+    """
+    start = time.time()
+    # Closeables registered by the task are closed when the shard is finished, as the process outlives the shard
+    Job.closer = ThreadLocalCloser()
+    cache = dedupe_cache.reset_dedupe_cache(dedupe_cache_size)
+    metrics = stage_metrics.reset_job_metrics()
+    task = task_factory()
+    if not isinstance(task.loader, FsNeo4jCSVLoader) \
+            or task.loader.get_scope() != FsNeo4jCSVLoader().get_scope():
+        raise ValueError('ShardedJob requires FsNeo4jCSVLoader to write a partition per shard, but got {}'
+                         .format(type(task.loader).__name__))
+    try:
+        task.init(conf)
+        try:
+            task.run()
+        finally:
+            task.close()
+    finally:
+        cache.log_stats()
+        metrics.log_summary()
+        Job.closer.close()
+    return time.time() - start, metrics.get_stages()
+
+
+def _delete_dirs(paths: List[str]) -> None:
+    for path in paths:
+        LOGGER.info('Deleting directory {}'.format(path))
+        shutil.rmtree(path, ignore_errors=True)
@@ -6,7 +6,7 @@ import abc
 from pyhocon import ConfigTree
 
 from databuilder import Scoped
-from typing import Any
+from typing import Any, List
 
 
 class Loader(Scoped):
@@ -21,5 +21,15 @@ class Loader(Scoped):
     def load(self, record: Any) -> None:
         pass
 
+    def load_batch(self, records: List[Any]) -> None:
+        """
+        Loads records at once. By default it calls load, and loaders can override it to load records in bulk. See
+        DefaultTask.
+        :param records:
+        :return:
+        """
+        for record in records:
+            self.load(record)
+
     def get_scope(self) -> str:
         return 'loader'
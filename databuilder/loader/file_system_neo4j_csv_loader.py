@@ -1,20 +1,23 @@
 # Copyright Contributors to the Amundsen project.
 # SPDX-License-Identifier: Apache-2.0
 
-import csv
 import logging
 import os
 import shutil
-from csv import DictWriter
 
 from pyhocon import ConfigTree, ConfigFactory
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple, Type
 
 from databuilder.job.base_job import Job
 from databuilder.loader.base_loader import Loader
 from databuilder.models.neo4j_csv_serde import NODE_LABEL, \
     RELATION_START_LABEL, RELATION_END_LABEL, RELATION_TYPE
+from databuilder.models.neo4j_csv_row import Neo4jCsvRow
 from databuilder.models.neo4j_csv_serde import Neo4jCsvSerializable
+from databuilder.utils import csv_compression, neo4j_csv_manifest, neo4j_record_file, stage_metrics
+from databuilder.utils.buffered_csv_writer import BufferedCsvWriter
+from databuilder.utils.neo4j_csv_deduper import Neo4jCsvDeduper
+from databuilder.utils.neo4j_record_file import BufferedRecordFileWriter
 from databuilder.utils.closer import Closer
 
 
@@ -26,22 +29,76 @@ class FsNeo4jCSVLoader(Loader):
     Write node and relationship CSV file(s) that can be consumed by
     Neo4jCsvPublisher.
     It assumes that the record it consumes is instance of Neo4jCsvSerializable
+
+    On close, it also writes a manifest (labels, header and row count of each
+    file) in each directory so that the publisher does not need to scan the
+    files for it.
+
+    Rows are buffered per file up to WRITE_BUFFER_BYTES and written in bulk.
+    Number of rows and rows/sec of each file are logged when it's closed.
+
+    Files can be compressed with COMPRESSION, in which case the file name has
+    the extension of the compression (e.g: .csv.gz), and Neo4jCsvPublisher
+    decompresses it transparently.
+
+    With PARTITION, files are written into a partition sub directory (e.g:
+    part-0007) of the node and relation directories instead, so that multiple
+    loaders (e.g: in different processes) can write into the same directories.
+    Only the partition directory should not exist. Neo4jCsvPublisher publishes
+    all partitions, so with NUM_PARTITIONS, partition directories out of range
+    (e.g: left by a previous run with more partitions) should not exist
+    either, or are deleted with FORCE_CREATE_DIR.
+
+    With RECORD_FORMAT binary, files are written as record files (e.g:
+    Actor_3.rec) instead of CSV, which are faster to write and read, and keep
+    the type of values. See neo4j_record_file.
+
+    With DEDUPE, a node of the same label and key, or a relation of the same
+    start key, end key and type, is written only once (first row wins), and
+    the number of suppressed rows is logged on close. It applies to rows that
+    models emitted after their own de-dupe with DedupeCache, and catches what
+    that misses. See Neo4jCsvDeduper.
     """
     # Config keys
     NODE_DIR_PATH = 'node_dir_path'
     RELATION_DIR_PATH = 'relationship_dir_path'
     FORCE_CREATE_DIR = 'force_create_directory'
     SHOULD_DELETE_CREATED_DIR = 'delete_created_directories'
+    # Approximate bytes of rows buffered in memory per file. 0 writes every row immediately.
+    WRITE_BUFFER_BYTES = 'write_buffer_bytes'
+    # Compression of the files. One of none, gzip, bz2, lzma
+    COMPRESSION = 'compression'
+    # Partition number of this loader. Not partitioned if not set.
+    PARTITION = 'partition'
+    # Number of partitions written by all loaders of the run, whose partition numbers are 0 to NUM_PARTITIONS - 1.
+    # Not checked if not set.
+    NUM_PARTITIONS = 'num_partitions'
+    # Format of the files. One of csv, binary
+    RECORD_FORMAT = 'record_format'
+    # Whether to suppress duplicate nodes and relations
+    DEDUPE = 'dedupe'
+    # Maximum number of node keys, and relation keys, kept in memory for DEDUPE before spilling to disk
+    DEDUPE_MAX_KEYS_IN_MEMORY = 'dedupe_max_keys_in_memory'
+    # Directory to spill keys into. System temporary directory if not set.
+    DEDUPE_SPILL_DIR_PATH = 'dedupe_spill_directory_path'
 
     _DEFAULT_CONFIG = ConfigFactory.from_dict({
         SHOULD_DELETE_CREATED_DIR: True,
-        FORCE_CREATE_DIR: False
+        FORCE_CREATE_DIR: False,
+        WRITE_BUFFER_BYTES: 1024 * 1024,
+        COMPRESSION: csv_compression.NONE,
+        RECORD_FORMAT: 'csv',
+        DEDUPE: False,
+        DEDUPE_MAX_KEYS_IN_MEMORY: 1000000
     })
 
     def __init__(self) -> None:
-        self._node_file_mapping: Dict[Any, DictWriter] = {}
-        self._relation_file_mapping: Dict[Any, DictWriter] = {}
+        self._node_file_mapping: Dict[Any, BufferedCsvWriter] = {}
+        self._relation_file_mapping: Dict[Any, BufferedCsvWriter] = {}
+        self._node_manifest: Dict[Any, Dict[str, Any]] = {}
+        self._relation_manifest: Dict[Any, Dict[str, Any]] = {}
         self._closer = Closer()
+        self._deduper: Optional[Neo4jCsvDeduper] = None
 
     def init(self, conf: ConfigTree) -> None:
         """
@@ -56,13 +113,59 @@ class FsNeo4jCSVLoader(Loader):
         self._node_dir = conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
         self._relation_dir = \
             conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH)
-
         self._delete_created_dir = \
             conf.get_bool(FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR)
         self._force_create_dir = conf.get_bool(FsNeo4jCSVLoader.FORCE_CREATE_DIR)
+
+        partition = conf.get_int(FsNeo4jCSVLoader.PARTITION, None)
+        if partition is not None:
+            num_partitions = conf.get_int(FsNeo4jCSVLoader.NUM_PARTITIONS, None)
+            if num_partitions is not None:
+                self._check_other_partitions(num_partitions)
+            self._node_dir = neo4j_csv_manifest.get_partition_dir(self._node_dir, partition)
+            self._relation_dir = neo4j_csv_manifest.get_partition_dir(self._relation_dir, partition)
+        self._write_buffer_bytes = conf.get_int(FsNeo4jCSVLoader.WRITE_BUFFER_BYTES)
+        record_format = conf.get_string(FsNeo4jCSVLoader.RECORD_FORMAT)
+        if record_format not in _WRITERS:
+            raise ValueError('Unsupported record format {}. Supported: {}'.format(record_format, list(_WRITERS)))
+        extension, self._writer_class = _WRITERS[record_format]
+        self._file_extension = '{}{}'.format(
+            extension, csv_compression.get_extension(conf.get_string(FsNeo4jCSVLoader.COMPRESSION)))
         self._create_directory(self._node_dir)
         self._create_directory(self._relation_dir)
 
+        # Registered before any file so that it's called after all files are closed
+        self._closer.register(self._write_manifests)
+        self._closer.register(self._add_bytes_written)
+        self._metrics = stage_metrics.get_job_metrics()
+
+        if conf.get_bool(FsNeo4jCSVLoader.DEDUPE):
+            deduper = Neo4jCsvDeduper(max_keys_in_memory=conf.get_int(FsNeo4jCSVLoader.DEDUPE_MAX_KEYS_IN_MEMORY),
+                                      spill_dir=conf.get_string(FsNeo4jCSVLoader.DEDUPE_SPILL_DIR_PATH, None))
+            self._closer.register(deduper.close)
+            self._closer.register(deduper.log_report)
+            self._deduper = deduper
+
+    def _check_other_partitions(self, num_partitions: int) -> None:
+        """
+        Validates partition directories out of range do not exist, as the publisher would publish them along with
+        the partitions of this run. Deletes them instead if FORCE_CREATE_DIR.
+        :param num_partitions:
+        :return:
+        """
+        for dir_path in (self._node_dir, self._relation_dir):
+            if not os.path.isdir(dir_path):
+                continue
+            expected = {neo4j_csv_manifest.get_partition_dir(dir_path, i) for i in range(num_partitions)}
+            for partition_dir in neo4j_csv_manifest.list_partition_dirs(dir_path):
+                if partition_dir in expected:
+                    continue
+                if not self._force_create_dir:
+                    raise RuntimeError('Partition directory out of {} partitions should not exist: {}'
+                                       .format(num_partitions, partition_dir))
+                LOGGER.info('Partition directory out of range exist. Deleting directory {}'.format(partition_dir))
+                shutil.rmtree(partition_dir, ignore_errors=True)
+
     def _create_directory(self, path: str) -> None:
         """
         Validate directory does not exist, creates it, register deletion of
@@ -107,50 +210,92 @@ class FsNeo4jCSVLoader(Loader):
         :return:
         """
 
+        for writer, row in self._get_writer_rows(csv_serializable):
+            _write_row(writer, row)
+
+    def load_batch(self, csv_serializables: List[Neo4jCsvSerializable]) -> None:
+        """
+        Writes Neo4jCsvSerializables into CSV files. Rows of the batch are grouped by file, and the rows of each file
+        are written at once.
+        :param csv_serializables:
+        :return:
+        """
+        rows_by_writer: Dict[BufferedCsvWriter, List[Sequence[Any]]] = {}
+        for csv_serializable in csv_serializables:
+            for writer, row in self._get_writer_rows(csv_serializable):
+                values = rows_by_writer.get(writer)
+                if values is None:
+                    values = rows_by_writer[writer] = []
+                values.append(_get_row_values(writer, row))
+
+        for writer, values in rows_by_writer.items():
+            writer.writerows_values(values)
+
+    def _get_writer_rows(self, csv_serializable: Neo4jCsvSerializable) -> Iterator[Tuple[BufferedCsvWriter, Any]]:
+        """
+        :param csv_serializable:
+        :return: Node and relation rows of the record that are not duplicates, with the writer of each row
+        """
+        deduper = self._deduper
+        node_file_mapping = self._node_file_mapping
         node_dict = csv_serializable.next_node()
         while node_dict:
+            if deduper and deduper.is_duplicate_node(node_dict):
+                node_dict = csv_serializable.next_node()
+                continue
+
             key = (node_dict[NODE_LABEL], len(node_dict))
-            file_suffix = '{}_{}'.format(*key)
-            node_writer = self._get_writer(node_dict,
-                                           self._node_file_mapping,
-                                           key,
-                                           self._node_dir,
-                                           file_suffix)
-            node_writer.writerow(node_dict)
+            node_writer = node_file_mapping.get(key)
+            if node_writer is None:
+                node_writer = self._get_writer(node_dict,
+                                               node_file_mapping,
+                                               key,
+                                               self._node_dir,
+                                               _node_file_suffix,
+                                               self._node_manifest)
+            yield node_writer, node_dict
             node_dict = csv_serializable.next_node()
 
+        relation_file_mapping = self._relation_file_mapping
         relation_dict = csv_serializable.next_relation()
         while relation_dict:
+            if deduper and deduper.is_duplicate_relation(relation_dict):
+                relation_dict = csv_serializable.next_relation()
+                continue
+
             key2 = (relation_dict[RELATION_START_LABEL],
                     relation_dict[RELATION_END_LABEL],
                     relation_dict[RELATION_TYPE],
                     len(relation_dict))
-
-            file_suffix = '{}_{}_{}'.format(key2[0], key2[1], key2[2])
-            relation_writer = self._get_writer(relation_dict,
-                                               self._relation_file_mapping,
-                                               key2,
-                                               self._relation_dir,
-                                               file_suffix)
-            relation_writer.writerow(relation_dict)
+            relation_writer = relation_file_mapping.get(key2)
+            if relation_writer is None:
+                relation_writer = self._get_writer(relation_dict,
+                                                   relation_file_mapping,
+                                                   key2,
+                                                   self._relation_dir,
+                                                   _relation_file_suffix,
+                                                   self._relation_manifest)
+            yield relation_writer, relation_dict
             relation_dict = csv_serializable.next_relation()
 
     def _get_writer(self,
                     csv_record_dict: Dict[str, Any],
-                    file_mapping: Dict[Any, DictWriter],
+                    file_mapping: Dict[Any, BufferedCsvWriter],
                     key: Any,
                     dir_path: str,
-                    file_suffix: str
-                    ) -> DictWriter:
+                    file_suffix: Callable[[Tuple], str],
+                    manifest: Dict[Any, Dict[str, Any]]
+                    ) -> BufferedCsvWriter:
         """
         Finds a writer based on csv record, key.
         If writer does not exist, it's creates a csv writer and update the
-        mapping.
+        mapping and the manifest.
 
         :param csv_record_dict:
         :param file_mapping:
         :param key:
-        :param file_suffix:
+        :param file_suffix: Function that creates file name suffix from key
+        :param manifest:
         :return:
         """
         writer = file_mapping.get(key)
@@ -159,20 +304,47 @@ class FsNeo4jCSVLoader(Loader):
 
         LOGGER.info('Creating file for {}'.format(key))
 
-        file_out = open('{}/{}.csv'.format(dir_path, file_suffix), 'w', encoding='utf8')
-        writer = csv.DictWriter(file_out, fieldnames=csv_record_dict.keys(),
-                                quoting=csv.QUOTE_NONNUMERIC)
-
-        def file_out_close() -> None:
-            LOGGER.info('Closing file IO {}'.format(file_out))
-            file_out.close()
-        self._closer.register(file_out_close)
-
-        writer.writeheader()
+        file_name = '{}{}'.format(file_suffix(key), self._file_extension)
+        manifest[key] = self._create_manifest_entry(csv_record_dict, file_name)
+        # Header of Neo4jCsvRow is kept so that the rows of the same header are written without lookups
+        header = csv_record_dict.header if isinstance(csv_record_dict, Neo4jCsvRow) \
+            else list(csv_record_dict.keys())
+        writer = self._writer_class('{}/{}'.format(dir_path, file_name),
+                                    fieldnames=header,
+                                    byte_budget=self._write_buffer_bytes)
+        self._closer.register(writer.close)
         file_mapping[key] = writer
 
         return writer
 
+    def _create_manifest_entry(self,
+                               csv_record_dict: Dict[str, Any],
+                               file_name: str) -> Dict[str, Any]:
+        entry = {neo4j_csv_manifest.FILE: file_name,
+                 neo4j_csv_manifest.HEADER: list(csv_record_dict.keys()),
+                 neo4j_csv_manifest.ROW_COUNT: 0}
+        if NODE_LABEL in csv_record_dict:
+            entry[neo4j_csv_manifest.LABEL] = csv_record_dict[NODE_LABEL]
+        else:
+            entry[neo4j_csv_manifest.START_LABEL] = csv_record_dict[RELATION_START_LABEL]
+            entry[neo4j_csv_manifest.END_LABEL] = csv_record_dict[RELATION_END_LABEL]
+            entry[neo4j_csv_manifest.TYPE] = csv_record_dict[RELATION_TYPE]
+        return entry
+
+    def _add_bytes_written(self) -> None:
+        self._metrics.stage(stage_metrics.LOAD).add_bytes(
+            sum(writer.bytes_written for file_mapping in (self._node_file_mapping, self._relation_file_mapping)
+                for writer in file_mapping.values()))
+
+    def _write_manifests(self) -> None:
+        manifests: List = [(self._node_dir, self._node_manifest, self._node_file_mapping),
+                           (self._relation_dir, self._relation_manifest, self._relation_file_mapping)]
+        for dir_path, manifest, file_mapping in manifests:
+            for key, entry in manifest.items():
+                entry[neo4j_csv_manifest.ROW_COUNT] = file_mapping[key].rows
+            if os.path.isdir(dir_path):
+                neo4j_csv_manifest.write_manifest(dir_path, list(manifest.values()))
+
     def close(self) -> None:
         """
         Any closeable callable registered in _closer, it will close.
@@ -182,3 +354,33 @@ class FsNeo4jCSVLoader(Loader):
 
     def get_scope(self) -> str:
         return "loader.filesystem_csv_neo4j"
+
+
+# Record format -> (file extension, writer class)
+_WRITERS: Dict[str, Tuple[str, Type[BufferedCsvWriter]]] = {
+    'csv': ('.csv', BufferedCsvWriter),
+    'binary': (neo4j_record_file.EXTENSION, BufferedRecordFileWriter),
+}
+
+
+def _write_row(writer: BufferedCsvWriter, row: Any) -> None:
+    if type(row) is Neo4jCsvRow and row.header is writer.header:
+        writer.writerow_values(row.row_values)
+    else:
+        writer.writerow(row)
+
+
+def _get_row_values(writer: BufferedCsvWriter, row: Any) -> Sequence[Any]:
+    if type(row) is Neo4jCsvRow and row.header is writer.header:
+        return row.row_values
+    return writer.get_values(row)
+
+
+def _node_file_suffix(key: Tuple) -> str:
+    # (label, number of columns)
+    return '{}_{}'.format(*key)
+
+
+def _relation_file_suffix(key: Tuple) -> str:
+    # (start label, end label, type, number of columns)
+    return '{}_{}_{}'.format(key[0], key[1], key[2])
@@ -0,0 +1,67 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+
+from pyhocon import ConfigTree, ConfigFactory
+
+from databuilder.job.base_job import Job
+from databuilder.loader.base_loader import Loader
+from databuilder.models.neo4j_csv_serde import Neo4jCsvSerializable
+from databuilder.utils.neo4j_record_spool import Neo4jRecordSpool
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InMemoryNeo4jLoader(Loader):
+    """
+    Keeps nodes and relationships of Neo4jCsvSerializable in memory for InMemoryNeo4jPublisher, instead of writing
+    them into CSV files for Neo4jCsvPublisher. It's meant for small and medium jobs where creating, writing, parsing
+    and deleting CSV files takes a good part of the job.
+
+    Rows are spilled to disk once they exceed SPILL_THRESHOLD_BYTES in memory, so that a large job does not run out
+    of memory. Rows are released once the job is closed.
+    """
+    # Config keys
+    # Approximate bytes of values kept in memory before spilling to disk
+    SPILL_THRESHOLD_BYTES = 'spill_threshold_bytes'
+    # Directory to spill into. System temporary directory if not set.
+    SPILL_DIR_PATH = 'spill_directory_path'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({
+        SPILL_THRESHOLD_BYTES: 256 * 1024 * 1024
+    })
+
+    def init(self, conf: ConfigTree) -> None:
+        conf = conf.with_fallback(InMemoryNeo4jLoader._DEFAULT_CONFIG)
+
+        self.spool = Neo4jRecordSpool(spill_threshold_bytes=conf.get_int(InMemoryNeo4jLoader.SPILL_THRESHOLD_BYTES),
+                                      spill_dir=conf.get_string(InMemoryNeo4jLoader.SPILL_DIR_PATH, None))
+        # Rows should be kept until publish is finished
+        Job.closer.register(self.spool.close)
+
+    def load(self, csv_serializable: Neo4jCsvSerializable) -> None:
+        """
+        Adds nodes and relations of Neo4jCsvSerializable into the spool.
+        :param csv_serializable:
+        :return:
+        """
+        spool = self.spool
+        node_dict = csv_serializable.next_node()
+        while node_dict:
+            spool.add_node(node_dict)
+            node_dict = csv_serializable.next_node()
+
+        relation_dict = csv_serializable.next_relation()
+        while relation_dict:
+            spool.add_relation(relation_dict)
+            relation_dict = csv_serializable.next_relation()
+
+    def close(self) -> None:
+        LOGGER.info('Loaded {} node groups and {} relation groups in memory, {} rows spilled to disk'
+                    .format(len(self.spool.get_node_groups()), len(self.spool.get_relation_groups()),
+                            self.spool.spilled_rows))
+
+    def get_scope(self) -> str:
+        return "loader.in_memory_neo4j"
@@ -3,13 +3,14 @@
 
 from collections import namedtuple
 
-from typing import Any, Iterator, Dict, List, Set, Union
+from typing import Any, Iterator, Dict, List, Union
 
 # TODO: We could separate TagMetadata from table_metadata to own module
 from databuilder.models.table_metadata import TagMetadata
 from databuilder.models.neo4j_csv_serde import (
     Neo4jCsvSerializable, NODE_LABEL, NODE_KEY, RELATION_START_KEY, RELATION_END_KEY, RELATION_START_LABEL,
     RELATION_END_LABEL, RELATION_TYPE, RELATION_REVERSE_TYPE)
+from databuilder.utils.dedupe_cache import get_dedupe_cache
 
 
 NodeTuple = namedtuple('KeyName', ['key', 'name', 'label'])
@@ -61,9 +62,6 @@ class MetricMetadata(Neo4jCsvSerializable):
     METRIC_TAG_RELATION_TYPE = 'TAG'
     TAG_METRIC_RELATION_TYPE = 'TAG_OF'
 
-    serialized_nodes: Set[Any] = set()
-    serialized_rels: Set[Any] = set()
-
     def __init__(self,
                  dashboard_group: str,
                  dashboard_name: str,
@@ -146,8 +144,7 @@ class MetricMetadata(Neo4jCsvSerializable):
         others: List[Any] = []
 
         for node_tuple in others:
-            if node_tuple not in MetricMetadata.serialized_nodes:
-                MetricMetadata.serialized_nodes.add(node_tuple)
+            if not get_dedupe_cache().is_duplicate(node_tuple):
                 yield {
                     NODE_LABEL: node_tuple.label,
                     NODE_KEY: node_tuple.key,
@@ -210,8 +207,7 @@ class MetricMetadata(Neo4jCsvSerializable):
         others: List[Any] = []
 
         for rel_tuple in others:
-            if rel_tuple not in MetricMetadata.serialized_rels:
-                MetricMetadata.serialized_rels.add(rel_tuple)
+            if not get_dedupe_cache().is_duplicate(rel_tuple):
                 yield {
                     RELATION_START_LABEL: rel_tuple.start_label,
                     RELATION_END_LABEL: rel_tuple.end_label,
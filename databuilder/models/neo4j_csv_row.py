@@ -0,0 +1,66 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections.abc import Mapping
+
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from databuilder.models.neo4j_csv_serde import (
+    RELATION_START_LABEL, RELATION_END_LABEL, RELATION_START_KEY, RELATION_END_KEY, RELATION_TYPE,
+    RELATION_REVERSE_TYPE)
+
+
+class Neo4jCsvHeader(tuple):
+    """
+    A fixed CSV header of Neo4jCsvRow. It's created once per shape of node or relation (e.g: as a class constant of
+    the model) and shared by all rows of that shape, along with the position of each column.
+    """
+    positions: Dict[str, int]
+
+    def __new__(cls, columns: Iterable[str]) -> 'Neo4jCsvHeader':
+        header = super(Neo4jCsvHeader, cls).__new__(cls, columns)  # type: ignore
+        header.positions = {column: i for i, column in enumerate(header)}
+        return header
+
+
+# Header of a relation without properties, which is what most relations are
+RELATION_HEADER = Neo4jCsvHeader((RELATION_START_LABEL, RELATION_END_LABEL, RELATION_START_KEY, RELATION_END_KEY,
+                                  RELATION_TYPE, RELATION_REVERSE_TYPE))
+
+
+class Neo4jCsvRow(Mapping):
+    """
+    A compact node or relation row that models can return from create_next_node and create_next_relation instead of
+    dict. It only holds a shared header and a tuple of values in the order of the header, so it does not build a
+    hash table per row, and FsNeo4jCSVLoader writes the values as they are.
+
+    It's a read-only Mapping of header to value, so that it can be used where a dict row is expected. Note that
+    values() is the Mapping method, while row_values is the tuple.
+    """
+    __slots__ = ('header', 'row_values')
+
+    def __init__(self, header: Neo4jCsvHeader, row_values: Tuple[Any, ...]) -> None:
+        """
+        :param header:
+        :param row_values: Values in the order of the header
+        """
+        self.header = header
+        self.row_values = row_values
+
+    def __getitem__(self, column: str) -> Any:
+        return self.row_values[self.header.positions[column]]
+
+    def __contains__(self, column: object) -> bool:
+        return column in self.header.positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.header)
+
+    def __len__(self) -> int:
+        return len(self.header)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.header, self.row_values))
+
+    def __repr__(self) -> str:
+        return 'Neo4jCsvRow({!r})'.format(self.to_dict())
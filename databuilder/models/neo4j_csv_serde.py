@@ -3,7 +3,7 @@
 
 import abc
 
-from typing import Dict, Set, Any, Union
+from typing import Dict, Set, Any, Tuple, Union
 
 NODE_KEY = 'KEY'
 NODE_LABEL = 'LABEL'
@@ -22,6 +22,13 @@ RELATION_REQUIRED_HEADERS = {RELATION_START_KEY, RELATION_START_LABEL,
 LABELS = {NODE_LABEL, RELATION_START_LABEL, RELATION_END_LABEL}
 TYPES = {RELATION_TYPE, RELATION_REVERSE_TYPE}
 
+# Headers whose values are validated, which are the validation cache key
+_NODE_VALIDATED_HEADERS = (NODE_LABEL,)
+_RELATION_VALIDATED_HEADERS = (RELATION_START_LABEL, RELATION_END_LABEL, RELATION_TYPE, RELATION_REVERSE_TYPE)
+
+# Validation cache is cleared once it reaches this size, to bound memory with unexpectedly many labels or headers
+_MAX_VALIDATED_CACHE_SIZE = 10000
+
 
 class Neo4jCsvSerializable(object, metaclass=abc.ABCMeta):
     """
@@ -29,7 +36,16 @@ class Neo4jCsvSerializable(object, metaclass=abc.ABCMeta):
     next relation in dict form so that it can be serialized to CSV file.
 
     Any model class that needs to be pushed to Neo4j should inherit this class.
+
+    Labels and types are validated once per distinct value, as they are
+    mostly the same constants, while required headers are still checked on
+    every node and relation. Set STRICT_VALIDATION to True to fully validate
+    every node and relation.
     """
+    STRICT_VALIDATION = False
+
+    # Labels and types that have passed validation, shared by all models
+    _validated: Set[Tuple] = set()
 
     def __init__(self) -> None:
         pass
@@ -79,7 +95,7 @@ class Neo4jCsvSerializable(object, metaclass=abc.ABCMeta):
         if not node_dict:
             return None
 
-        self._validate(NODE_REQUIRED_HEADERS, node_dict)
+        self._validate_cached(NODE_REQUIRED_HEADERS, _NODE_VALIDATED_HEADERS, node_dict)
         return node_dict
 
     def next_relation(self) -> Union[Dict[str, Any], None]:
@@ -95,9 +111,36 @@ class Neo4jCsvSerializable(object, metaclass=abc.ABCMeta):
         if not relation_dict:
             return None
 
-        self._validate(RELATION_REQUIRED_HEADERS, relation_dict)
+        self._validate_cached(RELATION_REQUIRED_HEADERS, _RELATION_VALIDATED_HEADERS, relation_dict)
         return relation_dict
 
+    def _validate_cached(self,
+                         required_set: Set[str],
+                         validated_headers: Tuple[str, ...],
+                         val_dict: Dict[str, Any]) -> None:
+        """
+        Validates dict, unless it has required headers and its labels and types
+        have been validated before.
+        :param required_set:
+        :param validated_headers: Headers whose values are validated
+        :param val_dict:
+        :return:
+        """
+        if self.STRICT_VALIDATION:
+            self._validate(required_set, val_dict)
+            return
+
+        validated = Neo4jCsvSerializable._validated
+        # Not hashing the whole header, which can be hundreds of columns
+        key = tuple([val_dict.get(header) for header in validated_headers])
+        if key in validated and val_dict.keys() >= required_set:
+            return
+
+        self._validate(required_set, val_dict)
+        if len(validated) >= _MAX_VALIDATED_CACHE_SIZE:
+            validated.clear()
+        validated.add(key)
+
     def _validate(self,
                   required_set: Set[str],
                   val_dict: Dict[str, Any]) -> None:
@@ -2,16 +2,19 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import copy
+import sys
 from collections import namedtuple
 
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
 from databuilder.models.cluster import cluster_constants
+from databuilder.models.neo4j_csv_row import Neo4jCsvHeader, Neo4jCsvRow, RELATION_HEADER
 from databuilder.models.neo4j_csv_serde import (
     Neo4jCsvSerializable, NODE_LABEL, NODE_KEY, RELATION_START_KEY, RELATION_END_KEY, RELATION_START_LABEL,
     RELATION_END_LABEL, RELATION_TYPE, RELATION_REVERSE_TYPE)
 from databuilder.publisher.neo4j_csv_publisher import UNQUOTED_SUFFIX
 from databuilder.models.schema import schema_constant
+from databuilder.utils.dedupe_cache import get_dedupe_cache
 
 DESCRIPTION_NODE_LABEL_VAL = 'Description'
 DESCRIPTION_NODE_LABEL = DESCRIPTION_NODE_LABEL_VAL
@@ -147,6 +150,7 @@ class ColumnMetadata:
     COLUMN_NAME = 'name'
     COLUMN_TYPE = 'type'
     COLUMN_ORDER = 'sort_order{}'.format(UNQUOTED_SUFFIX)  # int value needs to be unquoted when publish to neo4j
+    COLUMN_NODE_HEADER = Neo4jCsvHeader((NODE_LABEL, NODE_KEY, COLUMN_NAME, COLUMN_TYPE, COLUMN_ORDER))
     COLUMN_DESCRIPTION = 'description'
     COLUMN_DESCRIPTION_FORMAT = '{db}://{cluster}.{schema}/{tbl}/{col}/{description_id}'
 
@@ -182,6 +186,10 @@ class ColumnMetadata:
                                                                self.sort_order)
 
 
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
 # Tuples for de-dupe purpose on Database, Cluster, Schema. See TableMetadata docstring for more information
 NodeTuple = namedtuple('KeyName', ['key', 'name', 'label'])
 RelTuple = namedtuple('RelKeys', ['start_label', 'end_label', 'start_key', 'end_key', 'type', 'reverse_type'])
@@ -226,10 +234,6 @@ class TableMetadata(Neo4jCsvSerializable):
     TABLE_TAG_RELATION_TYPE = 'TAGGED_BY'
     TAG_TABLE_RELATION_TYPE = 'TAG'
 
-    # Only for deduping database, cluster, and schema (table and column will be always processed)
-    serialized_nodes: Set[Any] = set()
-    serialized_rels: Set[Any] = set()
-
     def __init__(self,
                  database: str,
                  cluster: str,
@@ -254,9 +258,10 @@ class TableMetadata(Neo4jCsvSerializable):
         :param description_source: Optional. Where the description is coming from. Used to compose unique id.
         :param kwargs: Put additional attributes to the table model if there is any.
         """
-        self.database = database
-        self.cluster = cluster
-        self.schema = schema
+        # Interned as database, cluster and schema repeat across tables, so that they share the same string
+        self.database = _intern(database)
+        self.cluster = _intern(cluster)
+        self.schema = _intern(schema)
         self.name = name
         self.description = DescriptionMetadata.create_description_metadata(text=description, source=description_source)
         self.columns = columns if columns else []
@@ -268,6 +273,11 @@ class TableMetadata(Neo4jCsvSerializable):
         if kwargs:
             self.attrs = copy.deepcopy(kwargs)
 
+        # Keys are used by both nodes and relations, so they're formatted once, when the table is serialized
+        self._table_key: Optional[str] = None
+        self._col_keys: Dict[str, str] = {}
+        self._col_description_keys: Dict[str, str] = {}
+
         self._node_iterator = self._create_next_node()
         self._relation_iterator = self._create_next_relation()
 
@@ -283,10 +293,12 @@ class TableMetadata(Neo4jCsvSerializable):
                                                 self.tags)
 
     def _get_table_key(self) -> str:
-        return TableMetadata.TABLE_KEY_FORMAT.format(db=self.database,
-                                                     cluster=self.cluster,
-                                                     schema=self.schema,
-                                                     tbl=self.name)
+        if self._table_key is None:
+            self._table_key = TableMetadata.TABLE_KEY_FORMAT.format(db=self.database,
+                                                                    cluster=self.cluster,
+                                                                    schema=self.schema,
+                                                                    tbl=self.name)
+        return self._table_key
 
     def _get_table_description_key(self,
                                    description: DescriptionMetadata) -> str:
@@ -297,33 +309,41 @@ class TableMetadata(Neo4jCsvSerializable):
                                                              description_id=description.get_description_id())
 
     def _get_database_key(self) -> str:
-        return TableMetadata.DATABASE_KEY_FORMAT.format(db=self.database)
+        return _intern(TableMetadata.DATABASE_KEY_FORMAT.format(db=self.database))
 
     def _get_cluster_key(self) -> str:
-        return TableMetadata.CLUSTER_KEY_FORMAT.format(db=self.database,
-                                                       cluster=self.cluster)
+        return _intern(TableMetadata.CLUSTER_KEY_FORMAT.format(db=self.database,
+                                                               cluster=self.cluster))
 
     def _get_schema_key(self) -> str:
-        return TableMetadata.SCHEMA_KEY_FORMAT.format(db=self.database,
-                                                      cluster=self.cluster,
-                                                      schema=self.schema)
+        return _intern(TableMetadata.SCHEMA_KEY_FORMAT.format(db=self.database,
+                                                              cluster=self.cluster,
+                                                              schema=self.schema))
 
     def _get_col_key(self, col: ColumnMetadata) -> str:
-        return ColumnMetadata.COLUMN_KEY_FORMAT.format(db=self.database,
-                                                       cluster=self.cluster,
-                                                       schema=self.schema,
-                                                       tbl=self.name,
-                                                       col=col.name)
+        key = self._col_keys.get(col.name)
+        if key is None:
+            key = ColumnMetadata.COLUMN_KEY_FORMAT.format(db=self.database,
+                                                          cluster=self.cluster,
+                                                          schema=self.schema,
+                                                          tbl=self.name,
+                                                          col=col.name)
+            self._col_keys[col.name] = key
+        return key
 
     def _get_col_description_key(self,
                                  col: ColumnMetadata,
                                  description: DescriptionMetadata) -> str:
-        return ColumnMetadata.COLUMN_DESCRIPTION_FORMAT.format(db=self.database,
-                                                               cluster=self.cluster,
-                                                               schema=self.schema,
-                                                               tbl=self.name,
-                                                               col=col.name,
-                                                               description_id=description.get_description_id())
+        key = self._col_description_keys.get(col.name)
+        if key is None:
+            key = ColumnMetadata.COLUMN_DESCRIPTION_FORMAT.format(db=self.database,
+                                                                  cluster=self.cluster,
+                                                                  schema=self.schema,
+                                                                  tbl=self.name,
+                                                                  col=col.name,
+                                                                  description_id=description.get_description_id())
+            self._col_description_keys[col.name] = key
+        return key
 
     @staticmethod
     def format_tags(tags: Union[List, str, None]) -> List:
@@ -358,18 +378,17 @@ class TableMetadata(Neo4jCsvSerializable):
             node_key = self._get_table_description_key(self.description)
             yield self.description.get_node_dict(node_key)
 
-        # Create the table tag node
+        # Create the table tag node, once per job as tags are shared by tables
+        dedupe_cache = get_dedupe_cache()
         if self.tags:
             for tag in self.tags:
-                yield TagMetadata.create_tag_node(tag)
+                if not dedupe_cache.is_duplicate((TagMetadata.TAG_NODE_LABEL, tag, 'default')):
+                    yield TagMetadata.create_tag_node(tag)
 
         for col in self.columns:
-            yield {
-                NODE_LABEL: ColumnMetadata.COLUMN_NODE_LABEL,
-                NODE_KEY: self._get_col_key(col),
-                ColumnMetadata.COLUMN_NAME: col.name,
-                ColumnMetadata.COLUMN_TYPE: col.type,
-                ColumnMetadata.COLUMN_ORDER: col.sort_order}
+            yield Neo4jCsvRow(ColumnMetadata.COLUMN_NODE_HEADER,
+                              (ColumnMetadata.COLUMN_NODE_LABEL, self._get_col_key(col), col.name, col.type,
+                               col.sort_order))
 
             if col.description:
                 node_key = self._get_col_description_key(col, col.description)
@@ -377,11 +396,13 @@ class TableMetadata(Neo4jCsvSerializable):
 
             if col.tags:
                 for tag in col.tags:
+                    if dedupe_cache.is_duplicate((TagMetadata.TAG_NODE_LABEL, tag, 'default')):
+                        continue
                     yield {NODE_LABEL: TagMetadata.TAG_NODE_LABEL,
                            NODE_KEY: TagMetadata.get_tag_key(tag),
                            TagMetadata.TAG_TYPE: 'default'}
 
-        # Database, cluster, schema
+        # Database, cluster, schema, which are shared by tables (table and column will be always processed)
         others = [NodeTuple(key=self._get_database_key(),
                             name=self.database,
                             label=TableMetadata.DATABASE_NODE_LABEL),
@@ -394,8 +415,7 @@ class TableMetadata(Neo4jCsvSerializable):
                   ]
 
         for node_tuple in others:
-            if node_tuple not in TableMetadata.serialized_nodes:
-                TableMetadata.serialized_nodes.add(node_tuple)
+            if not dedupe_cache.is_duplicate(node_tuple):
                 yield {
                     NODE_LABEL: node_tuple.label,
                     NODE_KEY: node_tuple.key,
@@ -410,14 +430,13 @@ class TableMetadata(Neo4jCsvSerializable):
 
     def _create_next_relation(self) -> Iterator[Any]:
 
-        yield {
-            RELATION_START_LABEL: TableMetadata.SCHEMA_NODE_LABEL,
-            RELATION_END_LABEL: TableMetadata.TABLE_NODE_LABEL,
-            RELATION_START_KEY: self._get_schema_key(),
-            RELATION_END_KEY: self._get_table_key(),
-            RELATION_TYPE: TableMetadata.SCHEMA_TABLE_RELATION_TYPE,
-            RELATION_REVERSE_TYPE: TableMetadata.TABLE_SCHEMA_RELATION_TYPE
-        }
+        yield Neo4jCsvRow(RELATION_HEADER,
+                          (TableMetadata.SCHEMA_NODE_LABEL,
+                           TableMetadata.TABLE_NODE_LABEL,
+                           self._get_schema_key(),
+                           self._get_table_key(),
+                           TableMetadata.SCHEMA_TABLE_RELATION_TYPE,
+                           TableMetadata.TABLE_SCHEMA_RELATION_TYPE))
 
         if self.description:
             yield self.description.get_relation(TableMetadata.TABLE_NODE_LABEL,
@@ -426,24 +445,22 @@ class TableMetadata(Neo4jCsvSerializable):
 
         if self.tags:
             for tag in self.tags:
-                yield {
-                    RELATION_START_LABEL: TableMetadata.TABLE_NODE_LABEL,
-                    RELATION_END_LABEL: TagMetadata.TAG_NODE_LABEL,
-                    RELATION_START_KEY: self._get_table_key(),
-                    RELATION_END_KEY: TagMetadata.get_tag_key(tag),
-                    RELATION_TYPE: TableMetadata.TABLE_TAG_RELATION_TYPE,
-                    RELATION_REVERSE_TYPE: TableMetadata.TAG_TABLE_RELATION_TYPE,
-                }
+                yield Neo4jCsvRow(RELATION_HEADER,
+                                  (TableMetadata.TABLE_NODE_LABEL,
+                                   TagMetadata.TAG_NODE_LABEL,
+                                   self._get_table_key(),
+                                   TagMetadata.get_tag_key(tag),
+                                   TableMetadata.TABLE_TAG_RELATION_TYPE,
+                                   TableMetadata.TAG_TABLE_RELATION_TYPE))
 
         for col in self.columns:
-            yield {
-                RELATION_START_LABEL: TableMetadata.TABLE_NODE_LABEL,
-                RELATION_END_LABEL: ColumnMetadata.COLUMN_NODE_LABEL,
-                RELATION_START_KEY: self._get_table_key(),
-                RELATION_END_KEY: self._get_col_key(col),
-                RELATION_TYPE: TableMetadata.TABLE_COL_RELATION_TYPE,
-                RELATION_REVERSE_TYPE: TableMetadata.COL_TABLE_RELATION_TYPE
-            }
+            yield Neo4jCsvRow(RELATION_HEADER,
+                              (TableMetadata.TABLE_NODE_LABEL,
+                               ColumnMetadata.COLUMN_NODE_LABEL,
+                               self._get_table_key(),
+                               self._get_col_key(col),
+                               TableMetadata.TABLE_COL_RELATION_TYPE,
+                               TableMetadata.COL_TABLE_RELATION_TYPE))
 
             if col.description:
                 yield col.description.get_relation(ColumnMetadata.COLUMN_NODE_LABEL,
@@ -452,14 +469,13 @@ class TableMetadata(Neo4jCsvSerializable):
 
             if col.tags:
                 for tag in col.tags:
-                    yield {
-                        RELATION_START_LABEL: TableMetadata.TABLE_NODE_LABEL,
-                        RELATION_END_LABEL: TagMetadata.TAG_NODE_LABEL,
-                        RELATION_START_KEY: self._get_table_key(),
-                        RELATION_END_KEY: TagMetadata.get_tag_key(tag),
-                        RELATION_TYPE: ColumnMetadata.COL_TAG_RELATION_TYPE,
-                        RELATION_REVERSE_TYPE: ColumnMetadata.TAG_COL_RELATION_TYPE,
-                    }
+                    yield Neo4jCsvRow(RELATION_HEADER,
+                                      (TableMetadata.TABLE_NODE_LABEL,
+                                       TagMetadata.TAG_NODE_LABEL,
+                                       self._get_table_key(),
+                                       TagMetadata.get_tag_key(tag),
+                                       ColumnMetadata.COL_TAG_RELATION_TYPE,
+                                       ColumnMetadata.TAG_COL_RELATION_TYPE))
 
         others = [
             RelTuple(start_label=TableMetadata.DATABASE_NODE_LABEL,
@@ -476,14 +492,8 @@ class TableMetadata(Neo4jCsvSerializable):
                      reverse_type=TableMetadata.SCHEMA_CLUSTER_RELATION_TYPE)
         ]
 
+        dedupe_cache = get_dedupe_cache()
         for rel_tuple in others:
-            if rel_tuple not in TableMetadata.serialized_rels:
-                TableMetadata.serialized_rels.add(rel_tuple)
-                yield {
-                    RELATION_START_LABEL: rel_tuple.start_label,
-                    RELATION_END_LABEL: rel_tuple.end_label,
-                    RELATION_START_KEY: rel_tuple.start_key,
-                    RELATION_END_KEY: rel_tuple.end_key,
-                    RELATION_TYPE: rel_tuple.type,
-                    RELATION_REVERSE_TYPE: rel_tuple.reverse_type
-                }
+            if not dedupe_cache.is_duplicate(rel_tuple):
+                # RelTuple is in the order of RELATION_HEADER
+                yield Neo4jCsvRow(RELATION_HEADER, rel_tuple)
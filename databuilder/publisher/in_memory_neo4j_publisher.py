@@ -0,0 +1,64 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+from contextlib import contextmanager
+
+from pyhocon import ConfigTree
+from typing import Dict, Iterator, List
+
+from databuilder.loader.in_memory_neo4j_loader import InMemoryNeo4jLoader
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher, NODE_FILES_DIR, RELATION_FILES_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InMemoryNeo4jPublisher(Neo4jCsvPublisher):
+    """
+    Publishes nodes and relations kept in memory by InMemoryNeo4jLoader, instead of the CSV files of
+    FsNeo4jCSVLoader. Each group of rows of the loader is published as if it's a CSV file, so everything else is same
+    as Neo4jCsvPublisher, including its scope and configuration, except NODE_FILES_DIR and RELATION_FILES_DIR that are
+    not needed.
+
+    As the rows do not outlive the job, resuming from checkpoint is not supported.
+    """
+
+    def __init__(self, loader: InMemoryNeo4jLoader) -> None:
+        """
+        :param loader: The loader of the task of the job
+        """
+        super(InMemoryNeo4jPublisher, self).__init__()
+        self._loader = loader
+
+    def init(self, conf: ConfigTree) -> None:
+        self._spool = self._loader.spool
+        super(InMemoryNeo4jPublisher, self).init(conf)
+
+        if self._checkpoint:
+            raise Exception('{} does not support checkpoint'.format(self.__class__.__name__))
+
+    def _list_files(self, conf: ConfigTree, path_key: str) -> List[str]:
+        """
+        :param conf:
+        :param path_key:
+        :return: Names of node or relation groups of the loader, in place of file paths
+        """
+        self._manifest.update(self._spool.get_manifest())
+        if path_key == NODE_FILES_DIR:
+            return self._spool.get_node_groups()
+        if path_key == RELATION_FILES_DIR:
+            return self._spool.get_relation_groups()
+        return []
+
+    @contextmanager
+    def _read_records(self, path: str) -> Iterator[Iterator[Dict[str, str]]]:
+        """
+        :param path: Name of the group, or path of a CSV file written by the publisher itself (e.g: relation shard)
+        :return:
+        """
+        if path not in self._spool:
+            with super(InMemoryNeo4jPublisher, self)._read_records(path) as records:
+                yield records
+            return
+
+        yield self._spool.read(path)
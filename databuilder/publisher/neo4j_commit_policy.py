@@ -0,0 +1,100 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+
+from neo4j.exceptions import TransientError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveCommitPolicy(object):
+    """
+    Decides when Neo4jCsvPublisher commits a transaction, adapting the number of statements per transaction instead
+    of using a fixed one.
+
+    - Transaction size is scaled towards target latency, the time from the first statement of a transaction to its
+      commit, based on the latency of the last transaction. It changes by at most a factor of 2 at a time.
+    - A transaction is also committed once the statements and parameters sent in it exceed the byte budget, so that
+      a few large rows (e.g: long descriptions) do not build up a large transaction state on Neo4j server.
+    - On a transient out of memory error, transaction size is halved.
+
+    Transaction size is shared by all sessions of the publisher.
+    """
+
+    def __init__(self,
+                 initial_size: int,
+                 min_size: int,
+                 max_size: int,
+                 target_latency_sec: float,
+                 byte_budget: int) -> None:
+        """
+        :param initial_size: Number of statements of the first transaction
+        :param min_size: Minimum number of statements per transaction
+        :param max_size: Maximum number of statements per transaction
+        :param target_latency_sec: Target latency of a transaction. 0 keeps the transaction size fixed, unless out of
+        memory error occurs.
+        :param byte_budget: Maximum bytes of statements and parameters per transaction. 0 for no budget.
+        """
+        self._min_size = max(1, min_size)
+        self._max_size = max(self._min_size, max_size)
+        self._size = min(max(initial_size, self._min_size), self._max_size)
+        self._target_latency_sec = target_latency_sec
+        self._byte_budget = byte_budget
+        self._lock = threading.Lock()
+
+    @property
+    def transaction_size(self) -> int:
+        return self._size
+
+    def should_commit(self, statements: int, num_bytes: int) -> bool:
+        """
+        :param statements: Number of statements executed in current transaction
+        :param num_bytes: Bytes of statements and parameters executed in current transaction
+        :return: True if current transaction should be committed
+        """
+        if statements >= self._size:
+            return True
+        return bool(self._byte_budget) and num_bytes >= self._byte_budget
+
+    def on_commit(self, statements: int, latency_sec: float) -> None:
+        """
+        Adjusts transaction size with the latency of the transaction just committed.
+        :param statements: Number of statements of the transaction
+        :param latency_sec: Time from the first statement of the transaction to its commit
+        :return:
+        """
+        if not self._target_latency_sec or statements < self._size:
+            # Transactions committed early by byte budget or at the end of file do not tell the right size
+            return
+
+        ratio = self._target_latency_sec / latency_sec if latency_sec > 0 else 2.0
+        ratio = min(max(ratio, 0.5), 2.0)
+        with self._lock:
+            size = min(max(int(self._size * ratio), self._min_size), self._max_size)
+            if size != self._size:
+                LOGGER.info('Transaction of {} statements took {:.2f} seconds. Changing transaction size to {}'
+                            .format(statements, latency_sec, size))
+                self._size = size
+
+    def on_memory_error(self) -> bool:
+        """
+        Halves transaction size.
+        :return: False if transaction size is already the minimum
+        """
+        with self._lock:
+            if self._size <= self._min_size:
+                return False
+            self._size = max(self._size // 2, self._min_size)
+            LOGGER.warning('Out of memory on Neo4j. Reducing transaction size to {}'.format(self._size))
+            return True
+
+
+def is_memory_error(e: Exception) -> bool:
+    """
+    :param e:
+    :return: True if the error is a transient memory error of Neo4j, that can succeed with smaller transaction.
+    e.g: Neo.TransientError.General.OutOfMemoryError, Neo.TransientError.General.TransactionMemoryLimit
+    """
+    return isinstance(e, TransientError) and 'Memory' in (e.code or '')
@@ -0,0 +1,63 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from typing import Any, Dict, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ContentHashState(object):
+    """
+    Keeps content hash of every node and relation published by Neo4jCsvPublisher in a local state file, so that the
+    next publish can tell which rows have not changed since.
+
+    State file is a JSON object of identity of the node or relation to the hash of its CSV row. It's only rewritten
+    once the publish succeeds, with the rows of that publish, so that a row missing from a publish is not considered
+    unchanged when it comes back.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of state file
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._previous: Dict[str, str] = {}
+        self._current: Dict[str, str] = {}
+
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf8') as state_file:
+                self._previous = json.load(state_file)
+            LOGGER.info('Loaded content hash of {} rows from {}'.format(len(self._previous), path))
+
+    def update(self, identity: Tuple[str, ...], record: Dict[str, Any]) -> bool:
+        """
+        Records content hash of the row.
+        :param identity: Labels, keys (and type) that identify the node or relation
+        :param record: A dict represents CSV row
+        :return: True if the row is same as the one published previously
+        """
+        key = json.dumps(identity)
+        content_hash = hashlib.md5(json.dumps(list(record.items())).encode('utf-8')).hexdigest()
+        with self._lock:
+            self._current[key] = content_hash
+            return self._previous.get(key) == content_hash
+
+    def save(self) -> None:
+        """
+        Writes the rows recorded in this publish into the state file.
+        :return:
+        """
+        with self._lock:
+            tmp_path = '{}.tmp'.format(self._path)
+            with open(tmp_path, 'w', encoding='utf8') as state_file:
+                json.dump(self._current, state_file)
+            # Replace atomically so that failure in the middle of writing does not corrupt the state
+            os.replace(tmp_path, self._path)
+        LOGGER.info('Saved content hash of {} rows into {}'.format(len(self._current), self._path))
@@ -1,25 +1,38 @@
 # Copyright Contributors to the Amundsen project.
 # SPDX-License-Identifier: Apache-2.0
 
-import copy
 import csv
 import ctypes
-from io import open
+import itertools
+from contextlib import contextmanager
 import logging
+import shutil
+import tempfile
+import threading
 import time
+import zlib
+from multiprocessing.pool import ThreadPool
 from os import listdir
-from os.path import isfile, join
+from os.path import basename, getsize, isfile, join
 from string import Template
 
 from neo4j import GraphDatabase, Transaction
 import neo4j
-from neo4j.exceptions import CypherError
+from neo4j.exceptions import CypherError, TransientError
 from pyhocon import ConfigFactory
 from pyhocon import ConfigTree
-from typing import Set, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
+from databuilder.job.base_job import Job
 from databuilder.publisher.base_publisher import Publisher
+from databuilder.publisher.neo4j_commit_policy import AdaptiveCommitPolicy, is_memory_error
+from databuilder.publisher.neo4j_content_hash_state import ContentHashState
 from databuilder.publisher.neo4j_preprocessor import NoopRelationPreprocessor
+from databuilder.publisher.neo4j_publish_checkpoint import PublishCheckpoint
+from databuilder.publisher.neo4j_publish_pipeline import PublishPipeline
+from databuilder.publisher.neo4j_statement_compiler import CompiledStatement, ValueRef
+from databuilder.utils import csv_compression, neo4j_csv_manifest, neo4j_record_file, resource_pool, stage_metrics
+from databuilder.utils.buffered_csv_writer import BufferedCsvWriter
 
 
 # Setting field_size_limit to solve the error below
@@ -46,6 +59,49 @@ NEO4J_MAX_CONN_LIFE_TIME_SEC = 'neo4j_max_conn_life_time_sec'
 # list of nodes that are create only, and not updated if match exists
 NEO4J_CREATE_ONLY_NODES = 'neo4j_create_only_nodes'
 
+# A boolean flag to publish rows in batches through parameterized UNWIND statements instead of
+# one string templated statement per CSV row
+NEO4J_USE_UNWIND = 'neo4j_use_unwind'
+# Maximum number of CSV rows sent with a single UNWIND statement
+NEO4J_UNWIND_BATCH_SIZE = 'neo4j_unwind_batch_size'
+
+# Number of sessions publishing concurrently. Node files of different labels are published concurrently, and then
+# relation files are published concurrently once all node files are committed.
+NEO4J_PUBLISH_CONCURRENCY = 'neo4j_publish_concurrency'
+# Number of times a concurrent publish of file(s) is retried on Neo4j transient error (e.g: deadlock)
+NEO4J_MAX_RETRIES = 'neo4j_max_retries'
+# Seconds to wait before first retry. It doubles on every following retry.
+NEO4J_RETRY_BACKOFF_SEC = 'neo4j_retry_backoff_sec'
+# A boolean flag to partition relation rows of all relation files by the hash of start node key into a shard per
+# concurrent session, instead of publishing each relation file in a session, when publishing concurrently.
+NEO4J_SHARD_RELATIONS = 'neo4j_shard_relations'
+# Approximate bytes of rows buffered per shard file while sharding relation files
+SHARD_BYTE_BUDGET = 1024 * 1024
+
+# A path of checkpoint file that records committed files and rows. Checkpoint is written after every commit and is
+# removed once publish succeeds.
+NEO4J_CHECKPOINT_PATH = 'neo4j_checkpoint_path'
+# A boolean flag to resume from the checkpoint, skipping files and rows that are already committed.
+NEO4J_RESUME_FROM_CHECKPOINT = 'neo4j_resume_from_checkpoint'
+
+# Number of statements buffered between a thread parsing CSV files and the thread writing to Neo4j. When more than 0,
+# parsing and writing are overlapped. 0 (default) parses and writes in the same thread.
+NEO4J_PIPELINE_QUEUE_SIZE = 'neo4j_pipeline_queue_size'
+
+# Adaptive transaction sizing. When either target latency or byte budget is set, NEO4J_TRANSCATION_SIZE is only the
+# initial transaction size, and transactions that fail with out of memory error are retried with smaller size.
+# Target seconds from the first statement of a transaction to its commit, that transaction size is scaled towards
+NEO4J_TARGET_TRANSACTION_LATENCY_SEC = 'neo4j_target_transaction_latency_sec'
+# Maximum bytes of statements and parameters per transaction
+NEO4J_TRANSACTION_BYTE_BUDGET = 'neo4j_transaction_byte_budget'
+# Bounds of adaptive transaction size
+NEO4J_MIN_TRANSACTION_SIZE = 'neo4j_min_transaction_size'
+NEO4J_MAX_TRANSACTION_SIZE = 'neo4j_max_transaction_size'
+
+# A path of state file that keeps content hash of published rows. When set, rows that have not changed since the
+# previous publish are not merged again, and only their published_tag and publisher_last_updated_epoch_ms are updated.
+NEO4J_CONTENT_HASH_STATE_PATH = 'neo4j_content_hash_state_path'
+
 NEO4J_USER = 'neo4j_user'
 NEO4J_PASSWORD = 'neo4j_password'
 NEO4J_ENCRYPTED = 'neo4j_encrypted'
@@ -98,6 +154,18 @@ DEFAULT_CONFIG = ConfigFactory.from_dict({NEO4J_TRANSCATION_SIZE: 500,
                                           NEO4J_MAX_CONN_LIFE_TIME_SEC: 50,
                                           NEO4J_ENCRYPTED: True,
                                           NEO4J_VALIDATE_SSL: False,
+                                          NEO4J_USE_UNWIND: False,
+                                          NEO4J_UNWIND_BATCH_SIZE: 1000,
+                                          NEO4J_PUBLISH_CONCURRENCY: 1,
+                                          NEO4J_MAX_RETRIES: 3,
+                                          NEO4J_RETRY_BACKOFF_SEC: 1,
+                                          NEO4J_SHARD_RELATIONS: False,
+                                          NEO4J_RESUME_FROM_CHECKPOINT: False,
+                                          NEO4J_PIPELINE_QUEUE_SIZE: 0,
+                                          NEO4J_TARGET_TRANSACTION_LATENCY_SEC: 0,
+                                          NEO4J_TRANSACTION_BYTE_BUDGET: 0,
+                                          NEO4J_MIN_TRANSACTION_SIZE: 1,
+                                          NEO4J_MAX_TRANSACTION_SIZE: 10000,
                                           RELATION_PREPROCESSOR: NoopRelationPreprocessor()})
 
 NODE_MERGE_TEMPLATE = Template("""MERGE (node:$LABEL {key: '${KEY}'})
@@ -111,11 +179,59 @@ RELATION_MERGE_TEMPLATE = Template("""MATCH (n1:$START_LABEL {key: '${START_KEY}
 MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
 $PROP_STMT RETURN n1.key, n2.key""")
 
+# Batched versions of the templates above where each row of $$batch is a dict of the CSV row.
+# Labels and relationship types cannot be parameterized in Cypher, hence rows are grouped by them.
+NODE_UNWIND_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+MERGE (node:$LABEL {key: row.KEY})
+ON CREATE SET ${create_prop_body}
+${update_statement}""")
+
+RELATION_UNWIND_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+MATCH (n1:$START_LABEL {key: row.START_KEY}),
+(n2:$END_LABEL {key: row.END_KEY})
+MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
+$PROP_STMT RETURN count(*) AS count""")
+
+# Updates published tag of nodes and relations that have not changed since the previous publish.
+# Count is validated, so that a node or relation missing in Neo4j is not silently skipped.
+NODE_TOUCH_TEMPLATE = Template("""UNWIND $$batch AS row
+MATCH (node:$LABEL {key: row.KEY})
+SET ${prop_body}
+RETURN count(*) AS count""")
+
+RELATION_TOUCH_TEMPLATE = Template("""UNWIND $$batch AS row
+MATCH (n1:$START_LABEL {key: row.START_KEY})-[r1:$TYPE]->(n2:$END_LABEL {key: row.END_KEY})-[r2:$REVERSE_TYPE]->(n1)
+SET ${prop_body}
+RETURN count(*) AS count""")
+
 CREATE_UNIQUE_INDEX_TEMPLATE = Template('CREATE CONSTRAINT ON (node:${LABEL}) ASSERT node.key IS UNIQUE')
 
 LOGGER = logging.getLogger(__name__)
 
 
+class _PipelinedStatement(NamedTuple):
+    """
+    A statement built by the parser thread, with the checkpoint progress at the time it was built.
+    """
+    stmt: str
+    params: Optional[Dict[str, Any]]
+    expect_result: bool
+    expected_count: Optional[int]
+    completed_files: List[str]
+    current_file: Optional[str]
+    current_offset: int
+
+
+class _TransactionStatement(NamedTuple):
+    """
+    A statement executed in current transaction, kept to be retried when the transaction fails with out of memory.
+    """
+    stmt: str
+    params: Optional[Dict[str, Any]]
+    expect_result: bool
+    expected_count: Optional[int]
+
+
 class Neo4jCsvPublisher(Publisher):
     """
     A Publisher takes two folders for input and publishes to Neo4j.
@@ -124,7 +240,37 @@ class Neo4jCsvPublisher(Publisher):
     Neo4j follows Label Node properties Graph and more information about this is in:
     https://neo4j.com/docs/developer-manual/current/introduction/graphdb-concepts/
 
-    #TODO User UNWIND batch operation for better performance
+    If NEO4J_USE_UNWIND is set, rows sharing the same label (or relation type) and header are sent together in a
+    parameterized UNWIND statement of up to NEO4J_UNWIND_BATCH_SIZE rows. This reduces round trips and lets Neo4j
+    reuse the query plan. NEO4J_TRANSCATION_SIZE still counts rows in this mode: the batch size is capped by it, and
+    a transaction commits every NEO4J_TRANSCATION_SIZE // NEO4J_UNWIND_BATCH_SIZE statements.
+
+    If NEO4J_PUBLISH_CONCURRENCY is more than 1, each label's node files and then each relation file is published in
+    its own session and transaction chain by a pool of workers. Publishing file(s) that fails with TransientError
+    (e.g: deadlock) is retried from the beginning, which is safe as every statement is a MERGE. Note that in this
+    mode the publish is not atomic across files.
+
+    If NEO4J_SHARD_RELATIONS is also set, relation rows are streamed into a shard file per session by the hash of
+    their start node key. Relations of the same start node are merged by the same session, which reduces lock
+    contention on start nodes with many relations. It does not prevent contention on end nodes shared across shards
+    (e.g: a Tag of many tables), which every shard may lock, so transient errors are still retried. Sharded relations
+    are always published from the beginning when resuming from checkpoint.
+
+    If NEO4J_CHECKPOINT_PATH is set, progress is recorded on every commit. When a publish fails, it can be re-run
+    against the same files with the same publish tag and NEO4J_RESUME_FROM_CHECKPOINT, to skip committed rows.
+
+    If NEO4J_PIPELINE_QUEUE_SIZE is set, CSV files are parsed and statements are built in a separate thread while
+    the statements built so far are being executed, in each session. See PublishPipeline.
+
+    If NEO4J_TARGET_TRANSACTION_LATENCY_SEC or NEO4J_TRANSACTION_BYTE_BUDGET is set, transaction size is adapted by
+    AdaptiveCommitPolicy. Statements of current transaction are kept in memory, so that the transaction can be
+    retried with smaller transactions when it fails with Neo4j out of memory error.
+
+    If NEO4J_CONTENT_HASH_STATE_PATH is set, rows that are same as in the previous publish are only touched, updating
+    published_tag and publisher_last_updated_epoch_ms in batches, so that Neo4jStalenessRemovalTask still sees them as
+    fresh. Touching fails if the node or relation does not exist in Neo4j, e.g: when it's removed outside of the
+    publisher, in which case the state file needs to be removed to publish all rows again. Relations are always merged
+    when relation preprocessor is used.
     """
 
     def __init__(self) -> None:
@@ -134,7 +280,12 @@ class Neo4jCsvPublisher(Publisher):
         conf = conf.with_fallback(DEFAULT_CONFIG)
 
         self._count: int = 0
+        self._count_lock = threading.Lock()
+        # Holds session and statement count of the worker thread when publishing concurrently
+        self._local = threading.local()
         self._progress_report_frequency = conf.get_int(NEO4J_PROGRESS_REPORT_FREQUENCY)
+        # Manifest entry by file path written by FsNeo4jCSVLoader, if any
+        self._manifest: Dict[str, Dict[str, Any]] = {}
         self._node_files = self._list_files(conf, NODE_FILES_DIR)
         self._node_files_iter = iter(self._node_files)
 
@@ -143,32 +294,71 @@ class Neo4jCsvPublisher(Publisher):
 
         trust = neo4j.TRUST_SYSTEM_CA_SIGNED_CERTIFICATES if conf.get_bool(NEO4J_VALIDATE_SSL) \
             else neo4j.TRUST_ALL_CERTIFICATES
-        self._driver = \
-            GraphDatabase.driver(conf.get_string(NEO4J_END_POINT_KEY),
-                                 max_connection_life_time=conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC),
-                                 auth=(conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD)),
-                                 encrypted=conf.get_bool(NEO4J_ENCRYPTED),
-                                 trust=trust)
+        end_point = conf.get_string(NEO4J_END_POINT_KEY)
+        max_conn_life_time = conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC)
+        auth = (conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD))
+        encrypted = conf.get_bool(NEO4J_ENCRYPTED)
+        # Shared with other components connecting to the same Neo4j if they run together, e.g: in JobGraph
+        self._driver, self._is_shared_driver = resource_pool.get_or_create(
+            ('neo4j', end_point, max_conn_life_time, auth, encrypted, trust),
+            lambda: GraphDatabase.driver(end_point,
+                                         max_connection_life_time=max_conn_life_time,
+                                         auth=auth,
+                                         encrypted=encrypted,
+                                         trust=trust))
         self._transaction_size = conf.get_int(NEO4J_TRANSCATION_SIZE)
         self._session = self._driver.session()
         self._confirm_rel_created = conf.get_bool(NEO4J_RELATIONSHIP_CREATION_CONFIRM)
+        self._use_unwind = conf.get_bool(NEO4J_USE_UNWIND)
+        self._unwind_batch_size = conf.get_int(NEO4J_UNWIND_BATCH_SIZE)
+        if self._use_unwind:
+            # Each statement carries up to a batch of rows, while transaction size is in rows
+            self._unwind_batch_size = min(self._unwind_batch_size, self._transaction_size)
+            self._transaction_size //= self._unwind_batch_size
+        self._publish_concurrency = conf.get_int(NEO4J_PUBLISH_CONCURRENCY)
+        self._max_retries = conf.get_int(NEO4J_MAX_RETRIES)
+        self._retry_backoff_sec = conf.get_float(NEO4J_RETRY_BACKOFF_SEC)
+        self._shard_relations = conf.get_bool(NEO4J_SHARD_RELATIONS)
+        self._pipeline_queue_size = conf.get_int(NEO4J_PIPELINE_QUEUE_SIZE)
+
+        self._transaction_byte_budget = conf.get_int(NEO4J_TRANSACTION_BYTE_BUDGET)
+        self._commit_policy: Optional[AdaptiveCommitPolicy] = None
+        if conf.get_float(NEO4J_TARGET_TRANSACTION_LATENCY_SEC) or self._transaction_byte_budget:
+            self._commit_policy = AdaptiveCommitPolicy(
+                initial_size=self._transaction_size,
+                min_size=conf.get_int(NEO4J_MIN_TRANSACTION_SIZE),
+                max_size=conf.get_int(NEO4J_MAX_TRANSACTION_SIZE),
+                target_latency_sec=conf.get_float(NEO4J_TARGET_TRANSACTION_LATENCY_SEC),
+                byte_budget=self._transaction_byte_budget)
 
         # config is list of node label.
         # When set, this list specifies a list of nodes that shouldn't be updated, if exists
         self.create_only_nodes = set(conf.get_list(NEO4J_CREATE_ONLY_NODES, default=[]))
         self.labels: Set[str] = set()
+        # Merge statements compiled by labels, types and header of CSV row
+        self._compiled_statements: Dict[Tuple, CompiledStatement] = {}
         self.publish_tag: str = conf.get_string(JOB_PUBLISH_TAG)
         if not self.publish_tag:
             raise Exception('{} should not be empty'.format(JOB_PUBLISH_TAG))
 
+        self._checkpoint: Optional[PublishCheckpoint] = None
+        if NEO4J_CHECKPOINT_PATH in conf:
+            self._checkpoint = PublishCheckpoint(path=conf.get_string(NEO4J_CHECKPOINT_PATH),
+                                                 publish_tag=self.publish_tag,
+                                                 resume=conf.get_bool(NEO4J_RESUME_FROM_CHECKPOINT))
+
         self._relation_preprocessor = conf.get(RELATION_PREPROCESSOR)
 
+        self._content_hash_state: Optional[ContentHashState] = None
+        if NEO4J_CONTENT_HASH_STATE_PATH in conf:
+            self._content_hash_state = ContentHashState(conf.get_string(NEO4J_CONTENT_HASH_STATE_PATH))
+
         LOGGER.info('Publishing Node csv files {}, and Relation CSV files {}'
                     .format(self._node_files, self._relation_files))
 
     def _list_files(self, conf: ConfigTree, path_key: str) -> List[str]:
         """
-        List files from directory
+        List files from directory, followed by files from its partition sub directories (e.g: part-0007) if any.
         :param conf:
         :param path_key:
         :return: List of file paths
@@ -177,7 +367,24 @@ class Neo4jCsvPublisher(Publisher):
             return []
 
         path = conf.get_string(path_key)
-        return [join(path, f) for f in listdir(path) if isfile(join(path, f))]
+        files = self._list_dir_files(path)
+        for partition_dir in neo4j_csv_manifest.list_partition_dirs(path):
+            files.extend(self._list_dir_files(partition_dir))
+        return files
+
+    def _list_dir_files(self, path: str) -> List[str]:
+        """
+        List files from directory. If the directory has a manifest, it's loaded into self._manifest and is excluded
+        from the list. Compressed files (e.g: .csv.gz) are listed as well, and are decompressed when they are read.
+        :param path:
+        :return: List of file paths
+        """
+        manifest = neo4j_csv_manifest.read_manifest(path)
+        if manifest:
+            self._manifest.update(manifest)
+
+        return [join(path, f) for f in listdir(path)
+                if isfile(join(path, f)) and f != neo4j_csv_manifest.MANIFEST_FILE_NAME]
 
     def publish_impl(self) -> None:  # noqa: C901
         """
@@ -191,26 +398,23 @@ class Neo4jCsvPublisher(Publisher):
         for node_file in self._node_files:
             self._create_indices(node_file=node_file)
 
-        LOGGER.info('Publishing Node files: {}'.format(self._node_files))
+        if self._publish_concurrency > 1:
+            self._publish_concurrently()
+            LOGGER.info('Committed total {} statements'.format(self._count))
+            self._on_publish_success()
+            LOGGER.info('Successfully published. Elapsed: {} seconds'.format(time.time() - start))
+            return
+
         try:
             tx = self._session.begin_transaction()
-            while True:
-                try:
-                    node_file = next(self._node_files_iter)
-                    tx = self._publish_node(node_file, tx=tx)
-                except StopIteration:
-                    break
-
-            LOGGER.info('Publishing Relationship files: {}'.format(self._relation_files))
-            while True:
-                try:
-                    relation_file = next(self._relation_files_iter)
-                    tx = self._publish_relation(relation_file, tx=tx)
-                except StopIteration:
-                    break
+            if self._pipeline_queue_size:
+                tx = self._publish_pipelined(self._publish_all_files, tx)
+            else:
+                tx = self._publish_all_files(tx)
 
-            tx.commit()
+            self._commit_last_transaction(tx)
             LOGGER.info('Committed total {} statements'.format(self._count))
+            self._on_publish_success()
 
             # TODO: Add statsd support
             LOGGER.info('Successfully published. Elapsed: {} seconds'.format(time.time() - start))
@@ -220,19 +424,353 @@ class Neo4jCsvPublisher(Publisher):
                 tx.rollback()
             raise e
 
+    def _on_publish_success(self) -> None:
+        publish = stage_metrics.get_job_metrics().stage(stage_metrics.PUBLISH)
+        publish.add_records(self._count)
+        publish.add_bytes(sum(getsize(path) for path in self._node_files + self._relation_files if isfile(path)))
+        if self._checkpoint:
+            self._checkpoint.remove()
+        if self._content_hash_state:
+            self._content_hash_state.save()
+
+    def _publish_all_files(self, tx: Transaction) -> Transaction:
+        """
+        Publishes all node files and then all relation files in a single transaction chain.
+        :param tx:
+        :return:
+        """
+        LOGGER.info('Publishing Node files: {}'.format(self._node_files))
+        while True:
+            try:
+                node_file = next(self._node_files_iter)
+                tx = self._publish_node(node_file, tx=tx)
+            except StopIteration:
+                break
+
+        LOGGER.info('Publishing Relationship files: {}'.format(self._relation_files))
+        while True:
+            try:
+                relation_file = next(self._relation_files_iter)
+                tx = self._publish_relation(relation_file, tx=tx)
+            except StopIteration:
+                break
+        return tx
+
+    def _publish_pipelined(self, publish: Callable[[Transaction], Transaction], tx: Transaction) -> Transaction:
+        """
+        Runs publish in a parser thread, where _execute_statement puts statements into the pipeline instead of
+        executing them, and executes them in this thread as they come.
+        :param publish: Function that publishes files with the given transaction
+        :param tx:
+        :return:
+        """
+        pipeline = PublishPipeline(queue_size=self._pipeline_queue_size)
+        # Files completed after the last statement of the parser
+        last_completed_files: List[str] = []
+
+        def produce() -> None:
+            self._local.pipeline = pipeline
+            publish(tx)
+            last_completed_files.extend(self._get_completed_files())
+
+        pipeline.start(produce)
+        try:
+            for item in pipeline.items():
+                self._get_completed_files().extend(item.completed_files)
+                self._local.current_file = item.current_file
+                self._local.current_offset = item.current_offset
+                tx = self._execute_statement(item.stmt, tx, params=item.params,
+                                             expect_result=item.expect_result,
+                                             expected_count=item.expected_count)
+        finally:
+            pipeline.stop()
+
+        self._get_completed_files().extend(last_completed_files)
+        self._local.current_file = None
+        return tx
+
+    def _publish_concurrently(self) -> None:
+        """
+        Publishes node files grouped by label concurrently, and then relation files concurrently.
+        :return:
+        """
+        node_files_by_label: Dict[Optional[str], List[str]] = {}
+        for node_file in self._node_files:
+            node_files_by_label.setdefault(self._get_node_label(node_file), []).append(node_file)
+
+        LOGGER.info('Publishing Node files with {} sessions: {}'.format(self._publish_concurrency,
+                                                                        node_files_by_label))
+        self._run_in_pool([files for _, files in sorted(node_files_by_label.items(), key=lambda t: str(t[0]))],
+                          self._publish_node)
+
+        LOGGER.info('Publishing Relationship files with {} sessions: {}'.format(self._publish_concurrency,
+                                                                                self._relation_files))
+        if not self._shard_relations:
+            self._run_in_pool([[relation_file] for relation_file in self._relation_files], self._publish_relation)
+            return
+
+        shard_dir = tempfile.mkdtemp()
+        try:
+            shards = self._shard_relation_files(shard_dir)
+            self._run_in_pool([shard for shard in shards if shard], self._publish_relation)
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+    def _shard_relation_files(self, shard_dir: str) -> List[List[str]]:
+        """
+        Partitions the rows of each relation file by the hash of start node key into a file per shard. Rows are
+        streamed into the shard files in one pass, keeping the order of the relation file, so that only a buffer per
+        shard file is held in memory.
+        :param shard_dir: Directory to write shard files into
+        :return: Shard files of each shard
+        """
+        shards: List[List[str]] = [[] for _ in range(self._publish_concurrency)]
+        for i, relation_file in enumerate(self._relation_files):
+            writers: Dict[int, BufferedCsvWriter] = {}
+            try:
+                with self._read_records(relation_file) as records:
+                    for rel_record in records:
+                        shard = zlib.crc32(rel_record[RELATION_START_KEY].encode('utf-8')) % len(shards)
+                        if shard not in writers:
+                            writers[shard] = self._create_shard_writer(shard_dir, shard, i, relation_file,
+                                                                       list(rel_record.keys()))
+                            shards[shard].append(writers[shard].path)
+                        writers[shard].writerow(rel_record)
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+        LOGGER.info('Sharded relation files into {}'.format(shards))
+        return shards
+
+    def _create_shard_writer(self,
+                             shard_dir: str,
+                             shard: int,
+                             file_index: int,
+                             relation_file: str,
+                             header: List[str]) -> BufferedCsvWriter:
+        """
+        :return: Writer of the shard file of the relation file, which is a record file if the relation file is one, so
+        that the type of values is kept. Shard files are not compressed.
+        """
+        # Files of different partitions can have the same name
+        shard_file = join(shard_dir, '{}_{}_{}'.format(
+            shard, file_index, csv_compression.strip_extension(basename(relation_file))))
+        if neo4j_record_file.is_record_file(shard_file):
+            return neo4j_record_file.BufferedRecordFileWriter(shard_file, header, byte_budget=SHARD_BYTE_BUDGET)
+        return BufferedCsvWriter(shard_file, header, byte_budget=SHARD_BYTE_BUDGET)
+
+    def _run_in_pool(self,
+                     file_groups: List[List[str]],
+                     publish_file: Callable[[str, Transaction], Transaction]) -> None:
+        """
+        Publishes each group of files in a worker. Waits for all of them to finish and raise the first failure if any.
+        :param file_groups:
+        :param publish_file: Either _publish_node or _publish_relation
+        :return:
+        """
+        pool = ThreadPool(processes=self._publish_concurrency)
+        try:
+            publish_files = Job.closer.bind(self._publish_files_with_retry)
+            results = [pool.apply_async(publish_files, (files, publish_file)) for files in file_groups]
+            first_exception = None
+            for result in results:
+                try:
+                    result.get()
+                except Exception as e:
+                    first_exception = first_exception or e
+            if first_exception:
+                raise first_exception
+        finally:
+            pool.close()
+            pool.join()
+
+    def _publish_files_with_retry(self,
+                                  files: List[str],
+                                  publish_file: Callable[[str, Transaction], Transaction]) -> None:
+        """
+        Publishes files in a new session and retries on TransientError with exponential backoff.
+        :param files:
+        :param publish_file:
+        :return:
+        """
+        attempt = 0
+        while True:
+            try:
+                self._publish_files_in_session(files, publish_file)
+                return
+            except TransientError:
+                if attempt >= self._max_retries:
+                    raise
+                backoff = self._retry_backoff_sec * (2 ** attempt)
+                attempt += 1
+                LOGGER.warning('Transient error on publishing {}. Retrying {}/{} in {} seconds'
+                               .format(files, attempt, self._max_retries, backoff))
+                time.sleep(backoff)
+
+    def _publish_files_in_session(self,
+                                  files: List[str],
+                                  publish_file: Callable[[str, Transaction], Transaction]) -> None:
+        """
+        Publishes files in a new session where the last transaction is committed at the end.
+        :param files:
+        :param publish_file:
+        :return:
+        """
+        session = self._driver.session()
+        self._local.session = session
+        self._local.count = 0
+        self._local.completed_files = []
+        self._local.current_file = None
+        self._local.tx_statements = []
+        try:
+            tx = session.begin_transaction()
+            try:
+                if self._pipeline_queue_size:
+                    tx = self._publish_pipelined(lambda t: self._publish_files(files, publish_file, t), tx)
+                else:
+                    tx = self._publish_files(files, publish_file, tx)
+                self._commit_last_transaction(tx)
+            except Exception:
+                if not tx.closed():
+                    tx.rollback()
+                raise
+        finally:
+            del self._local.session
+            session.close()
+
+    def _publish_files(self,
+                       files: List[str],
+                       publish_file: Callable[[str, Transaction], Transaction],
+                       tx: Transaction) -> Transaction:
+        """
+        :param files:
+        :param publish_file: Either _publish_node or _publish_relation
+        :param tx:
+        :return:
+        """
+        for f in files:
+            tx = publish_file(f, tx)
+        return tx
+
+    def _get_node_label(self, node_file: str) -> Optional[str]:
+        """
+        :param node_file:
+        :return: LABEL of the first node record in the file. None if the file is empty.
+        """
+        if node_file in self._manifest:
+            return self._manifest[node_file][neo4j_csv_manifest.LABEL]
+
+        with self._read_records(node_file) as node_records:
+            for node_record in node_records:
+                return node_record[NODE_LABEL_KEY]
+        return None
+
+    @contextmanager
+    def _read_records(self, path: str) -> Iterator[Iterator[Dict[str, str]]]:
+        """
+        Opens the CSV file, or record file of neo4j_record_file, decompressing it if it's compressed.
+        :param path:
+        :return: Iterator of the records in the file, where a record is a dict of header to value
+        """
+        if neo4j_record_file.is_record_file(path):
+            with neo4j_record_file.read_rows(path) as (header, rows):
+                yield _to_records(header, rows)
+            return
+
+        with csv_compression.open_text(path) as csv_file:
+            yield csv.DictReader(csv_file)
+
+    def _begin_file(self, path: str) -> Optional[int]:
+        """
+        Marks the file as the one being published in this session for the checkpoint.
+        :param path:
+        :return: Number of rows to skip as they are already committed, or None if the whole file is committed
+        """
+        if not self._checkpoint:
+            return 0
+
+        offset = self._checkpoint.get_offset(path)
+        if offset is None:
+            LOGGER.info('Skipping {} as it is already committed'.format(path))
+            return None
+        if offset:
+            LOGGER.info('Skipping first {} rows of {} as they are already committed'.format(offset, path))
+
+        self._local.current_file = path
+        self._local.current_offset = offset
+        return offset
+
+    def _end_file(self) -> None:
+        """
+        Marks the file being published as completed. It will be recorded as committed in the checkpoint on next commit.
+        :return:
+        """
+        if not self._checkpoint:
+            return
+
+        self._get_completed_files().append(self._local.current_file)
+        self._local.current_file = None
+
+    def _checkpoint_commit(self) -> None:
+        """
+        Records what is just committed in this session to the checkpoint.
+        :return:
+        """
+        if not self._checkpoint:
+            return
+
+        completed_files = self._get_completed_files()
+        self._checkpoint.commit(completed_files=completed_files,
+                                current_file=getattr(self._local, 'current_file', None),
+                                current_offset=getattr(self._local, 'current_offset', 0))
+        del completed_files[:]
+
+    def _get_completed_files(self) -> List[str]:
+        if not hasattr(self._local, 'completed_files'):
+            self._local.completed_files = []
+        return self._local.completed_files
+
+    def _set_batch_offset(self, pending_batches: Dict[Tuple, Tuple[dict, List, int]], rows_read: int) -> None:
+        """
+        Sets the offset of the file being published to the first row that is not executed yet, for the checkpoint.
+        :param pending_batches: Batches that are not executed yet, with the row number of the first row of each batch
+        :param rows_read: Number of rows read from the file so far
+        :return:
+        """
+        if self._checkpoint:
+            self._local.current_offset = min((first for _, _, first in pending_batches.values()), default=rows_read)
+
     def get_scope(self) -> str:
         return 'publisher.neo4j'
 
+    def close(self) -> None:
+        """
+        Closes the driver unless it's shared, in which case the pool it's shared from closes it.
+        :return:
+        """
+        if getattr(self, '_is_shared_driver', True):
+            return
+        self._driver.close()
+
     def _create_indices(self, node_file: str) -> None:
         """
-        Go over the node file and try creating unique index
+        Go over the node file and try creating unique index. If the node file is in the manifest, the label is taken
+        from it instead of parsing the file.
         :param node_file:
         :return:
         """
         LOGGER.info('Creating indices. (Existing indices will be ignored)')
 
-        with open(node_file, 'r', encoding='utf8') as node_csv:
-            for node_record in csv.DictReader(node_csv):
+        if node_file in self._manifest:
+            label = self._manifest[node_file][neo4j_csv_manifest.LABEL]
+            if label not in self.labels:
+                self._try_create_index(label)
+                self.labels.add(label)
+            return
+
+        with self._read_records(node_file) as node_records:
+            for node_record in node_records:
                 label = node_record[NODE_LABEL_KEY]
                 if label not in self.labels:
                     self._try_create_index(label)
@@ -257,13 +795,130 @@ class Neo4jCsvPublisher(Publisher):
         :param node_file:
         :return:
         """
+        offset = self._begin_file(node_file)
+        if offset is None:
+            return tx
+
+        with self._read_records(node_file) as records:
+            node_records = itertools.islice(records, offset, None)
+            if self._use_unwind:
+                tx = self._publish_node_batch(node_records, tx=tx, offset=offset)
+            else:
+                # Unchanged nodes are touched in batches
+                touch_batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]] = {}
+                rows_read = offset
+                for node_record in node_records:
+                    rows_read += 1
+                    if self._is_unchanged(node_record, is_node=True):
+                        tx = self._add_to_batch(touch_batches, self._touch_batch_key(node_record, is_node=True),
+                                                node_record, self._create_touch_row(node_record, is_node=True),
+                                                rows_read, tx, self._execute_node_batch)
+                        continue
+
+                    stmt = self.create_node_merge_statement(node_record=node_record)
+                    self._set_batch_offset(touch_batches, rows_read)
+                    tx = self._execute_statement(stmt, tx)
+                tx = self._flush_batches(touch_batches, rows_read, tx, self._execute_node_batch)
+
+        self._end_file()
+        return tx
 
-        with open(node_file, 'r', encoding='utf8') as node_csv:
-            for count, node_record in enumerate(csv.DictReader(node_csv)):
-                stmt = self.create_node_merge_statement(node_record=node_record)
-                tx = self._execute_statement(stmt, tx)
+    def _publish_node_batch(self, node_records: Iterable[dict], tx: Transaction, offset: int = 0) -> Transaction:
+        """
+        Same as _publish_node, but groups node records by label and header and merges up to unwind batch size of
+        them with a single UNWIND statement.
+        Example of Cypher query executed by this method:
+        UNWIND $batch AS row
+        MERGE (node:Column {key: row.KEY})
+        ON CREATE SET node.name = row.name, node.order_pos = row.order_pos, node.type = row.type, ...
+        ON MATCH SET node.name = row.name, node.order_pos = row.order_pos, node.type = row.type, ...
+
+        :param node_records:
+        :param tx:
+        :param offset: Row number of the first record in node_records
+        :return:
+        """
+        batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]] = {}
+        rows_read = offset
+        for node_record in node_records:
+            rows_read += 1
+            if self._is_unchanged(node_record, is_node=True):
+                key = self._touch_batch_key(node_record, is_node=True)
+                row = self._create_touch_row(node_record, is_node=True)
+            else:
+                key = (False, node_record[NODE_LABEL_KEY], tuple(node_record.keys()))
+                row = self._create_unwind_row(node_record, NODE_REQUIRED_KEYS)
+            tx = self._add_to_batch(batches, key, node_record, row, rows_read, tx, self._execute_node_batch)
+
+        return self._flush_batches(batches, rows_read, tx, self._execute_node_batch)
+
+    def _add_to_batch(self,
+                      batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]],
+                      key: Tuple,
+                      record: dict,
+                      row: Dict[str, Any],
+                      rows_read: int,
+                      tx: Transaction,
+                      execute_batch: Callable[[Tuple, dict, List[Dict[str, Any]], Transaction], Transaction]
+                      ) -> Transaction:
+        """
+        Adds the row to the batch of the key, and executes the batch once it reaches unwind batch size.
+        :param batches: Batches that are not executed yet, by key
+        :param key: Batch key, where the first element tells if it's a touch batch
+        :param record: The CSV record of the row
+        :param row: Row of $batch parameter
+        :param rows_read: Number of rows read from the file so far, including this row
+        :param tx:
+        :param execute_batch: Either _execute_node_batch or _execute_relation_batch
+        :return:
+        """
+        _, batch, _ = batches.setdefault(key, (record, [], rows_read - 1))
+        batch.append(row)
+        if len(batch) >= self._unwind_batch_size:
+            del batches[key]
+            self._set_batch_offset(batches, rows_read)
+            tx = execute_batch(key, record, batch, tx)
+        return tx
+
+    def _flush_batches(self,
+                       batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]],
+                       rows_read: int,
+                       tx: Transaction,
+                       execute_batch: Callable[[Tuple, dict, List[Dict[str, Any]], Transaction], Transaction]
+                       ) -> Transaction:
+        """
+        Executes all the batches that are not executed yet.
+        :param batches:
+        :param rows_read: Number of rows read from the file
+        :param tx:
+        :param execute_batch: Either _execute_node_batch or _execute_relation_batch
+        :return:
+        """
+        while batches:
+            key = next(iter(batches))
+            record, batch, _ = batches.pop(key)
+            self._set_batch_offset(batches, rows_read)
+            tx = execute_batch(key, record, batch, tx)
         return tx
 
+    def _execute_node_batch(self,
+                            key: Tuple,
+                            node_record: dict,
+                            batch: List[Dict[str, Any]],
+                            tx: Transaction) -> Transaction:
+        """
+        :param key: Batch key, where the first element tells if it's a touch batch
+        :param node_record: Any record of the batch. Only its header and LABEL are used.
+        :param batch: Rows created by _create_unwind_row, or by _create_touch_row for touch batch
+        :param tx:
+        :return:
+        """
+        if key[0]:
+            return self._execute_touch_batch(node_record, batch, tx, is_node=True)
+
+        stmt = self.create_node_unwind_statement(node_record=node_record)
+        return self._execute_statement(stmt, tx, params={'batch': batch, 'publish_tag': self.publish_tag})
+
     def is_create_only_node(self, node_record: dict) -> bool:
         """
         Check if node can be updated
@@ -277,20 +932,51 @@ class Neo4jCsvPublisher(Publisher):
 
     def create_node_merge_statement(self, node_record: dict) -> str:
         """
-        Creates node merge statement
+        Creates node merge statement. The statement is compiled once per label and header, and the values of
+        node_record are bound into it.
+        :param node_record:
+        :return:
+        """
+        key = (node_record[NODE_LABEL_KEY], tuple(node_record.keys()))
+        compiled = self._compiled_statements.get(key)
+        if compiled is None:
+            compiled = self._compile_node_merge_statement(node_record)
+            self._compiled_statements[key] = compiled
+        return compiled.bind(node_record)
+
+    def _compile_node_merge_statement(self, node_record: dict) -> CompiledStatement:
+        """
+        Compiles statement that NODE_MERGE_TEMPLATE would produce for the label and header of node_record.
         :param node_record:
         :return:
         """
-        params = copy.deepcopy(node_record)
-        params['create_prop_body'] = self._create_props_body(node_record, NODE_REQUIRED_KEYS, 'node')
+        prop_body = self._create_props_segments(node_record.keys(), NODE_REQUIRED_KEYS, 'node')
+        segments: List[Any] = ['MERGE (node:{} {{key: \''.format(node_record[NODE_LABEL_KEY]),
+                               ValueRef(NODE_KEY_KEY, escape=False),
+                               '\'})\nON CREATE SET ']
+        segments.extend(prop_body)
+        segments.append('\n')
+        if not self.is_create_only_node(node_record):
+            segments.append('ON MATCH SET ')
+            segments.extend(prop_body)
+        return CompiledStatement(segments)
+
+    def create_node_unwind_statement(self, node_record: dict) -> str:
+        """
+        Creates node merge statement that UNWINDs $batch parameter. Only header and LABEL of node_record is used.
+        :param node_record:
+        :return:
+        """
+        params = {NODE_LABEL_KEY: node_record[NODE_LABEL_KEY],
+                  'create_prop_body': self._create_unwind_props_body(node_record.keys(), NODE_REQUIRED_KEYS, 'node')}
 
         update_statement = ''
         if not self.is_create_only_node(node_record):
-            update_prop_body = self._create_props_body(node_record, NODE_REQUIRED_KEYS, 'node')
+            update_prop_body = self._create_unwind_props_body(node_record.keys(), NODE_REQUIRED_KEYS, 'node')
             update_statement = NODE_UPDATE_TEMPLATE.substitute(update_prop_body=update_prop_body)
         params['update_statement'] = update_statement
 
-        return NODE_MERGE_TEMPLATE.substitute(params)
+        return NODE_UNWIND_MERGE_TEMPLATE.substitute(params)
 
     def _publish_relation(self, relation_file: str, tx: Transaction) -> Transaction:
         """
@@ -307,109 +993,340 @@ class Neo4jCsvPublisher(Publisher):
         :return:
         """
 
-        if self._relation_preprocessor.is_perform_preprocess():
-            LOGGER.info('Pre-processing relation with {}'.format(self._relation_preprocessor))
+        offset = self._begin_file(relation_file)
+        if offset is None:
+            return tx
 
-            count = 0
-            with open(relation_file, 'r', encoding='utf8') as relation_csv:
-                for rel_record in csv.DictReader(relation_csv):
-                    stmt, params = self._relation_preprocessor.preprocess_cypher(
-                        start_label=rel_record[RELATION_START_LABEL],
-                        end_label=rel_record[RELATION_END_LABEL],
-                        start_key=rel_record[RELATION_START_KEY],
-                        end_key=rel_record[RELATION_END_KEY],
-                        relation=rel_record[RELATION_TYPE],
-                        reverse_relation=rel_record[RELATION_REVERSE_TYPE])
+        # If resuming in the middle of the file, pre-processing has been committed before any merge
+        if self._relation_preprocessor.is_perform_preprocess() and not offset:
+            # Pre-processing needs to be done for all records before merging any of them. The file is streamed
+            # twice rather than kept in memory, as a relation file can be larger than memory.
+            with self._read_records(relation_file) as records:
+                tx = self._preprocess_relation(records, tx=tx)
+
+        with self._read_records(relation_file) as records:
+            rel_records: Iterable[dict] = itertools.islice(records, offset, None)
+            if self._use_unwind:
+                tx = self._publish_relation_batch(rel_records, tx=tx, offset=offset)
+            else:
+                # Unchanged relations are touched in batches
+                touch_batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]] = {}
+                rows_read = offset
+                for rel_record in rel_records:
+                    rows_read += 1
+                    if self._is_unchanged(rel_record, is_node=False):
+                        tx = self._add_to_batch(touch_batches, self._touch_batch_key(rel_record, is_node=False),
+                                                rel_record, self._create_touch_row(rel_record, is_node=False),
+                                                rows_read, tx, self._execute_relation_batch)
+                        continue
+
+                    stmt = self.create_relationship_merge_statement(rel_record=rel_record)
+                    self._set_batch_offset(touch_batches, rows_read)
+                    tx = self._execute_statement(stmt, tx,
+                                                 expect_result=self._confirm_rel_created)
+                tx = self._flush_batches(touch_batches, rows_read, tx, self._execute_relation_batch)
+
+        self._end_file()
+        return tx
 
-                    if stmt:
-                        tx = self._execute_statement(stmt, tx=tx, params=params)
-                        count += 1
+    def _preprocess_relation(self, rel_records: Iterable[dict], tx: Transaction) -> Transaction:
+        """
+        Executes Cypher statement provided by relation preprocessor for each relation record.
+        :param rel_records:
+        :param tx:
+        :return:
+        """
+        LOGGER.info('Pre-processing relation with {}'.format(self._relation_preprocessor))
+
+        count = 0
+        for rel_record in rel_records:
+            stmt, params = self._relation_preprocessor.preprocess_cypher(
+                start_label=rel_record[RELATION_START_LABEL],
+                end_label=rel_record[RELATION_END_LABEL],
+                start_key=rel_record[RELATION_START_KEY],
+                end_key=rel_record[RELATION_END_KEY],
+                relation=rel_record[RELATION_TYPE],
+                reverse_relation=rel_record[RELATION_REVERSE_TYPE])
+
+            if stmt:
+                tx = self._execute_statement(stmt, tx=tx, params=params)
+                count += 1
+
+        LOGGER.info('Executed pre-processing Cypher statement {} times'.format(count))
+        return tx
 
-            LOGGER.info('Executed pre-processing Cypher statement {} times'.format(count))
+    def _publish_relation_batch(self,
+                                rel_records: Iterable[dict],
+                                tx: Transaction,
+                                offset: int = 0) -> Transaction:
+        """
+        Same as the merge part of _publish_relation, but groups relation records by labels, types and header and
+        merges up to unwind batch size of them with a single UNWIND statement.
+        Example of Cypher query executed by this method:
+        UNWIND $batch AS row
+        MATCH (n1:Table {key: row.START_KEY}),
+              (n2:Column {key: row.END_KEY})
+        MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)
+        RETURN count(*) AS count
 
-        with open(relation_file, 'r', encoding='utf8') as relation_csv:
-            for count, rel_record in enumerate(csv.DictReader(relation_csv)):
-                stmt = self.create_relationship_merge_statement(rel_record=rel_record)
-                tx = self._execute_statement(stmt, tx,
-                                             expect_result=self._confirm_rel_created)
+        :param rel_records:
+        :param tx:
+        :param offset: Row number of the first record in rel_records
+        :return:
+        """
+        batches: Dict[Tuple, Tuple[dict, List[Dict[str, Any]], int]] = {}
+        rows_read = offset
+        for rel_record in rel_records:
+            rows_read += 1
+            if self._is_unchanged(rel_record, is_node=False):
+                key = self._touch_batch_key(rel_record, is_node=False)
+                row = self._create_touch_row(rel_record, is_node=False)
+            else:
+                key = (False, rel_record[RELATION_START_LABEL], rel_record[RELATION_END_LABEL],
+                       rel_record[RELATION_TYPE], rel_record[RELATION_REVERSE_TYPE], tuple(rel_record.keys()))
+                row = self._create_unwind_row(rel_record, RELATION_REQUIRED_KEYS)
+            tx = self._add_to_batch(batches, key, rel_record, row, rows_read, tx, self._execute_relation_batch)
+
+        return self._flush_batches(batches, rows_read, tx, self._execute_relation_batch)
+
+    def _execute_relation_batch(self,
+                                key: Tuple,
+                                rel_record: dict,
+                                batch: List[Dict[str, Any]],
+                                tx: Transaction) -> Transaction:
+        """
+        :param key: Batch key, where the first element tells if it's a touch batch
+        :param rel_record: Any record of the batch. Only its header, labels and types are used.
+        :param batch: Rows created by _create_unwind_row, or by _create_touch_row for touch batch
+        :param tx:
+        :return:
+        """
+        if key[0]:
+            return self._execute_touch_batch(rel_record, batch, tx, is_node=False)
 
-        return tx
+        stmt = self.create_relationship_unwind_statement(rel_record=rel_record)
+        return self._execute_statement(stmt, tx, params={'batch': batch, 'publish_tag': self.publish_tag},
+                                       expect_result=self._confirm_rel_created,
+                                       expected_count=len(batch))
+
+    def _is_unchanged(self, record: dict, is_node: bool) -> bool:
+        """
+        Records content hash of the row if content hash state is used.
+        :param record:
+        :param is_node:
+        :return: True if the row can be touched instead of being merged
+        """
+        if not self._content_hash_state:
+            return False
+
+        if is_node:
+            identity: Tuple[str, ...] = (record[NODE_LABEL_KEY], record[NODE_KEY_KEY])
+        else:
+            identity = (record[RELATION_START_LABEL], record[RELATION_START_KEY], record[RELATION_END_LABEL],
+                        record[RELATION_END_KEY], record[RELATION_TYPE])
+        unchanged = self._content_hash_state.update(identity, record)
+        # Relation preprocessor may delete the relation before it's merged
+        return unchanged and (is_node or not self._relation_preprocessor.is_perform_preprocess())
+
+    def _touch_batch_key(self, record: dict, is_node: bool) -> Tuple:
+        if is_node:
+            return True, record[NODE_LABEL_KEY]
+        return (True, record[RELATION_START_LABEL], record[RELATION_END_LABEL], record[RELATION_TYPE],
+                record[RELATION_REVERSE_TYPE])
+
+    def _create_touch_row(self, record: dict, is_node: bool) -> Dict[str, Any]:
+        if is_node:
+            return {NODE_KEY_KEY: record[NODE_KEY_KEY]}
+        return {RELATION_START_KEY: record[RELATION_START_KEY], RELATION_END_KEY: record[RELATION_END_KEY]}
+
+    def _execute_touch_batch(self,
+                             record: dict,
+                             batch: List[Dict[str, Any]],
+                             tx: Transaction,
+                             is_node: bool) -> Transaction:
+        """
+        Updates published tag of the nodes or relations that have not changed, validating all of them exist.
+        :param record: Any record of the batch. Only its labels and types are used.
+        :param batch: Rows created by _create_touch_row
+        :param tx:
+        :param is_node:
+        :return:
+        """
+        stmt = self.create_node_touch_statement(record) if is_node else self.create_relationship_touch_statement(record)
+        return self._execute_statement(stmt, tx, params={'batch': batch, 'publish_tag': self.publish_tag},
+                                       expect_result=True, expected_count=len(batch))
+
+    def create_node_touch_statement(self, node_record: dict) -> str:
+        """
+        Creates statement that updates published tag of the nodes in $batch parameter.
+        :param node_record: Only its LABEL is used.
+        :return:
+        """
+        return NODE_TOUCH_TEMPLATE.substitute(LABEL=node_record[NODE_LABEL_KEY],
+                                              prop_body=self._create_unwind_props_body([], set(), 'node'))
+
+    def create_relationship_touch_statement(self, rel_record: dict) -> str:
+        """
+        Creates statement that updates published tag of the relations, in both direction, in $batch parameter.
+        :param rel_record: Only its labels and types are used.
+        :return:
+        """
+        prop_body = ' , '.join([self._create_unwind_props_body([], set(), 'r1'),
+                                self._create_unwind_props_body([], set(), 'r2')])
+        return RELATION_TOUCH_TEMPLATE.substitute(START_LABEL=rel_record[RELATION_START_LABEL],
+                                                  END_LABEL=rel_record[RELATION_END_LABEL],
+                                                  TYPE=rel_record[RELATION_TYPE],
+                                                  REVERSE_TYPE=rel_record[RELATION_REVERSE_TYPE],
+                                                  prop_body=prop_body)
 
     def create_relationship_merge_statement(self, rel_record: dict) -> str:
         """
-        Creates relationship merge statement
+        Creates relationship merge statement. The statement is compiled once per labels, types and header, and the
+        values of rel_record are bound into it.
         :param rel_record:
         :return:
         """
-        param = copy.deepcopy(rel_record)
-        create_prop_body = self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r1')
+        key = (rel_record[RELATION_START_LABEL], rel_record[RELATION_END_LABEL], rel_record[RELATION_TYPE],
+               rel_record[RELATION_REVERSE_TYPE], tuple(rel_record.keys()))
+        compiled = self._compiled_statements.get(key)
+        if compiled is None:
+            compiled = self._compile_relationship_merge_statement(rel_record)
+            self._compiled_statements[key] = compiled
+        return compiled.bind(rel_record)
+
+    def _compile_relationship_merge_statement(self, rel_record: dict) -> CompiledStatement:
+        """
+        Compiles statement that RELATION_MERGE_TEMPLATE would produce for the labels, types and header of rel_record.
+        Properties are set on both relation and reverse relation.
+        :param rel_record:
+        :return:
+        """
+        prop_body: List[Any] = self._create_props_segments(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r1')
+        prop_body.append(' , ')
+        prop_body.extend(self._create_props_segments(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r2'))
+
+        segments: List[Any] = ['MATCH (n1:{} {{key: \''.format(rel_record[RELATION_START_LABEL]),
+                               ValueRef(RELATION_START_KEY, escape=False),
+                               '\'}}),\n(n2:{} {{key: \''.format(rel_record[RELATION_END_LABEL]),
+                               ValueRef(RELATION_END_KEY, escape=False),
+                               '\'}})\nMERGE (n1)-[r1:{}]->(n2)-[r2:{}]->(n1)\nON CREATE SET '
+                               .format(rel_record[RELATION_TYPE], rel_record[RELATION_REVERSE_TYPE])]
+        segments.extend(prop_body)
+        segments.append('\nON MATCH SET ')
+        segments.extend(prop_body)
+        segments.append(' RETURN n1.key, n2.key')
+        return CompiledStatement(segments)
+
+    def create_relationship_unwind_statement(self, rel_record: dict) -> str:
+        """
+        Creates relationship merge statement that UNWINDs $batch parameter. Only header, labels and types of
+        rel_record is used.
+        :param rel_record:
+        :return:
+        """
+        param = {k: rel_record[k] for k in (RELATION_START_LABEL, RELATION_END_LABEL,
+                                            RELATION_TYPE, RELATION_REVERSE_TYPE)}
         param['PROP_STMT'] = ' '  # No properties for relationship by default
 
+        create_prop_body = self._create_unwind_props_body(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r1')
         if create_prop_body:
-            # We need one more body for reverse relation
-            create_prop_body = ' , '.join([create_prop_body,
-                                           self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r2')])
-            update_prop_body = ' , '.join([self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r1'),
-                                           self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r2')])
-
-            param['PROP_STMT'] = """ON CREATE SET {create_prop_body}
-ON MATCH SET {update_prop_body}""".format(create_prop_body=create_prop_body,
-                                          update_prop_body=update_prop_body)
+            prop_body = ' , '.join([create_prop_body,
+                                    self._create_unwind_props_body(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r2')])
+            param['PROP_STMT'] = """ON CREATE SET {prop_body}
+ON MATCH SET {prop_body}""".format(prop_body=prop_body)
 
-        return RELATION_MERGE_TEMPLATE.substitute(param)
+        return RELATION_UNWIND_MERGE_TEMPLATE.substitute(param)
 
-    def _create_props_body(self,
-                           record_dict: dict,
-                           excludes: Set,
-                           identifier: str) -> str:
+    def _create_props_segments(self,
+                               header: Iterable[str],
+                               excludes: Set,
+                               identifier: str) -> List[Any]:
         """
-        Creates properties body with params required for resolving template.
+        Creates properties body where the values are ValueRefs to be bound per row by CompiledStatement.
 
         e.g: Note that node.key3 is not quoted if header has UNQUOTED_SUFFIX.
         identifier.key1 = 'val1' , identifier.key2 = 'val2', identifier.key3 = val3
 
-        :param record_dict: A dict represents CSV row
+        :param header: CSV header
+        :param excludes: set of excluded columns that does not need to be in properties (e.g: KEY, LABEL ...)
+        :param identifier: identifier that will be used in CYPHER query
+        :return: Segments of CompiledStatement
+        """
+        segments: List[Any] = []
+        for k in header:
+            if k in excludes:
+                continue
+
+            if k.endswith(UNQUOTED_SUFFIX):
+                segments.extend(['{id}.{key} = '.format(id=identifier, key=k[:-len(UNQUOTED_SUFFIX)]),
+                                 ValueRef(k), ', '])
+            else:
+                segments.extend(["{id}.{key} = '".format(id=identifier, key=k), ValueRef(k), "', "])
+
+        segments.append("""{id}.{key} = '{val}', """.format(id=identifier,
+                                                            key=PUBLISHED_TAG_PROPERTY_NAME,
+                                                            val=self.publish_tag))
+        segments.append('{id}.{key} = timestamp()'.format(id=identifier, key=LAST_UPDATED_EPOCH_MS))
+        return segments
+
+    def _create_unwind_props_body(self,
+                                  header: Iterable[str],
+                                  excludes: Set,
+                                  identifier: str) -> str:
+        """
+        Creates properties body for UNWIND statement, where values are referenced from the row instead of being
+        inlined in the statement.
+
+        e.g: identifier.key1 = row.key1 , identifier.key2 = row.key2, identifier.published_tag = $publish_tag
+
+        :param header: CSV header
         :param excludes: set of excluded columns that does not need to be in properties (e.g: KEY, LABEL ...)
         :param identifier: identifier that will be used in CYPHER query as shown on above example
-        :param is_update: Creates property body for update statement in MERGE
         :return: Properties body for Cypher statement
         """
-        template_params = {}
         props = []
-        for k, v in record_dict.items():
+        for k in header:
             if k in excludes:
-                template_params[k] = v
                 continue
 
-            # if isinstance(str, v):
-            # escape backslash for Cypher query
-            v = v.replace('\\', '\\\\')
-            # escape quote for Cypher query
-            v = v.replace('\'', "\\'")
-
             if k.endswith(UNQUOTED_SUFFIX):
                 k = k[:-len(UNQUOTED_SUFFIX)]
-                props.append('{id}.{key} = {val}'.format(id=identifier, key=k, val=v))
-            else:
-                props.append("""{id}.{key} = '{val}'""".format(id=identifier, key=k, val=v))
+            props.append('{id}.{key} = row.{key}'.format(id=identifier, key=k))
 
-            template_params[k] = v
+        props.append('{id}.{key} = $publish_tag'.format(id=identifier, key=PUBLISHED_TAG_PROPERTY_NAME))
+        props.append('{id}.{key} = timestamp()'.format(id=identifier, key=LAST_UPDATED_EPOCH_MS))
 
-        props.append("""{id}.{key} = '{val}'""".format(id=identifier,
-                                                       key=PUBLISHED_TAG_PROPERTY_NAME,
-                                                       val=self.publish_tag))
+        return ', '.join(props)
 
-        props.append("""{id}.{key} = {val}""".format(id=identifier,
-                                                     key=LAST_UPDATED_EPOCH_MS,
-                                                     val='timestamp()'))
+    def _create_unwind_row(self,
+                           record_dict: dict,
+                           required_keys: Set) -> Dict[str, Any]:
+        """
+        Creates a row for $batch parameter of UNWIND statement. Values of header with UNQUOTED_SUFFIX are converted
+        into the Cypher literal type they would have been evaluated to if inlined in the statement.
+        :param record_dict: A dict represents CSV row
+        :param required_keys: Required columns (e.g: KEY, LABEL ...). Only keys among these are kept in the row.
+        :return:
+        """
+        row = {}
+        for k, v in record_dict.items():
+            if k in required_keys:
+                if k in (NODE_KEY_KEY, RELATION_START_KEY, RELATION_END_KEY):
+                    row[k] = v
+                continue
 
-        return ', '.join(props)
+            if k.endswith(UNQUOTED_SUFFIX):
+                row[k[:-len(UNQUOTED_SUFFIX)]] = parse_unquoted_value(v)
+            else:
+                row[k] = v
+        return row
 
     def _execute_statement(self,
                            stmt: str,
                            tx: Transaction,
-                           params: bool=None,
-                           expect_result: bool=False) -> Transaction:
+                           params: Optional[Dict[str, Any]] = None,
+                           expect_result: bool = False,
+                           expected_count: Optional[int] = None) -> Transaction:
         """
         Executes statement against Neo4j. If execution fails, it rollsback and raise exception.
         If 'expect_result' flag is True, it confirms if result object is not null.
@@ -417,32 +1334,183 @@ ON MATCH SET {update_prop_body}""".format(create_prop_body=create_prop_body,
         :param tx:
         :param count:
         :param expect_result: By having this True, it will validate if result object is not None.
+        :param expected_count: If provided with expect_result, it will validate if the 'count' of the result matches
+        it instead. Used with UNWIND statement where single statement handles multiple rows.
         :return:
         """
+        pipeline = getattr(self._local, 'pipeline', None)
+        if pipeline:
+            # In the parser thread of the pipeline, the statement is executed by the writer thread
+            self._put_pipelined_statement(pipeline, stmt, params, expect_result, expected_count)
+            return tx
+
+        statement = _TransactionStatement(stmt, params, expect_result, expected_count)
         try:
             if LOGGER.isEnabledFor(logging.DEBUG):
                 LOGGER.debug('Executing statement: {} with params {}'.format(stmt, params))
 
             result = tx.run(str(stmt).encode('utf-8', 'ignore'), parameters=params)
-            if expect_result and not result.single():
-                raise RuntimeError('Failed to executed statement: {}'.format(stmt))
-
-            self._count += 1
-            if self._count > 1 and self._count % self._transaction_size == 0:
-                tx.commit()
-                LOGGER.info('Committed {} statements so far'.format(self._count))
-                return self._session.begin_transaction()
-
-            if self._count > 1 and self._count % self._progress_report_frequency == 0:
-                LOGGER.info('Processed {} statements so far'.format(self._count))
+            if expect_result:
+                record = result.single()
+                if not record or (expected_count is not None and record['count'] != expected_count):
+                    raise RuntimeError('Failed to executed statement: {}'.format(stmt))
 
-            return tx
+            return self._commit_if_needed(tx, statement)
         except Exception as e:
+            if self._commit_policy and is_memory_error(e):
+                return self._retry_with_smaller_transactions(tx, e, failed=statement)
+
             LOGGER.exception('Failed to execute Cypher query')
             if not tx.closed():
                 tx.rollback()
             raise e
 
+    def _commit_if_needed(self, tx: Transaction, statement: _TransactionStatement) -> Transaction:
+        """
+        Counts the statement just executed, and commits every transaction size of statements.
+        :param tx:
+        :param statement: The statement just executed
+        :return: New transaction if committed, otherwise the same transaction
+        """
+        with self._count_lock:
+            self._count += 1
+            count = self._count
+
+        if self._commit_policy:
+            return self._commit_adaptively(tx, statement, count)
+
+        # Commit cadence is per session, which is same as the total count unless publishing concurrently
+        session = getattr(self._local, 'session', self._session)
+        session_count = count
+        if session is not self._session:
+            self._local.count += 1
+            session_count = self._local.count
+
+        if session_count % self._transaction_size == 0:
+            tx.commit()
+            self._checkpoint_commit()
+            LOGGER.info('Committed {} statements so far'.format(count))
+            return session.begin_transaction()
+
+        if count > 1 and count % self._progress_report_frequency == 0:
+            LOGGER.info('Processed {} statements so far'.format(count))
+
+        return tx
+
+    def _commit_adaptively(self, tx: Transaction, statement: _TransactionStatement, count: int) -> Transaction:
+        """
+        Commits when commit policy decides so, and reports the latency of the transaction to it.
+        :param tx:
+        :param statement: The statement just executed
+        :param count: Total number of statements executed
+        :return: New transaction if committed, otherwise the same transaction
+        """
+        tx_statements = self._get_tx_statements()
+        if not tx_statements:
+            self._local.tx_start = time.time()
+            self._local.tx_bytes = 0
+        tx_statements.append(statement)
+        if self._transaction_byte_budget:
+            self._local.tx_bytes += _estimate_bytes(statement)
+
+        if not self._commit_policy.should_commit(len(tx_statements), self._local.tx_bytes):  # type: ignore
+            if count > 1 and count % self._progress_report_frequency == 0:
+                LOGGER.info('Processed {} statements so far'.format(count))
+            return tx
+
+        tx.commit()
+        self._commit_policy.on_commit(len(tx_statements), time.time() - self._local.tx_start)  # type: ignore
+        del tx_statements[:]
+        # While retrying, progress is recorded once all retried statements are committed
+        if not getattr(self._local, 'retrying', False):
+            self._checkpoint_commit()
+        LOGGER.info('Committed {} statements so far'.format(count))
+        return getattr(self._local, 'session', self._session).begin_transaction()
+
+    def _commit_last_transaction(self, tx: Transaction) -> None:
+        """
+        Commits the last transaction of the session.
+        :param tx:
+        :return:
+        """
+        try:
+            tx.commit()
+        except Exception as e:
+            if not (self._commit_policy and is_memory_error(e)):
+                raise
+            self._commit_last_transaction(self._retry_with_smaller_transactions(tx, e))
+            return
+
+        self._get_tx_statements().clear()
+        self._checkpoint_commit()
+
+    def _retry_with_smaller_transactions(self,
+                                         tx: Transaction,
+                                         error: Exception,
+                                         failed: Optional[_TransactionStatement] = None) -> Transaction:
+        """
+        Rolls back the transaction that failed with out of memory error, and executes its statements again after
+        reducing transaction size.
+        :param tx:
+        :param error: Out of memory error
+        :param failed: Statement that was being executed when it failed, if any
+        :return: Transaction the last statement is executed in
+        """
+        tx_statements = self._get_tx_statements()
+        statements = list(tx_statements)
+        del tx_statements[:]
+        if not tx.closed():
+            tx.rollback()
+
+        if not self._commit_policy.on_memory_error():  # type: ignore
+            LOGGER.exception('Failed to execute Cypher query with minimum transaction size')
+            raise error
+
+        # Statements counted as executed will be counted again
+        with self._count_lock:
+            self._count -= len(statements)
+        # Statement that failed on commit is already in the transaction statements
+        if failed and not (statements and statements[-1] is failed):
+            statements.append(failed)
+
+        LOGGER.warning('Retrying {} statements of the transaction with smaller transactions'.format(len(statements)))
+        retrying = getattr(self._local, 'retrying', False)
+        self._local.retrying = True
+        try:
+            tx = getattr(self._local, 'session', self._session).begin_transaction()
+            for statement in statements:
+                tx = self._execute_statement(statement.stmt, tx, params=statement.params,
+                                             expect_result=statement.expect_result,
+                                             expected_count=statement.expected_count)
+        finally:
+            self._local.retrying = retrying
+        return tx
+
+    def _get_tx_statements(self) -> List[_TransactionStatement]:
+        if not hasattr(self._local, 'tx_statements'):
+            self._local.tx_statements = []
+        return self._local.tx_statements
+
+    def _put_pipelined_statement(self,
+                                 pipeline: PublishPipeline,
+                                 stmt: str,
+                                 params: Optional[Dict[str, Any]],
+                                 expect_result: bool,
+                                 expected_count: Optional[int]) -> None:
+        """
+        Puts the statement into the pipeline with the checkpoint progress of the parser thread, so that the writer
+        thread records the progress once the statement is committed.
+        """
+        completed_files = self._get_completed_files()
+        item = _PipelinedStatement(stmt=stmt, params=params, expect_result=expect_result,
+                                   expected_count=expected_count, completed_files=list(completed_files),
+                                   current_file=getattr(self._local, 'current_file', None),
+                                   current_offset=getattr(self._local, 'current_offset', 0))
+        del completed_files[:]
+
+        rows = len(params['batch']) if params and 'batch' in params else 1
+        pipeline.put(item, rows=rows)
+
     def _try_create_index(self, label: str) -> None:
         """
         For any label seen first time for this publisher it will try to create unique index.
@@ -460,3 +1528,66 @@ ON MATCH SET {update_prop_body}""".format(create_prop_body=create_prop_body,
                 if 'An equivalent constraint already exists' not in e.__str__():
                     raise
                 # Else, swallow the exception, to make this function idempotent.
+
+
+def _estimate_bytes(statement: _TransactionStatement) -> int:
+    """
+    Estimates bytes of the statement and its parameters sent to Neo4j.
+    :param statement:
+    :return:
+    """
+    num_bytes = len(statement.stmt)
+    for value in (statement.params or {}).values():
+        if isinstance(value, list):
+            # UNWIND batch
+            num_bytes += sum(len(str(v)) for row in value for v in row.values())
+        else:
+            num_bytes += len(str(value))
+    return num_bytes
+
+
+def parse_unquoted_value(value: Any) -> Any:
+    """
+    Converts unquoted CSV value into the Python value of the Cypher literal it represents, so that it can be
+    passed as a parameter. e.g: '1' -> 1, '1.5' -> 1.5, 'True' -> True, '"foo"' -> 'foo'
+    Value that is not a recognizable literal is passed as is, as well as value that is not str, which is read from
+    a record file with its type.
+    :param value:
+    :return:
+    """
+    if type(value) is not str:
+        return value
+    lowered = value.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered in ('null', ''):
+        return None
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _to_records(header: List[str], rows: Iterator[Tuple[Any, ...]]) -> Iterator[Dict[str, Any]]:
+    """
+    Converts rows of a record file into records. Values are same as read from CSV file (None as empty string and
+    others as str), except the ones of header with UNQUOTED_SUFFIX that keep their type.
+    :param header:
+    :param rows:
+    :return:
+    """
+    quoted = [i for i, column in enumerate(header) if not column.endswith(UNQUOTED_SUFFIX)]
+    quoted_set = frozenset(quoted)
+    for values in rows:
+        for i in quoted:
+            if type(values[i]) is not str:
+                values = tuple(('' if v is None else str(v)) if j in quoted_set else v
+                               for j, v in enumerate(values))
+                break
+        yield dict(zip(header, values))
@@ -0,0 +1,261 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import logging
+import os
+import shutil
+import time
+import uuid
+from string import Template
+
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any, Dict, List, Set, Tuple
+
+from databuilder.publisher.neo4j_csv_publisher import (
+    Neo4jCsvPublisher, parse_unquoted_value, LAST_UPDATED_EPOCH_MS, NEO4J_CHECKPOINT_PATH,
+    NEO4J_CONTENT_HASH_STATE_PATH, NEO4J_PIPELINE_QUEUE_SIZE, NEO4J_PUBLISH_CONCURRENCY, NEO4J_USE_UNWIND,
+    NODE_LABEL_KEY, NODE_REQUIRED_KEYS, NODE_UPDATE_TEMPLATE, PUBLISHED_TAG_PROPERTY_NAME, RELATION_END_LABEL,
+    RELATION_REQUIRED_KEYS, RELATION_REVERSE_TYPE, RELATION_START_LABEL, RELATION_TYPE, UNQUOTED_SUFFIX)
+from databuilder.utils import csv_compression
+
+# Config keys
+# A directory that Neo4j server can read CSV files from with LOAD CSV, e.g: $NEO4J_HOME/import mounted on this host
+NEO4J_IMPORT_DIR = 'neo4j_import_directory'
+# URL that the import directory is accessible from Neo4j server
+NEO4J_IMPORT_URL_PREFIX = 'neo4j_import_url_prefix'
+# Number of rows LOAD CSV commits at a time
+NEO4J_LOAD_CSV_PERIODIC_COMMIT = 'neo4j_load_csv_periodic_commit'
+
+DEFAULT_CONFIG = ConfigFactory.from_dict({NEO4J_IMPORT_URL_PREFIX: 'file:///',
+                                          NEO4J_LOAD_CSV_PERIODIC_COMMIT: 10000})
+
+NODE_LOAD_CSV_TEMPLATE = Template("""USING PERIODIC COMMIT $PERIODIC_COMMIT
+LOAD CSV WITH HEADERS FROM '$URL' AS row
+MERGE (node:$LABEL {key: row.KEY})
+ON CREATE SET ${create_prop_body}
+${update_statement}""")
+
+RELATION_LOAD_CSV_TEMPLATE = Template("""USING PERIODIC COMMIT $PERIODIC_COMMIT
+LOAD CSV WITH HEADERS FROM '$URL' AS row
+MATCH (n1:$START_LABEL {key: row.START_KEY}),
+(n2:$END_LABEL {key: row.END_KEY})
+MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
+ON CREATE SET ${prop_body}
+ON MATCH SET ${prop_body}""")
+
+# Cypher functions converting LOAD CSV string value into the type inferred from unquoted column
+TYPE_CONVERSIONS = {int: 'toInteger({})', float: 'toFloat({})', bool: 'toBoolean({})'}
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Neo4jLoadCsvPublisher(Neo4jCsvPublisher):
+    """
+    A publisher for initial or full rebuild loads that publishes the node and relation files of FsNeo4jCSVLoader with
+    Neo4j's LOAD CSV, letting Neo4j parse and commit the rows in bulk instead of receiving a statement per row.
+
+    Each file is first rewritten into NEO4J_IMPORT_DIR, which Neo4j server needs to be able to read, split by label
+    (or relation type) as those cannot be parameterized. Header suffix UNQUOTED_SUFFIX is removed and the type of the
+    unquoted column is inferred from its values, so that it can be converted back in the LOAD CSV statement.
+    Same as Neo4jCsvPublisher, relations are created bi-directionally and published_tag and
+    publisher_last_updated_epoch_ms properties are set on every node and relation.
+
+    It shares the scope and configuration with Neo4jCsvPublisher. Relation preprocessor, checkpoint, concurrent publish,
+    UNWIND statements, publish pipeline, adaptive transaction sizing and content hash state are not supported, as each
+    file is committed by Neo4j with periodic commit without comparing rows.
+    """
+
+    def init(self, conf: ConfigTree) -> None:
+        super(Neo4jLoadCsvPublisher, self).init(conf)
+        conf = conf.with_fallback(DEFAULT_CONFIG)
+
+        # Converted files are written into a sub directory unique to this publish, which is removed afterwards
+        self._import_sub_dir = 'databuilder_{}'.format(uuid.uuid4().hex)
+        self._import_dir = os.path.join(conf.get_string(NEO4J_IMPORT_DIR), self._import_sub_dir)
+        self._import_url_prefix = '{}{}/'.format(conf.get_string(NEO4J_IMPORT_URL_PREFIX), self._import_sub_dir)
+        self._periodic_commit = conf.get_int(NEO4J_LOAD_CSV_PERIODIC_COMMIT)
+
+        if self._relation_preprocessor.is_perform_preprocess():
+            raise Exception('{} does not support relation preprocessor'.format(self.__class__.__name__))
+
+        unsupported = [key for key, is_set in ((NEO4J_CHECKPOINT_PATH, self._checkpoint is not None),
+                                               (NEO4J_PUBLISH_CONCURRENCY, self._publish_concurrency > 1),
+                                               (NEO4J_USE_UNWIND, self._use_unwind),
+                                               (NEO4J_PIPELINE_QUEUE_SIZE, self._pipeline_queue_size > 0),
+                                               ('adaptive transaction sizing', self._commit_policy is not None),
+                                               (NEO4J_CONTENT_HASH_STATE_PATH, self._content_hash_state is not None))
+                       if is_set]
+        if unsupported:
+            raise Exception('{} does not support {}'.format(self.__class__.__name__, ', '.join(unsupported)))
+
+    def publish_impl(self) -> None:
+        start = time.time()
+
+        LOGGER.info('Creating indices using Node files: {}'.format(self._node_files))
+        for node_file in self._node_files:
+            self._create_indices(node_file=node_file)
+
+        try:
+            # Each file is converted into its own sub directory, as files of different partitions can have same name
+            for i, node_file in enumerate(self._node_files):
+                for url, record, types in self._convert(node_file, 'nodes/{}'.format(i), is_node=True):
+                    self._run_load_csv(self.create_node_load_csv_statement(url, record, types))
+
+            for i, relation_file in enumerate(self._relation_files):
+                for url, record, types in self._convert(relation_file, 'relations/{}'.format(i), is_node=False):
+                    self._run_load_csv(self.create_relationship_load_csv_statement(url, record, types))
+        finally:
+            shutil.rmtree(self._import_dir, ignore_errors=True)
+
+        self._on_publish_success()
+        LOGGER.info('Successfully published with LOAD CSV. Elapsed: {} seconds'.format(time.time() - start))
+
+    def _run_load_csv(self, stmt: str) -> None:
+        """
+        Runs LOAD CSV statement. USING PERIODIC COMMIT needs to be run in auto-commit transaction.
+        :param stmt:
+        :return:
+        """
+        LOGGER.info('Executing statement: {}'.format(stmt))
+        self._session.run(stmt, parameters={'publish_tag': self.publish_tag}).consume()
+        self._count += 1
+
+    def _convert(self,
+                 path: str,
+                 sub_dir: str,
+                 is_node: bool) -> List[Tuple[str, Dict[str, Any], Dict[str, type]]]:
+        """
+        Rewrites the CSV file into the import directory, splitting it by label (or relation labels and types), and
+        normalizing unquoted values.
+        :param path:
+        :param sub_dir: Sub directory of import directory to write into
+        :param is_node:
+        :return: A list of URL of the converted file, the first record of it, and type of each unquoted column
+        """
+        dest_dir = os.path.join(self._import_dir, sub_dir)
+        os.makedirs(dest_dir, exist_ok=True)
+        group_keys = (NODE_LABEL_KEY,) if is_node else \
+            (RELATION_START_LABEL, RELATION_END_LABEL, RELATION_TYPE, RELATION_REVERSE_TYPE)
+
+        outputs: Dict[Tuple, Tuple[Any, csv.DictWriter, str, Dict[str, Any], Dict[str, Set[type]]]] = {}
+        try:
+            with self._read_records(path) as records:
+                for record in records:
+                    key = tuple(record[k] for k in group_keys)
+                    if key not in outputs:
+                        file_name = '{}_{}'.format('_'.join(key),
+                                                   csv_compression.strip_extension(os.path.basename(path)))
+                        file_out = open(os.path.join(dest_dir, file_name), 'w', encoding='utf8')
+                        writer = csv.DictWriter(file_out, fieldnames=[_strip_unquoted(k) for k in record.keys()],
+                                                quoting=csv.QUOTE_ALL)
+                        writer.writeheader()
+                        url = '{}{}/{}'.format(self._import_url_prefix, sub_dir, file_name)
+                        outputs[key] = (file_out, writer, url, record, {})
+
+                    _, writer, _, _, types = outputs[key]
+                    row = {}
+                    for k, v in record.items():
+                        if k.endswith(UNQUOTED_SUFFIX):
+                            value = parse_unquoted_value(v)
+                            if value is not None:
+                                types.setdefault(k, set()).add(type(value))
+                            v = str(value).lower() if isinstance(value, bool) else '' if value is None else str(value)
+                        row[_strip_unquoted(k)] = v
+                    writer.writerow(row)
+        finally:
+            for file_out, _, _, _, _ in outputs.values():
+                file_out.close()
+
+        return [(url, record, {k: _resolve_type(t) for k, t in types.items()})
+                for _, _, url, record, types in outputs.values()]
+
+    def create_node_load_csv_statement(self,
+                                       url: str,
+                                       node_record: Dict[str, Any],
+                                       types: Dict[str, type]) -> str:
+        """
+        Creates LOAD CSV statement that merges nodes of the file
+        :param url: URL of the converted file
+        :param node_record: Any record of the file. Only its header and LABEL are used.
+        :param types: Type of each unquoted column
+        :return:
+        """
+        prop_body = self._create_load_csv_props_body(node_record.keys(), NODE_REQUIRED_KEYS, 'node', types)
+        update_statement = ''
+        if not self.is_create_only_node(node_record):
+            update_statement = NODE_UPDATE_TEMPLATE.substitute(update_prop_body=prop_body)
+
+        return NODE_LOAD_CSV_TEMPLATE.substitute(PERIODIC_COMMIT=self._periodic_commit,
+                                                 URL=url,
+                                                 LABEL=node_record[NODE_LABEL_KEY],
+                                                 create_prop_body=prop_body,
+                                                 update_statement=update_statement)
+
+    def create_relationship_load_csv_statement(self,
+                                               url: str,
+                                               rel_record: Dict[str, Any],
+                                               types: Dict[str, type]) -> str:
+        """
+        Creates LOAD CSV statement that merges relations of the file, in both direction
+        :param url: URL of the converted file
+        :param rel_record: Any record of the file. Only its header, labels and types are used.
+        :param types: Type of each unquoted column
+        :return:
+        """
+        prop_body = ' , '.join([
+            self._create_load_csv_props_body(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r1', types),
+            self._create_load_csv_props_body(rel_record.keys(), RELATION_REQUIRED_KEYS, 'r2', types)])
+
+        return RELATION_LOAD_CSV_TEMPLATE.substitute(PERIODIC_COMMIT=self._periodic_commit,
+                                                     URL=url,
+                                                     START_LABEL=rel_record[RELATION_START_LABEL],
+                                                     END_LABEL=rel_record[RELATION_END_LABEL],
+                                                     TYPE=rel_record[RELATION_TYPE],
+                                                     REVERSE_TYPE=rel_record[RELATION_REVERSE_TYPE],
+                                                     prop_body=prop_body)
+
+    def _create_load_csv_props_body(self,
+                                    header: Any,
+                                    excludes: Set,
+                                    identifier: str,
+                                    types: Dict[str, type]) -> str:
+        """
+        Creates properties body where values are referenced from LOAD CSV row.
+        e.g: node.name = row.name, node.sort_order = toInteger(row.sort_order), node.published_tag = $publish_tag
+        :param header: Header of the original CSV file
+        :param excludes: set of excluded columns that does not need to be in properties (e.g: KEY, LABEL ...)
+        :param identifier: identifier that will be used in CYPHER query as shown on above example
+        :param types: Type of each unquoted column
+        :return:
+        """
+        props = []
+        for k in header:
+            if k in excludes:
+                continue
+
+            value = 'row.{}'.format(_strip_unquoted(k))
+            if k in types and types[k] in TYPE_CONVERSIONS:
+                value = TYPE_CONVERSIONS[types[k]].format(value)
+            props.append('{id}.{key} = {val}'.format(id=identifier, key=_strip_unquoted(k), val=value))
+
+        props.append('{id}.{key} = $publish_tag'.format(id=identifier, key=PUBLISHED_TAG_PROPERTY_NAME))
+        props.append('{id}.{key} = timestamp()'.format(id=identifier, key=LAST_UPDATED_EPOCH_MS))
+        return ', '.join(props)
+
+
+def _strip_unquoted(header: str) -> str:
+    return header[:-len(UNQUOTED_SUFFIX)] if header.endswith(UNQUOTED_SUFFIX) else header
+
+
+def _resolve_type(types: Set[type]) -> type:
+    """
+    Resolves a single type for a column from the types of its values.
+    :param types:
+    :return: int, float, bool or str
+    """
+    if len(types) == 1:
+        return next(iter(types))
+    if types == {int, float}:
+        return float
+    return str
@@ -0,0 +1,107 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+import os
+import threading
+
+from typing import Dict, Iterable, Optional, Set
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PublishCheckpoint(object):
+    """
+    Records progress of Neo4jCsvPublisher that has been committed to Neo4j, so that a failed publish can be resumed
+    without publishing committed rows again.
+
+    Checkpoint file is a JSON file that has publish tag, files that are fully committed, and number of rows committed
+    for the files that are partially committed. It is rewritten on every commit.
+    Checkpoint is only valid for the same publish tag, as resuming with different publish tag would leave skipped rows
+    with old published_tag.
+    """
+    PUBLISH_TAG = 'publish_tag'
+    COMMITTED_FILES = 'committed_files'
+    COMMITTED_OFFSETS = 'committed_offsets'
+
+    def __init__(self,
+                 path: str,
+                 publish_tag: str,
+                 resume: bool) -> None:
+        """
+        :param path: Path of checkpoint file
+        :param publish_tag: Publish tag of current publish
+        :param resume: If True, loads progress from existing checkpoint file. Otherwise, start from the scratch.
+        """
+        self._path = path
+        self._publish_tag = publish_tag
+        self._lock = threading.Lock()
+        self._committed_files: Set[str] = set()
+        self._committed_offsets: Dict[str, int] = {}
+
+        if resume:
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self._path):
+            LOGGER.info('Checkpoint {} does not exist. Publishing from the beginning'.format(self._path))
+            return
+
+        with open(self._path, 'r', encoding='utf8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+
+        if checkpoint.get(PublishCheckpoint.PUBLISH_TAG) != self._publish_tag:
+            LOGGER.warning('Ignoring checkpoint {} as it is for different publish tag {}'
+                           .format(self._path, checkpoint.get(PublishCheckpoint.PUBLISH_TAG)))
+            return
+
+        self._committed_files = set(checkpoint[PublishCheckpoint.COMMITTED_FILES])
+        self._committed_offsets = checkpoint[PublishCheckpoint.COMMITTED_OFFSETS]
+        LOGGER.info('Resuming from checkpoint {}. Committed files: {} , committed rows: {}'
+                    .format(self._path, self._committed_files, self._committed_offsets))
+
+    def get_offset(self, path: str) -> Optional[int]:
+        """
+        :param path: File path
+        :return: Number of rows of the file that are already committed, or None if the whole file is committed
+        """
+        with self._lock:
+            if path in self._committed_files:
+                return None
+            return self._committed_offsets.get(path, 0)
+
+    def commit(self,
+               completed_files: Iterable[str],
+               current_file: Optional[str],
+               current_offset: int) -> None:
+        """
+        Records progress that has just been committed, and writes checkpoint file.
+        :param completed_files: Files that all rows have been committed
+        :param current_file: File that is being published, if any
+        :param current_offset: Number of rows of current file that have been committed
+        :return:
+        """
+        with self._lock:
+            for path in completed_files:
+                self._committed_files.add(path)
+                self._committed_offsets.pop(path, None)
+            if current_file:
+                self._committed_offsets[current_file] = current_offset
+
+            tmp_path = '{}.tmp'.format(self._path)
+            with open(tmp_path, 'w', encoding='utf8') as checkpoint_file:
+                json.dump({PublishCheckpoint.PUBLISH_TAG: self._publish_tag,
+                           PublishCheckpoint.COMMITTED_FILES: sorted(self._committed_files),
+                           PublishCheckpoint.COMMITTED_OFFSETS: self._committed_offsets}, checkpoint_file)
+            # Replace atomically so that failure in the middle of writing does not corrupt the checkpoint
+            os.replace(tmp_path, self._path)
+
+    def remove(self) -> None:
+        """
+        Removes checkpoint file once everything is published.
+        :return:
+        """
+        with self._lock:
+            if os.path.isfile(self._path):
+                os.remove(self._path)
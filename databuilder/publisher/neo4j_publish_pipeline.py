@@ -0,0 +1,144 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import queue
+import threading
+import time
+
+from typing import Any, Callable, Iterator, Optional
+
+from databuilder.job.base_job import Job
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds the parser waits on a full queue before checking if the writer has stopped
+_PUT_TIMEOUT_SEC = 0.1
+
+
+class PipelineStoppedException(Exception):
+    """
+    Raised in the parser thread when the writer has stopped consuming, so that the parser stops as well.
+    """
+    pass
+
+
+class _End(object):
+    """
+    Put into the queue by the parser thread when it finishes, with the exception it failed with if any.
+    """
+
+    def __init__(self, exception: Optional[BaseException] = None) -> None:
+        self.exception = exception
+
+
+class PublishPipeline(object):
+    """
+    Overlaps parsing CSV files with writing to Neo4j. A parser thread runs the given function, which puts the
+    statements it builds into a bounded queue, while the calling thread takes them out and executes them.
+
+    When the queue is full, the parser blocks until the writer catches up (backpressure), so the memory used is
+    bounded by the queue size. Items come out in the order they were put in. Failure of the parser is raised in the
+    writer, and the parser stops once the writer stops.
+
+    Throughput and the time each side spent waiting on the other are logged when the pipeline finishes, which tells
+    whether the publish is bound by parsing or by Neo4j.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        """
+        :param queue_size: Maximum number of items buffered between the parser and the writer
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = 0.0
+
+        self.statements = 0
+        self.rows = 0
+        # Time the parser was blocked on a full queue, i.e: waiting for the writer
+        self.parser_wait_sec = 0.0
+        # Time the writer was blocked on an empty queue, i.e: waiting for the parser
+        self.writer_wait_sec = 0.0
+
+    def start(self, produce: Callable[[], None]) -> None:
+        """
+        Starts the parser thread.
+        :param produce: Function that calls put() for each statement
+        :return:
+        """
+        self._start_time = time.time()
+        self._thread = threading.Thread(target=Job.closer.bind(self._produce), args=(produce,),
+                                        name='neo4j-publish-parser')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _produce(self, produce: Callable[[], None]) -> None:
+        try:
+            produce()
+            end = _End()
+        except PipelineStoppedException:
+            return
+        except BaseException as e:
+            end = _End(e)
+
+        try:
+            self._put(end)
+        except PipelineStoppedException:
+            # Writer has stopped consuming
+            pass
+
+    def put(self, item: Any, rows: int = 1) -> None:
+        """
+        Called by the parser thread. Blocks while the queue is full.
+        :param item:
+        :param rows: Number of CSV rows the item covers, for throughput metrics
+        :return:
+        """
+        self._put(item)
+        self.statements += 1
+        self.rows += rows
+
+    def _put(self, item: Any) -> None:
+        wait_start = time.time()
+        while True:
+            if self._stopped.is_set():
+                raise PipelineStoppedException()
+            try:
+                self._queue.put(item, timeout=_PUT_TIMEOUT_SEC)
+                break
+            except queue.Full:
+                continue
+        self.parser_wait_sec += time.time() - wait_start
+
+    def items(self) -> Iterator[Any]:
+        """
+        Called by the writer thread. Yields the items in order until the parser finishes, and raises the exception
+        the parser failed with, if any.
+        :return:
+        """
+        while True:
+            wait_start = time.time()
+            item = self._queue.get()
+            self.writer_wait_sec += time.time() - wait_start
+
+            if isinstance(item, _End):
+                if item.exception:
+                    raise item.exception
+                return
+            yield item
+
+    def stop(self) -> None:
+        """
+        Stops the parser thread if it's still running, waits for it and logs the metrics.
+        :return:
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+        elapsed = time.time() - self._start_time
+        LOGGER.info('Pipelined {} statements of {} rows in {:.2f} seconds ({:.1f} rows/sec). '
+                    'Parser waited {:.2f} seconds for writer, writer waited {:.2f} seconds for parser'
+                    .format(self.statements, self.rows, elapsed, self.rows / elapsed if elapsed else 0,
+                            self.parser_wait_sec, self.writer_wait_sec))
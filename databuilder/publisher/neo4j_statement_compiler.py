@@ -0,0 +1,68 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Any, Dict, List, Set, Tuple, Union
+
+
+class ValueRef(object):
+    """
+    A reference to a column of CSV row in a compiled statement.
+    """
+
+    def __init__(self, column: str, escape: bool = True) -> None:
+        """
+        :param column: CSV header of the column
+        :param escape: Escapes backslash and single quote of the value for Cypher query
+        """
+        self.column = column
+        self.escape = escape
+
+
+class CompiledStatement(object):
+    """
+    A Cypher statement compiled once per CSV header, where only the values of each row are bound into it.
+
+    It's made of literal segments and ValueRefs between them. Binding a row escapes each referenced value once, even if
+    the value is referenced many times (e.g: in ON CREATE SET and ON MATCH SET), and joins the segments.
+    """
+
+    def __init__(self, segments: List[Union[str, ValueRef]]) -> None:
+        """
+        :param segments: Literal strings and ValueRefs in order of the statement
+        """
+        self._literals: List[str] = ['']
+        self._refs: List[Tuple[str, bool]] = []
+        for segment in segments:
+            if isinstance(segment, ValueRef):
+                self._refs.append((segment.column, segment.escape))
+                self._literals.append('')
+            else:
+                self._literals[-1] += segment
+        self._distinct_refs: Set[Tuple[str, bool]] = set(self._refs)
+
+    def bind(self, record: Dict[str, Any]) -> str:
+        """
+        :param record: A dict represents CSV row
+        :return: Cypher statement
+        """
+        values = {(column, escape): _escape(_to_str(record[column])) if escape else _to_str(record[column])
+                  for column, escape in self._distinct_refs}
+
+        literals = self._literals
+        parts = [literals[0]]
+        for i, ref in enumerate(self._refs, start=1):
+            parts.append(values[ref])
+            parts.append(literals[i])
+        return ''.join(parts)
+
+
+def _to_str(value: Any) -> str:
+    # Values of unquoted columns of record file keep their type, which are written same as CSV writer does
+    if type(value) is str:
+        return value
+    return '' if value is None else str(value)
+
+
+def _escape(value: str) -> str:
+    # escape backslash and quote for Cypher query
+    return value.replace('\\', '\\\\').replace('\'', "\\'")
@@ -9,6 +9,7 @@ from databuilder.extractor.neo4j_extractor import Neo4jExtractor
 from databuilder.extractor.neo4j_es_last_updated_extractor import Neo4jEsLastUpdatedExtractor
 from databuilder.extractor.neo4j_search_data_extractor import Neo4jSearchDataExtractor
 from databuilder.job.job import DefaultJob
+from databuilder.job.job_graph import JobGraph
 from databuilder.loader.file_system_elasticsearch_json_loader import FSElasticsearchJSONLoader
 from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
 from databuilder.publisher.elasticsearch_publisher import ElasticsearchPublisher
@@ -28,16 +29,22 @@ class BaseDataLoader(object):
         self.neo4j_conf = neo4j_conf
 
     def load(self, *args: Any, **kwargs: Any) -> None:
-        loading_job = self.create_extract_job(*args, **kwargs)
-        loading_job.launch()
-
-        self.create_last_updated_job().launch()
+        self.create_job_graph(*args, **kwargs).launch()
 
+    def create_job_graph(self, *args: Any, **kwargs: Any) -> JobGraph:
+        """
+        Last updated and Elasticsearch jobs both run once the extract job is published, concurrently with each other,
+        sharing Neo4j drivers.
+        """
         job_es_table = self.create_es_publisher_sample_job(
             elasticsearch_index_alias='table_search_index',
             elasticsearch_doc_type_key='table',
             model_name='databuilder.models.table_elasticsearch_document.TableESDocument')
-        job_es_table.launch()
+
+        return JobGraph() \
+            .add_job('extract', self.create_extract_job(*args, **kwargs)) \
+            .add_job('last_updated', self.create_last_updated_job(), depends_on=['extract']) \
+            .add_job('es_table', job_es_table, depends_on=['extract'])
 
     def create_extract_job(self, *args: Any, **kwargs: Any) -> DefaultJob:
         raise NotImplementedError
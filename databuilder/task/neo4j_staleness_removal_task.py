@@ -13,6 +13,7 @@ from typing import Any, Dict, Iterable
 from databuilder import Scoped
 from databuilder.publisher.neo4j_csv_publisher import JOB_PUBLISH_TAG
 from databuilder.task.base_task import Task
+from databuilder.utils import resource_pool
 
 # A end point for Neo4j e.g: bolt://localhost:9999
 NEO4J_END_POINT_KEY = 'neo4j_endpoint'
@@ -68,6 +69,15 @@ class Neo4jStalenessRemovalTask(Task):
     def get_scope(self) -> str:
         return 'task.remove_stale_data'
 
+    def close(self) -> None:
+        """
+        Closes the driver unless it's shared, in which case the pool it's shared from closes it.
+        :return:
+        """
+        if getattr(self, '_is_shared_driver', True):
+            return
+        self._driver.close()
+
     def init(self, conf: ConfigTree) -> None:
         conf = Scoped.get_scoped_conf(conf, self.get_scope()) \
             .with_fallback(conf) \
@@ -93,12 +103,18 @@ class Neo4jStalenessRemovalTask(Task):
 
         trust = neo4j.TRUST_SYSTEM_CA_SIGNED_CERTIFICATES if conf.get_bool(NEO4J_VALIDATE_SSL) \
             else neo4j.TRUST_ALL_CERTIFICATES
-        self._driver = \
-            GraphDatabase.driver(conf.get_string(NEO4J_END_POINT_KEY),
-                                 max_connection_life_time=conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC),
-                                 auth=(conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD)),
-                                 encrypted=conf.get_bool(NEO4J_ENCRYPTED),
-                                 trust=trust)
+        end_point = conf.get_string(NEO4J_END_POINT_KEY)
+        max_conn_life_time = conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC)
+        auth = (conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD))
+        encrypted = conf.get_bool(NEO4J_ENCRYPTED)
+        # Shared with other components connecting to the same Neo4j if they run together, e.g: in JobGraph
+        self._driver, self._is_shared_driver = resource_pool.get_or_create(
+            ('neo4j', end_point, max_conn_life_time, auth, encrypted, trust),
+            lambda: GraphDatabase.driver(end_point,
+                                         max_connection_life_time=max_conn_life_time,
+                                         auth=auth,
+                                         encrypted=encrypted,
+                                         trust=trust))
 
     def run(self) -> None:
         """
@@ -0,0 +1,139 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import queue
+import threading
+
+from pyhocon import ConfigTree
+from typing import Any, Iterator, List
+
+from databuilder.job.base_job import Job
+from databuilder.task.task import DefaultTask
+from databuilder.utils import stage_metrics
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Marks the end of records in a queue
+_END = object()
+# Seconds to wait on a full or empty queue before checking if the task is stopped
+_POLL_SEC = 0.1
+
+
+class PipelinedTask(DefaultTask):
+    """
+    Same as DefaultTask, but extractor, transformer and loader run concurrently, so that a slow extractor (e.g: of a
+    REST API) does not leave the loader idle and vice versa. Extractor and transformer run on their own thread and
+    pass records through bounded queues of QUEUE_SIZE records, while loader runs on the calling thread.
+
+    Each of extractor, transformer and loader is only called from one thread, and records are loaded in the order they
+    are extracted. If any of them fails, the others are stopped and the exception is raised from run. Extractor,
+    transformer and loader are closed once all of them are stopped.
+    """
+    # Config keys
+    # Maximum number of records buffered between extractor and transformer, and between transformer and loader
+    QUEUE_SIZE = 'queue_size'
+
+    def init(self, conf: ConfigTree) -> None:
+        super(PipelinedTask, self).init(conf)
+        self._queue_size = conf.get_int('{}.{}'.format(self.get_scope(), PipelinedTask.QUEUE_SIZE), 1000)
+
+    def run(self) -> None:
+        """
+        Runs a task
+        :return:
+        """
+        LOGGER.info('Running a pipelined task')
+        self._stopped = threading.Event()
+        self._errors: List[BaseException] = []
+        extracted: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        transformed: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        # What extractor and transformer register to Job.closer is closed along with the job
+        produce = Job.closer.bind(self._produce)
+        threads = [threading.Thread(target=produce, args=(self._extract(), extracted),
+                                    name='pipelined_task_extractor', daemon=True),
+                   threading.Thread(target=produce, args=(self._transform(extracted), transformed),
+                                    name='pipelined_task_transformer', daemon=True)]
+        try:
+            for thread in threads:
+                thread.start()
+
+            count = 0
+            load = self._metrics.stage(stage_metrics.LOAD)
+            for record in self._consume(transformed):
+                load.call(self.loader.load, record)
+                load.add_records(1)
+                count += 1
+                if count % self._progress_report_frequency == 0:
+                    LOGGER.info('Loaded {} records so far'.format(count))
+
+            if self._errors:
+                raise self._errors[0]
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+            self._closer.close()
+
+    def _extract(self) -> Iterator[Any]:
+        extract = self._metrics.stage(stage_metrics.EXTRACT)
+        record = extract.call(self.extractor.extract)
+        while record:
+            extract.add_records(1)
+            yield record
+            record = extract.call(self.extractor.extract)
+
+    def _transform(self, extracted: queue.Queue) -> Iterator[Any]:
+        transform = self._metrics.stage(stage_metrics.TRANSFORM)
+        for record in self._consume(extracted):
+            transform.add_records(1)
+            record = transform.call(self.transformer.transform, record)
+            if record:
+                yield record
+
+    def _produce(self, records: Iterator[Any], out: queue.Queue) -> None:
+        """
+        Puts records into the queue, followed by _END. Runs on a stage thread.
+        :param records:
+        :param out:
+        :return:
+        """
+        try:
+            for record in records:
+                if not self._put(out, record):
+                    return
+        except BaseException as e:
+            LOGGER.exception('Failed in {}'.format(threading.current_thread().name))
+            self._errors.append(e)
+            self._stopped.set()
+        finally:
+            self._put(out, _END)
+
+    def _put(self, out: queue.Queue, item: Any) -> bool:
+        """
+        :param out:
+        :param item:
+        :return: False if the task is stopped before the item is put
+        """
+        while not self._stopped.is_set():
+            try:
+                out.put(item, timeout=_POLL_SEC)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _consume(self, records: queue.Queue) -> Iterator[Any]:
+        """
+        :param records:
+        :return: Records from the queue until _END, or until the task is stopped
+        """
+        while not self._stopped.is_set():
+            try:
+                record = records.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                continue
+            if record is _END:
+                return
+            yield record
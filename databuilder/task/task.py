@@ -4,6 +4,7 @@
 import logging
 
 from pyhocon import ConfigTree
+from typing import Any, Tuple
 
 from databuilder import Scoped
 from databuilder.extractor.base_extractor import Extractor
@@ -12,7 +13,9 @@ from databuilder.task.base_task import Task
 from databuilder.transformer.base_transformer import Transformer
 from databuilder.transformer.base_transformer \
     import NoopTransformer
+from databuilder.utils import stage_metrics
 from databuilder.utils.closer import Closer
+from databuilder.utils.stage_metrics import StageMetrics
 
 
 LOGGER = logging.getLogger(__name__)
@@ -22,10 +25,15 @@ class DefaultTask(Task):
     """
     A default task expecting to extract, transform and load.
 
+    If extractor, transformer and loader all override the batch methods (extract_batch, transform_batch and
+    load_batch), records are passed in batches of BATCH_SIZE records instead of one by one. The single record path is
+    kept otherwise, as an extractor may not expect a record to be extracted before the previous one is loaded.
     """
 
     # Determines the frequency of the log on task progress
     PROGRESS_REPORT_FREQUENCY = 'progress_report_frequency'
+    # Maximum number of records per batch when all components support batches
+    BATCH_SIZE = 'batch_size'
 
     def __init__(self,
                  extractor: Extractor,
@@ -43,6 +51,9 @@ class DefaultTask(Task):
     def init(self, conf: ConfigTree) -> None:
         self._progress_report_frequency = \
             conf.get_int('{}.{}'.format(self.get_scope(), DefaultTask.PROGRESS_REPORT_FREQUENCY), 500)
+        self._batch_size = conf.get_int('{}.{}'.format(self.get_scope(), DefaultTask.BATCH_SIZE), 1000)
+        # Time spent in extractor, transformer and loader is recorded into the metrics of the job
+        self._metrics = stage_metrics.get_job_metrics()
 
         self.extractor.init(Scoped.get_scoped_conf(conf, self.extractor.get_scope()))
         self.transformer.init(Scoped.get_scoped_conf(conf, self.transformer.get_scope()))
@@ -54,19 +65,68 @@ class DefaultTask(Task):
         :return:
         """
         LOGGER.info('Running a task')
+        if self.is_batch_supported():
+            self._run_batches()
+            return
+
+        extract, transform, load = self._get_stage_metrics()
         try:
-            record = self.extractor.extract()
+            record = extract.call(self.extractor.extract)
             count = 1
             while record:
-                record = self.transformer.transform(record)
+                extract.add_records(1)
+                transform.add_records(1)
+                record = transform.call(self.transformer.transform, record)
                 if not record:
-                    record = self.extractor.extract()
+                    record = extract.call(self.extractor.extract)
                     continue
-                self.loader.load(record)
-                record = self.extractor.extract()
+                load.call(self.loader.load, record)
+                load.add_records(1)
+                record = extract.call(self.extractor.extract)
                 count += 1
                 if count > 0 and count % self._progress_report_frequency == 0:
                     LOGGER.info('Extracted {} records so far'.format(count))
 
         finally:
             self._closer.close()
+
+    def is_batch_supported(self) -> bool:
+        """
+        :return: True if extractor, transformer and loader all override the batch methods
+        """
+        return _overrides(self.extractor, Extractor, 'extract_batch') and \
+            _overrides(self.transformer, Transformer, 'transform_batch') and \
+            _overrides(self.loader, Loader, 'load_batch')
+
+    def _run_batches(self) -> None:
+        LOGGER.info('Running a task in batches of {} records'.format(self._batch_size))
+        extract, transform, load = self._get_stage_metrics()
+        try:
+            count = 0
+            records = extract.call(self.extractor.extract_batch, self._batch_size)
+            while records:
+                count += len(records)
+                extract.add_records(len(records))
+                transform.add_records(len(records))
+                transformed = transform.call(self.transformer.transform_batch, records)
+                if transformed:
+                    load.call(self.loader.load_batch, transformed)
+                    load.add_records(len(transformed))
+                if count // self._progress_report_frequency > (count - len(records)) // self._progress_report_frequency:
+                    LOGGER.info('Extracted {} records so far'.format(count))
+                records = extract.call(self.extractor.extract_batch, self._batch_size)
+
+        finally:
+            self._closer.close()
+
+    def _get_stage_metrics(self) -> Tuple[StageMetrics, StageMetrics, StageMetrics]:
+        """
+        :return: Metrics of extract, transform and load stages
+        """
+        return self._metrics.stage(stage_metrics.EXTRACT), self._metrics.stage(stage_metrics.TRANSFORM), \
+            self._metrics.stage(stage_metrics.LOAD)
+
+
+def _overrides(component: Any, base_class: type, method_name: str) -> bool:
+    return isinstance(component, base_class) and \
+        getattr(type(component), method_name) is not getattr(base_class, method_name)
@@ -4,7 +4,7 @@
 import abc
 
 from pyhocon import ConfigTree
-from typing import Any, Iterable, Optional
+from typing import Any, Iterable, List, Optional
 
 from databuilder import Scoped
 
@@ -21,6 +21,20 @@ class Transformer(Scoped):
     def transform(self, record: Any) -> Any:
         pass
 
+    def transform_batch(self, records: List[Any]) -> List[Any]:
+        """
+        Transforms records at once. By default it calls transform, and transformers can override it to transform
+        records in bulk. See DefaultTask.
+        :param records:
+        :return: Transformed records in the same order, without the ones filtered out
+        """
+        transformed: List[Any] = []
+        for record in records:
+            record = self.transform(record)
+            if record:
+                transformed.append(record)
+        return transformed
+
 
 class NoopTransformer(Transformer):
     """
@@ -33,6 +47,9 @@ class NoopTransformer(Transformer):
     def transform(self, record: Any) -> Any:
         return record
 
+    def transform_batch(self, records: List[Any]) -> List[Any]:
+        return records
+
     def get_scope(self) -> str:
         pass
 
@@ -62,6 +79,14 @@ class ChainedTransformer(Transformer):
 
         return record
 
+    def transform_batch(self, records: List[Any]) -> List[Any]:
+        for t in self.transformers:
+            records = t.transform_batch(records)
+            if not records:
+                break
+
+        return records
+
     def get_scope(self) -> str:
         return 'transformer.chained'
 
@@ -0,0 +1,176 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import io
+import logging
+import time
+from operator import itemgetter
+
+from typing import IO, Any, List, Mapping, Sequence
+
+from databuilder.utils import csv_compression
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of rows buffered before the first flush, when average row size is not known yet
+_INITIAL_ROW_LIMIT = 1000
+
+
+class BufferedCsvWriter(object):
+    """
+    A CSV file writer that takes dict rows like csv.DictWriter with QUOTE_NONNUMERIC, but buffers them in memory and
+    writes them in bulk with writerows once the buffer reaches byte budget.
+
+    Rows are converted into a list of values in the order of the header by a precomputed itemgetter, instead of
+    DictWriter validating the keys of every row. The byte size of the buffer is estimated from the average row size of
+    the flushes so far, so that the values do not need to be measured per row.
+
+    The file is compressed if its path has an extension of csv_compression, e.g: '.csv.gz'.
+
+    Subclasses can write other formats by overriding _open_file, _format_header and _format_rows.
+    """
+
+    def __init__(self,
+                 path: str,
+                 fieldnames: Sequence[str],
+                 byte_budget: int) -> None:
+        """
+        Opens the file and writes the header.
+        :param path: Path of CSV file
+        :param fieldnames: Header
+        :param byte_budget: Approximate bytes of rows buffered before being written. 0 writes every row immediately.
+        """
+        self.path = path
+        # Kept as is if it's a tuple, so that the caller can tell if a row has the same header by identity
+        self.header = fieldnames if isinstance(fieldnames, tuple) else tuple(fieldnames)
+        self.rows = 0
+        self.flush_sec = 0.0
+
+        # Buffered rows are formatted here first, which also tells their size as compressed file is not seekable
+        self._buffer_file = io.StringIO()
+        self._buffer_writer = csv.writer(self._buffer_file, quoting=csv.QUOTE_NONNUMERIC)
+        self._file = self._open_file(path)
+        self._file.write(self._format_header(self.header))
+        fields = list(fieldnames)
+        self._get_values = itemgetter(*fields) if len(fields) > 1 else lambda row: (row[fields[0]],)
+
+        self._byte_budget = byte_budget
+        self._row_limit = _INITIAL_ROW_LIMIT
+        self._buffer: List[Any] = []
+        self._bytes_written = 0
+        self._rows_written = 0
+        self._start_time = time.time()
+        self._end_time = 0.0
+
+    def writerow(self, row: Mapping[str, Any]) -> None:
+        """
+        :param row: A dict whose keys are the header
+        :return:
+        """
+        self.writerow_values(self._get_values(row))
+
+    def get_values(self, row: Mapping[str, Any]) -> Sequence[Any]:
+        """
+        :param row: A dict whose keys are the header
+        :return: Values of the row in the order of the header
+        """
+        return self._get_values(row)
+
+    def writerow_values(self, values: Sequence[Any]) -> None:
+        """
+        :param values: Values of a row in the order of the header
+        :return:
+        """
+        self.rows += 1
+        if not self._byte_budget:
+            chunk = self._format_rows([values])
+            self._file.write(chunk)
+            self._bytes_written += len(chunk)
+            self._rows_written += 1
+            return
+
+        self._buffer.append(values)
+        if len(self._buffer) >= self._row_limit:
+            self.flush()
+
+    def writerows_values(self, rows: List[Sequence[Any]]) -> None:
+        """
+        Same as writerow_values, but for multiple rows at once. The rows are written with a single write if the byte
+        budget is 0.
+        :param rows: Values of rows in the order of the header
+        :return:
+        """
+        self.rows += len(rows)
+        if not self._byte_budget:
+            chunk = self._format_rows(rows)
+            self._file.write(chunk)
+            self._bytes_written += len(chunk)
+            self._rows_written += len(rows)
+            return
+
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self._row_limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes buffered rows into the file.
+        :return:
+        """
+        if not self._buffer:
+            return
+
+        flush_start = time.time()
+        chunk = self._format_rows(self._buffer)
+        self._file.write(chunk)
+        self._bytes_written += len(chunk)
+        self._rows_written += len(self._buffer)
+        self._buffer = []
+
+        row_size = max(self._bytes_written // self._rows_written, 1)
+        self._row_limit = max(self._byte_budget // row_size, 1)
+        self.flush_sec += time.time() - flush_start
+
+    def _open_file(self, path: str) -> IO[Any]:
+        return csv_compression.open_text(path, 'w')
+
+    def _format_header(self, header: Sequence[str]) -> Any:
+        return self._format_rows([header])
+
+    def _format_rows(self, rows: List[Sequence[Any]]) -> Any:
+        """
+        :param rows: Rows to write, each a sequence of values in the order of the header
+        :return: Chunk of the file for the rows
+        """
+        self._buffer_writer.writerows(rows)
+        chunk = self._buffer_file.getvalue()
+        self._buffer_file.seek(0)
+        self._buffer_file.truncate()
+        return chunk
+
+    @property
+    def bytes_written(self) -> int:
+        """
+        :return: Bytes (characters for CSV) of rows written so far, before compression
+        """
+        return self._bytes_written
+
+    @property
+    def rows_per_sec(self) -> float:
+        """
+        :return: Rows per second from when the file was opened to when it was closed, or to now if it's still open
+        """
+        elapsed = (self._end_time or time.time()) - self._start_time
+        return self.rows / elapsed if elapsed else 0.0
+
+    def close(self) -> None:
+        """
+        Flushes buffered rows and closes the file.
+        :return:
+        """
+        self.flush()
+        self._file.close()
+        self._end_time = time.time()
+        LOGGER.info('Wrote {} rows into {} ({:.1f} rows/sec, {:.2f} seconds flushing)'
+                    .format(self.rows, self.path, self.rows_per_sec, self.flush_sec))
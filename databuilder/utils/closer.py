@@ -2,8 +2,9 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import atexit
+import threading
 
-from typing import Callable, List
+from typing import Any, Callable, List
 
 
 class Closer(object):
@@ -52,3 +53,44 @@ class Closer(object):
 
         if last_exception:
             raise last_exception
+
+
+class ThreadLocalCloser(Closer):
+    """
+    Same as Closer, but keeps callables registered on each thread separately, and closes the ones registered on the
+    calling thread, so that jobs running concurrently on threads (see JobGraph) only close their own.
+
+    A thread started by a job for its own work (e.g: a stage of PipelinedTask) should run its target wrapped by bind,
+    so that what it registers is closed along with the job, rather than kept on a thread nobody closes.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        atexit.register(self.close)
+
+    @property
+    def _stack(self) -> List:  # type: ignore
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def bind(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        :param func: Function to run on another thread
+        :return: Function that runs func with callables it registers being registered on the thread calling bind
+        """
+        stack = self._stack
+
+        def bound(*args: Any, **kwargs: Any) -> Any:
+            previous = getattr(self._local, 'stack', None)
+            self._local.stack = stack
+            try:
+                return func(*args, **kwargs)
+            finally:
+                # Pool threads can run functions bound to different threads
+                if previous is None:
+                    del self._local.stack
+                else:
+                    self._local.stack = previous
+
+        return bound
@@ -0,0 +1,77 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import bz2
+import gzip
+import lzma
+
+from typing import IO, Any, Callable, Dict, Optional, Tuple
+
+# Compression of intermediate CSV files written by FsNeo4jCSVLoader. Only codecs of the standard library are
+# supported so that no extra dependency is needed to publish the files.
+NONE = 'none'
+GZIP = 'gzip'
+BZ2 = 'bz2'
+LZMA = 'lzma'
+
+# Compression -> (file extension, function that opens the file in the mode, e.g: 'rt', 'wb')
+_CODECS: Dict[str, Tuple[str, Callable[..., IO[Any]]]] = {
+    # Level 6 is much faster than the default level 9 of gzip, and compresses CSV almost as well
+    GZIP: ('.gz', lambda path, mode: gzip.open(path, mode, compresslevel=6, encoding=_get_encoding(mode))),
+    BZ2: ('.bz2', lambda path, mode: bz2.open(path, mode, encoding=_get_encoding(mode))),
+    LZMA: ('.xz', lambda path, mode: lzma.open(path, mode, encoding=_get_encoding(mode))),
+}
+
+
+def _get_encoding(mode: str) -> Optional[str]:
+    return 'utf8' if 't' in mode else None
+
+
+def get_extension(compression: str) -> str:
+    """
+    :param compression: One of NONE, GZIP, BZ2, LZMA
+    :return: File extension of the compression, e.g: '.gz'. Empty string for NONE.
+    """
+    if compression == NONE:
+        return ''
+    if compression not in _CODECS:
+        raise ValueError('Unsupported compression {}. Supported: {}'
+                         .format(compression, [NONE] + list(_CODECS.keys())))
+    return _CODECS[compression][0]
+
+
+def strip_extension(path: str) -> str:
+    """
+    :param path:
+    :return: The path without compression extension, e.g: 'foo.csv.gz' -> 'foo.csv'
+    """
+    for extension, _ in _CODECS.values():
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+
+def open_text(path: str, mode: str = 'r') -> IO[Any]:
+    """
+    Opens a file in text mode, compressing or decompressing it transparently by its extension.
+    :param path:
+    :param mode: 'r' or 'w'
+    :return: A text file object
+    """
+    for extension, open_func in _CODECS.values():
+        if path.endswith(extension):
+            return open_func(path, mode + 't')
+    return open(path, mode, encoding='utf8')
+
+
+def open_binary(path: str, mode: str = 'r') -> IO[Any]:
+    """
+    Opens a file in binary mode, compressing or decompressing it transparently by its extension.
+    :param path:
+    :param mode: 'r' or 'w'
+    :return: A binary file object
+    """
+    for extension, open_func in _CODECS.values():
+        if path.endswith(extension):
+            return open_func(path, mode + 'b')
+    return open(path, mode + 'b')
@@ -0,0 +1,90 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+from collections import OrderedDict
+
+from typing import Hashable
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 100000
+
+
+class DedupeCache(object):
+    """
+    Remembers nodes and relations that have been emitted, so that a model can suppress ones that repeat across
+    records, e.g: Database, Cluster, Schema and Tag nodes repeated for every table.
+
+    It's bounded by max size, evicting the least recently seen key, so a node evicted may be emitted again. That's
+    harmless as the publisher merges it, while keeping memory of a long running process bounded. For exact
+    de-duplication of every row written, the loader uses Neo4jCsvDeduper instead (see there for which to use when).
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """
+        :param max_size: Maximum number of keys remembered
+        """
+        self._max_size = max_size
+        self._keys: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_duplicate(self, key: Hashable) -> bool:
+        """
+        Records the key as seen.
+        :param key: A tuple that identifies a node or relation, e.g: (label, key)
+        :return: True if the key has been seen before
+        """
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            self._keys[key] = None
+            if len(self._keys) > self._max_size:
+                self._keys.popitem(last=False)
+                self.evictions += 1
+            return False
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def log_stats(self) -> None:
+        LOGGER.info('De-duplicated {} of {} nodes and relations ({:.1%} hit rate), {} keys remembered, {} evicted'
+                    .format(self.hits, self.hits + self.misses, self.hit_rate, len(self._keys), self.evictions))
+
+
+# Cache of the job currently running on each thread (see JobGraph), which is replaced at the start of each job so that
+# nothing is kept across jobs
+_local = threading.local()
+
+
+def get_dedupe_cache() -> DedupeCache:
+    """
+    :return: De-dupe cache of the job currently running on this thread
+    """
+    cache = getattr(_local, 'cache', None)
+    if cache is None:
+        cache = reset_dedupe_cache()
+    return cache
+
+
+def reset_dedupe_cache(max_size: int = DEFAULT_MAX_SIZE) -> DedupeCache:
+    """
+    Replaces the de-dupe cache of this thread with an empty one. Called by the job when it starts and finishes.
+    :param max_size:
+    :return: The new cache
+    """
+    _local.cache = DedupeCache(max_size)
+    return _local.cache
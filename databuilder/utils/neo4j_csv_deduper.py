@@ -0,0 +1,163 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+
+from typing import Any, Callable, Dict, Mapping, Optional, Set
+
+from databuilder.models.neo4j_csv_serde import NODE_LABEL, NODE_KEY, \
+    RELATION_START_KEY, RELATION_END_KEY, RELATION_TYPE
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _SpillableKeySet(object):
+    """
+    Set of string keys that keeps at most max_keys_in_memory keys in memory. Once it exceeds, keys in memory are moved
+    into a SQLite database on disk, which is then looked up for keys not found in memory.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_keys_in_memory: int,
+                 spill_dir_func: Callable[[], str]) -> None:
+        self._name = name
+        self._max_keys_in_memory = max_keys_in_memory
+        self._spill_dir_func = spill_dir_func
+        self._keys: Set[str] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self.spilled_keys = 0
+
+    def add(self, key: str) -> bool:
+        """
+        :param key:
+        :return: True if the key was not in the set
+        """
+        if key in self._keys:
+            return False
+        if self._db is not None and \
+                self._db.execute('SELECT 1 FROM keys WHERE key = ?', (key,)).fetchone() is not None:
+            return False
+
+        self._keys.add(key)
+        if len(self._keys) > self._max_keys_in_memory:
+            self._spill()
+        return True
+
+    def _spill(self) -> None:
+        if self._db is None:
+            self._db = sqlite3.connect(os.path.join(self._spill_dir_func(), '{}.db'.format(self._name)))
+            self._db.execute('PRAGMA journal_mode = OFF')
+            self._db.execute('PRAGMA synchronous = OFF')
+            self._db.execute('CREATE TABLE keys (key TEXT PRIMARY KEY) WITHOUT ROWID')
+
+        self._db.executemany('INSERT INTO keys VALUES (?)', ((key,) for key in self._keys))
+        self._db.commit()
+        LOGGER.info('Spilled {} {} keys to disk'.format(len(self._keys), self._name))
+        self.spilled_keys += len(self._keys)
+        self._keys = set()
+
+    def close(self) -> None:
+        self._keys = set()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class Neo4jCsvDeduper(object):
+    """
+    Suppresses node rows of the same (LABEL, KEY) and relation rows of the same (START_KEY, END_KEY, TYPE) that
+    have been seen already, e.g: a User node emitted for every usage record, so that they are not written and merged
+    again by the publisher. The first row wins, so it should only be used where duplicate rows have the same
+    properties.
+
+    Unlike DedupeCache, which forgets keys to stay bounded, it remembers every key, keeping at most
+    max_keys_in_memory keys per set in memory and the rest on disk.
+
+    The two are different layers, not alternatives:
+    - DedupeCache is what models use, when they know a node or relation repeats across records (e.g: Database and
+      Schema of every table), to skip creating it. It's always on and best effort.
+    - Neo4jCsvDeduper is only used by FsNeo4jCSVLoader with its DEDUPE config, to drop any row it has already
+      written, including rows of models that don't use DedupeCache and rows DedupeCache has evicted. It's opt-in as
+      it's exact, at the cost of remembering every key of the job.
+    Models should not use Neo4jCsvDeduper, and the loader should not use DedupeCache.
+    """
+    # Separates fields of a key, which should not be in labels and keys
+    _KEY_SEPARATOR = '\x1f'
+
+    def __init__(self,
+                 max_keys_in_memory: int,
+                 spill_dir: Optional[str] = None) -> None:
+        """
+        :param max_keys_in_memory: Maximum number of node keys, and relation keys, kept in memory
+        :param spill_dir: Directory to create a temporary directory to spill into, which is deleted on close. System
+        temporary directory if not set.
+        """
+        self._spill_parent_dir = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._nodes = _SpillableKeySet('nodes', max_keys_in_memory, self._get_spill_dir)
+        self._relations = _SpillableKeySet('relations', max_keys_in_memory, self._get_spill_dir)
+        # Number of suppressed rows by node label or relation type
+        self._suppressed_nodes: Counter = Counter()
+        self._suppressed_relations: Counter = Counter()
+
+    def _get_spill_dir(self) -> str:
+        if not self._spill_dir:
+            if self._spill_parent_dir:
+                os.makedirs(self._spill_parent_dir, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix='neo4j_csv_deduper_', dir=self._spill_parent_dir)
+        return self._spill_dir
+
+    def is_duplicate_node(self, node: Mapping[str, Any]) -> bool:
+        """
+        :param node: A node row from Neo4jCsvSerializable.next_node()
+        :return: True if a node of the same label and key has been seen
+        """
+        label = node[NODE_LABEL]
+        if self._nodes.add('{}{}{}'.format(label, Neo4jCsvDeduper._KEY_SEPARATOR, node[NODE_KEY])):
+            return False
+        self._suppressed_nodes[label] += 1
+        return True
+
+    def is_duplicate_relation(self, relation: Mapping[str, Any]) -> bool:
+        """
+        :param relation: A relation row from Neo4jCsvSerializable.next_relation()
+        :return: True if a relation of the same start key, end key and type has been seen
+        """
+        relation_type = relation[RELATION_TYPE]
+        if self._relations.add('{1}{0}{2}{0}{3}'.format(Neo4jCsvDeduper._KEY_SEPARATOR, relation[RELATION_START_KEY],
+                                                        relation[RELATION_END_KEY], relation_type)):
+            return False
+        self._suppressed_relations[relation_type] += 1
+        return True
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        :return: Number of suppressed rows by node label and by relation type, and number of keys spilled to disk
+        """
+        return {'suppressed_nodes': dict(self._suppressed_nodes),
+                'suppressed_relations': dict(self._suppressed_relations),
+                'spilled_keys': self._nodes.spilled_keys + self._relations.spilled_keys}
+
+    def log_report(self) -> None:
+        report = self.get_report()
+        LOGGER.info('Suppressed {} duplicate nodes {} and {} duplicate relations {}, spilled {} keys to disk'
+                    .format(sum(self._suppressed_nodes.values()), report['suppressed_nodes'],
+                            sum(self._suppressed_relations.values()), report['suppressed_relations'],
+                            report['spilled_keys']))
+
+    def close(self) -> None:
+        """
+        Releases the keys and deletes spilled keys.
+        :return:
+        """
+        self._nodes.close()
+        self._relations.close()
+        if self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
@@ -0,0 +1,71 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+from typing import Any, Dict, List, Optional
+
+# A manifest describes the CSV files of a node or relation directory, so that the consumer, Neo4jCsvPublisher, knows
+# labels, header and number of rows of each file without parsing it.
+MANIFEST_FILE_NAME = '_manifest.json'
+
+# A directory can be partitioned into sub directories of this prefix followed by partition number, e.g: part-0007, where
+# each partition is written by a different loader and has its own manifest.
+PARTITION_DIR_PREFIX = 'part-'
+
+# Manifest entry keys
+FILE = 'file'
+HEADER = 'header'
+ROW_COUNT = 'row_count'
+# For node file
+LABEL = 'label'
+# For relation file
+START_LABEL = 'start_label'
+END_LABEL = 'end_label'
+TYPE = 'type'
+
+
+def write_manifest(dir_path: str, entries: List[Dict[str, Any]]) -> None:
+    """
+    Writes manifest into the directory.
+    :param dir_path:
+    :param entries: A list of dict where each dict describes a file with above entry keys. FILE is a file name
+    relative to dir_path
+    :return:
+    """
+    with open(os.path.join(dir_path, MANIFEST_FILE_NAME), 'w', encoding='utf8') as manifest_file:
+        json.dump({'files': entries}, manifest_file)
+
+
+def read_manifest(dir_path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Reads manifest from the directory.
+    :param dir_path:
+    :return: A dict of file path to manifest entry, or None if the directory does not have manifest
+    """
+    path = os.path.join(dir_path, MANIFEST_FILE_NAME)
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, 'r', encoding='utf8') as manifest_file:
+        entries = json.load(manifest_file)['files']
+    return {os.path.join(dir_path, entry[FILE]): entry for entry in entries}
+
+
+def get_partition_dir(dir_path: str, partition: int) -> str:
+    """
+    :param dir_path:
+    :param partition: Partition number
+    :return: Path of the partition sub directory, e.g: dir_path/part-0007
+    """
+    return os.path.join(dir_path, '{}{:04d}'.format(PARTITION_DIR_PREFIX, partition))
+
+
+def list_partition_dirs(dir_path: str) -> List[str]:
+    """
+    :param dir_path:
+    :return: Paths of partition sub directories of the directory, sorted by partition
+    """
+    return sorted(os.path.join(dir_path, name) for name in os.listdir(dir_path)
+                  if name.startswith(PARTITION_DIR_PREFIX) and os.path.isdir(os.path.join(dir_path, name)))
@@ -0,0 +1,81 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Binary alternative to the intermediate CSV files of FsNeo4jCSVLoader, which Neo4jCsvPublisher reads without text
+escaping and parsing. It also keeps the type of values (str, int, float, bool and None), so that unquoted values do
+not need to be parsed back from text.
+
+A record file is made of MAGIC, a pickle of the header, then pickles of chunks of rows, where a chunk is a list of
+rows and a row is a tuple of values in the order of the header. Values of other types are written as str. As it's
+pickle, only read files written by the loader of the job.
+"""
+
+import pickle
+from contextlib import contextmanager
+
+from typing import IO, Any, Iterator, List, Sequence, Tuple
+
+from databuilder.utils import csv_compression
+from databuilder.utils.buffered_csv_writer import BufferedCsvWriter
+
+EXTENSION = '.rec'
+MAGIC = b'NEO4JREC\x01'
+# Protocol 4 is available since Python 3.4, so that the loader and publisher can run on different Python versions
+PICKLE_PROTOCOL = 4
+
+_PRIMITIVE_TYPES = frozenset([str, int, float, bool, type(None)])
+
+
+def is_record_file(path: str) -> bool:
+    """
+    :param path:
+    :return: True if the path is a record file, which can be compressed, e.g: 'foo.rec', 'foo.rec.gz'
+    """
+    return csv_compression.strip_extension(path).endswith(EXTENSION)
+
+
+class BufferedRecordFileWriter(BufferedCsvWriter):
+    """
+    Same as BufferedCsvWriter, but writes a record file, where a flush pickles the buffered rows at once.
+    """
+
+    def _open_file(self, path: str) -> IO[Any]:
+        return csv_compression.open_binary(path, 'w')
+
+    def _format_header(self, header: Sequence[str]) -> bytes:
+        return MAGIC + pickle.dumps(list(header), protocol=PICKLE_PROTOCOL)
+
+    def _format_rows(self, rows: List[Sequence[Any]]) -> bytes:
+        return pickle.dumps([_to_primitive_row(row) for row in rows], protocol=PICKLE_PROTOCOL)
+
+
+def _to_primitive_row(row: Sequence[Any]) -> Tuple[Any, ...]:
+    for value in row:
+        if type(value) not in _PRIMITIVE_TYPES:
+            return tuple(value if type(value) in _PRIMITIVE_TYPES else str(value) for value in row)
+    return tuple(row)
+
+
+@contextmanager
+def read_rows(path: str) -> Iterator[Tuple[List[str], Iterator[Tuple[Any, ...]]]]:
+    """
+    Opens a record file.
+    :param path:
+    :return: Header, and iterator of the rows in the file, each a tuple of values in the order of the header
+    """
+    with csv_compression.open_binary(path, 'r') as record_file:
+        if record_file.read(len(MAGIC)) != MAGIC:
+            raise Exception('{} is not a record file'.format(path))
+        header = pickle.load(record_file)
+        yield header, _iterate_rows(record_file)
+
+
+def _iterate_rows(record_file: IO[Any]) -> Iterator[Tuple[Any, ...]]:
+    # Each chunk is loaded separately, as memo of unpickler is not valid across pickles
+    while True:
+        try:
+            rows = pickle.load(record_file)
+        except EOFError:
+            return
+        yield from rows
@@ -0,0 +1,195 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import logging
+import os
+import shutil
+import tempfile
+
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from databuilder.models.neo4j_csv_serde import NODE_LABEL, \
+    RELATION_START_LABEL, RELATION_END_LABEL, RELATION_TYPE
+from databuilder.utils import neo4j_csv_manifest
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Group(object):
+    """
+    Rows of the same label (or relation labels and type) and header, i.e: what would be a CSV file of
+    FsNeo4jCSVLoader.
+    """
+
+    def __init__(self, name: str, header: List[str], entry: Dict[str, Any]) -> None:
+        self.name = name
+        self.header = header
+        self.entry = entry
+        # Rows in memory, each a tuple of values in the order of the header
+        self.rows: List[Tuple[str, ...]] = []
+        # Rows that have been spilled to disk precede the rows in memory
+        self.spill_path: Optional[str] = None
+        self.spill_file: Optional[IO[Any]] = None
+        self.spill_writer: Any = None
+
+
+class Neo4jRecordSpool(object):
+    """
+    Keeps node and relation rows of Neo4jCsvSerializable in memory, grouped the same way FsNeo4jCSVLoader groups
+    them into CSV files, so that Neo4jCsvPublisher can publish them without writing and parsing CSV files.
+
+    A row is kept as a tuple of its values with the header shared by the group, and values are converted to string
+    the same way as they are written to and read back from CSV. Once the rows in memory exceed the spill threshold,
+    they are appended to a CSV file per group in the spill directory, and the group is read back from that file
+    followed by the rows still in memory.
+    """
+
+    def __init__(self,
+                 spill_threshold_bytes: int,
+                 spill_dir: Optional[str] = None) -> None:
+        """
+        :param spill_threshold_bytes: Approximate bytes of values kept in memory before spilling to disk
+        :param spill_dir: Directory to create a temporary directory to spill into, which is deleted on close. System
+        temporary directory if not set.
+        """
+        self._spill_threshold_bytes = spill_threshold_bytes
+        self._spill_parent_dir = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._node_groups: Dict[Tuple, _Group] = {}
+        self._relation_groups: Dict[Tuple, _Group] = {}
+        self._groups_by_name: Dict[str, _Group] = {}
+        self._bytes_in_memory = 0
+        self.spilled_rows = 0
+
+    def add_node(self, node_dict: Dict[str, Any]) -> None:
+        """
+        :param node_dict: A node row from Neo4jCsvSerializable.next_node()
+        :return:
+        """
+        key = (node_dict[NODE_LABEL], len(node_dict))
+        group = self._node_groups.get(key)
+        if group is None:
+            group = self._create_group('nodes/{}_{}'.format(*key), node_dict)
+            self._node_groups[key] = group
+        self._add(group, node_dict)
+
+    def add_relation(self, relation_dict: Dict[str, Any]) -> None:
+        """
+        :param relation_dict: A relation row from Neo4jCsvSerializable.next_relation()
+        :return:
+        """
+        key = (relation_dict[RELATION_START_LABEL],
+               relation_dict[RELATION_END_LABEL],
+               relation_dict[RELATION_TYPE],
+               len(relation_dict))
+        group = self._relation_groups.get(key)
+        if group is None:
+            group = self._create_group('relations/{}_{}_{}_{}'.format(*key), relation_dict)
+            self._relation_groups[key] = group
+        self._add(group, relation_dict)
+
+    def _create_group(self, name: str, row: Dict[str, Any]) -> _Group:
+        header = list(row.keys())
+        entry = {neo4j_csv_manifest.FILE: name,
+                 neo4j_csv_manifest.HEADER: header,
+                 neo4j_csv_manifest.ROW_COUNT: 0}
+        if NODE_LABEL in row:
+            entry[neo4j_csv_manifest.LABEL] = row[NODE_LABEL]
+        else:
+            entry[neo4j_csv_manifest.START_LABEL] = row[RELATION_START_LABEL]
+            entry[neo4j_csv_manifest.END_LABEL] = row[RELATION_END_LABEL]
+            entry[neo4j_csv_manifest.TYPE] = row[RELATION_TYPE]
+
+        group = _Group(name, header, entry)
+        self._groups_by_name[name] = group
+        return group
+
+    def _add(self, group: _Group, row: Dict[str, Any]) -> None:
+        # Same as csv writer, which writes None as empty string and str() of other values
+        values = tuple('' if row[k] is None else str(row[k]) for k in group.header)
+        group.rows.append(values)
+        group.entry[neo4j_csv_manifest.ROW_COUNT] += 1
+
+        self._bytes_in_memory += sum(map(len, values))
+        if self._bytes_in_memory > self._spill_threshold_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        """
+        Appends rows in memory of every group into its spill file.
+        :return:
+        """
+        if not self._spill_dir:
+            if self._spill_parent_dir:
+                os.makedirs(self._spill_parent_dir, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix='neo4j_record_spool_', dir=self._spill_parent_dir)
+
+        rows = 0
+        for group in self._groups_by_name.values():
+            if not group.rows:
+                continue
+            if group.spill_file is None:
+                group.spill_path = os.path.join(self._spill_dir, '{}.csv'.format(group.name.replace('/', '_')))
+                group.spill_file = open(group.spill_path, 'w', encoding='utf8')
+                group.spill_writer = csv.writer(group.spill_file, quoting=csv.QUOTE_ALL)
+            group.spill_writer.writerows(group.rows)
+            rows += len(group.rows)
+            group.rows = []
+
+        LOGGER.info('Spilled {} rows ({} bytes) into {}'.format(rows, self._bytes_in_memory, self._spill_dir))
+        self.spilled_rows += rows
+        self._bytes_in_memory = 0
+
+    def get_node_groups(self) -> List[str]:
+        """
+        :return: Names of node groups, which are used like CSV file paths by the publisher
+        """
+        return [group.name for group in self._node_groups.values()]
+
+    def get_relation_groups(self) -> List[str]:
+        """
+        :return: Names of relation groups
+        """
+        return [group.name for group in self._relation_groups.values()]
+
+    def get_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: Manifest entry of every group by its name, in the same format as neo4j_csv_manifest.read_manifest()
+        """
+        return {name: group.entry for name, group in self._groups_by_name.items()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._groups_by_name
+
+    def read(self, name: str) -> Iterator[Dict[str, str]]:
+        """
+        :param name: Name of the group
+        :return: Iterator of the rows of the group in the order they were added, as dict of header to value
+        """
+        group = self._groups_by_name[name]
+        header = group.header
+        if group.spill_file is not None:
+            group.spill_file.flush()
+            with open(group.spill_path, 'r', encoding='utf8') as spill_file:  # type: ignore
+                for values in csv.reader(spill_file):
+                    yield dict(zip(header, values))
+
+        for row in group.rows:
+            yield dict(zip(header, row))
+
+    def close(self) -> None:
+        """
+        Releases the rows and deletes spill files.
+        :return:
+        """
+        for group in self._groups_by_name.values():
+            if group.spill_file is not None:
+                group.spill_file.close()
+        self._node_groups = {}
+        self._relation_groups = {}
+        self._groups_by_name = {}
+
+        if self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
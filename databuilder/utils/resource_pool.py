@@ -0,0 +1,89 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ResourcePool(object):
+    """
+    Clients (e.g: Neo4j driver) shared by the components of jobs that run together, e.g: in a JobGraph, so that each
+    component does not open and close its own connections. A client is created by the first component that asks for
+    it, and closed when the pool is closed.
+    """
+
+    def __init__(self) -> None:
+        self._resources: Dict[Hashable, Any] = {}
+        self._order: List[Hashable] = []
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        :param key: Identifies the client by what it connects to, e.g: ('neo4j', endpoint, user, ...)
+        :param factory: Creates the client if there's none of the key yet
+        :return:
+        """
+        with self._lock:
+            if key not in self._resources:
+                self._resources[key] = factory()
+                self._order.append(key)
+            return self._resources[key]
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def close(self) -> None:
+        """
+        Closes clients in reverse order of creation.
+        :return:
+        """
+        with self._lock:
+            while self._order:
+                resource = self._resources.pop(self._order.pop())
+                try:
+                    if hasattr(resource, 'close'):
+                        resource.close()
+                except Exception:
+                    LOGGER.exception('Failed to close {}'.format(resource))
+
+
+# Pool of the jobs currently running together, if any
+_pool: Optional[ResourcePool] = None
+
+
+@contextmanager
+def shared_resources() -> Iterator[ResourcePool]:
+    """
+    Shares clients created through get_or_create within the context, and closes them at the end.
+    :return:
+    """
+    global _pool
+    if _pool is not None:
+        # Already shared by an outer context, which closes them
+        yield _pool
+        return
+
+    _pool = ResourcePool()
+    try:
+        yield _pool
+    finally:
+        pool, _pool = _pool, None
+        pool.close()
+
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Tuple[Any, bool]:
+    """
+    Used by components to create a client, which is shared if within shared_resources.
+    :param key: Identifies the client by what it connects to
+    :param factory:
+    :return: Client, and True if it's shared, in which case the component should not close it
+    """
+    pool = _pool
+    if pool is None:
+        return factory(), False
+    return pool.get_or_create(key, factory), True
@@ -0,0 +1,223 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Time spent in each stage of a job (extract, transform, load, publish), along with the records and bytes each stage
+processed, so that a slow job can be told extraction bound from publish bound. DefaultTask and DefaultJob record into
+the metrics of the job currently running, which DefaultJob logs, sends to statsd and writes as JSON at the end.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Mapping
+
+LOGGER = logging.getLogger(__name__)
+
+# Stages
+EXTRACT = 'extract'
+TRANSFORM = 'transform'
+LOAD = 'load'
+PUBLISH = 'publish'
+
+# Maximum number of call durations kept per stage to compute percentiles from
+DEFAULT_MAX_SAMPLES = 10000
+PERCENTILES = (50, 95, 99)
+
+
+class StageMetrics(object):
+    """
+    Number and duration of calls of a stage, e.g: extractor.extract, and number of records and bytes it processed.
+    Percentiles are of the duration of a call, computed from a uniform sample of at most max_samples calls.
+
+    It's not thread safe, as each stage is called from one thread.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES) -> None:
+        self._max_samples = max_samples
+        self._samples: List[float] = []
+        self.calls = 0
+        self.records = 0
+        self.bytes = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+
+    def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls the function, adding the time it takes.
+        :param func:
+        :param args:
+        :return: What the function returns
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add_call(time.perf_counter() - start)
+
+    def add_call(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_sec += seconds
+        if seconds > self.max_sec:
+            self.max_sec = seconds
+
+        # Reservoir sampling, so that every call has the same chance to be in the sample
+        if len(self._samples) < self._max_samples:
+            self._samples.append(seconds)
+        else:
+            i = random.randrange(self.calls)
+            if i < self._max_samples:
+                self._samples[i] = seconds
+
+    def add_records(self, records: int) -> None:
+        self.records += records
+
+    def add_bytes(self, num_bytes: int) -> None:
+        self.bytes += num_bytes
+
+    def merge(self, other: 'StageMetrics') -> None:
+        """
+        Adds calls, records and bytes of the other, e.g: of the same stage run in another process. Percentiles are
+        then of a sample drawn from both samples in proportion to their number of calls.
+        :param other:
+        :return:
+        """
+        samples = self._samples + other._samples
+        if len(samples) > self._max_samples:
+            from_self = min(round(self._max_samples * self.calls / (self.calls + other.calls)), len(self._samples))
+            from_other = min(self._max_samples - from_self, len(other._samples))
+            samples = random.sample(self._samples, from_self) + random.sample(other._samples, from_other)
+        self._samples = samples
+        self.calls += other.calls
+        self.records += other.records
+        self.bytes += other.bytes
+        self.total_sec += other.total_sec
+        self.max_sec = max(self.max_sec, other.max_sec)
+
+    def percentile(self, percent: float) -> float:
+        """
+        :param percent: 0 to 100
+        :return: Duration of a call in seconds at the percentile, or 0 if there's no call
+        """
+        return _percentile(sorted(self._samples), percent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {'calls': self.calls,
+                  'records': self.records,
+                  'bytes': self.bytes,
+                  'total_sec': self.total_sec,
+                  'max_sec': self.max_sec,
+                  'records_per_sec': self.records / self.total_sec if self.total_sec else 0.0}
+        samples = sorted(self._samples)
+        for percent in PERCENTILES:
+            result['p{}_sec'.format(percent)] = _percentile(samples, percent)
+        return result
+
+
+def _percentile(sorted_samples: List[float], percent: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(int(len(sorted_samples) * percent / 100), len(sorted_samples) - 1)]
+
+
+class JobMetrics(object):
+    """
+    StageMetrics of each stage of a job.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES) -> None:
+        self._max_samples = max_samples
+        self._stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+
+    def stage(self, name: str) -> StageMetrics:
+        """
+        :param name: e.g: EXTRACT
+        :return: Metrics of the stage, created if it's not recorded yet
+        """
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = StageMetrics(self._max_samples)
+            return self._stages[name]
+
+    def get_stages(self) -> Dict[str, StageMetrics]:
+        """
+        :return: Metrics of each stage recorded so far, which can be pickled, e.g: to be merged into the metrics of
+        the parent job from another process
+        """
+        with self._lock:
+            return dict(self._stages)
+
+    def merge(self, stages: Mapping[str, StageMetrics]) -> None:
+        """
+        Merges metrics of stages, e.g: of a shard of ShardedJob, into the metrics of the same stages.
+        :param stages: StageMetrics by stage
+        :return:
+        """
+        for name, stage in stages.items():
+            self.stage(name).merge(stage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: Summary of the job, which is what the JSON summary has
+        """
+        with self._lock:
+            stages = dict(self._stages)
+        return {'elapsed_sec': time.time() - self._start_time,
+                'stages': {name: stage.to_dict() for name, stage in stages.items()}}
+
+    def log_summary(self) -> None:
+        summary = self.to_dict()
+        LOGGER.info('Job took {:.2f} seconds'.format(summary['elapsed_sec']))
+        for name, stage in summary['stages'].items():
+            LOGGER.info('{}: {:.2f} seconds in {} calls ({:.4f}/{:.4f}/{:.4f} seconds p50/p95/p99), {} records '
+                        '({:.1f} records/sec), {} bytes'
+                        .format(name, stage['total_sec'], stage['calls'], stage['p50_sec'], stage['p95_sec'],
+                                stage['p99_sec'], stage['records'], stage['records_per_sec'], stage['bytes']))
+
+    def send_statsd(self, statsd: Any) -> None:
+        """
+        Sends total and percentile durations as timings in milliseconds, and records and bytes as gauges, of each
+        stage, e.g: extract.total, extract.p95, extract.records.
+        :param statsd: StatsClient
+        :return:
+        """
+        for name, stage in self.to_dict()['stages'].items():
+            statsd.timing('{}.total'.format(name), stage['total_sec'] * 1000)
+            for percent in PERCENTILES:
+                statsd.timing('{}.p{}'.format(name, percent), stage['p{}_sec'.format(percent)] * 1000)
+            statsd.gauge('{}.records'.format(name), stage['records'])
+            statsd.gauge('{}.bytes'.format(name), stage['bytes'])
+
+    def write_json(self, path: str) -> None:
+        with open(path, 'w', encoding='utf8') as json_file:
+            json.dump(self.to_dict(), json_file, indent=2)
+        LOGGER.info('Wrote job metrics into {}'.format(path))
+
+
+# Metrics of the job currently running on each thread (see JobGraph), which is replaced at the start of each job
+_local = threading.local()
+
+
+def get_job_metrics() -> JobMetrics:
+    """
+    :return: Metrics of the job currently running on this thread
+    """
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None:
+        metrics = reset_job_metrics()
+    return metrics
+
+
+def reset_job_metrics(max_samples: int = DEFAULT_MAX_SAMPLES) -> JobMetrics:
+    """
+    Replaces the metrics of this thread with empty ones. Called by the job when it starts.
+    :param max_samples:
+    :return: The new metrics
+    """
+    _local.metrics = JobMetrics(max_samples)
+    return _local.metrics
@@ -46,3 +46,17 @@ class TestGenericExtractor(unittest.TestCase):
 
         self.assertEquals(extractor.extract(), {'foo': 1})
         self.assertEquals(extractor.extract(), {'bar': 2})
+
+    def test_extract_batch(self) -> None:
+        config_dict = {
+            'extractor.generic.extraction_items': [{'foo': 1}, {'bar': 2}, {'baz': 3}],
+        }
+        conf = ConfigFactory.from_dict(config_dict)
+
+        extractor = GenericExtractor()
+        extractor.init(Scoped.get_scoped_conf(conf=conf,
+                                              scope=extractor.get_scope()))
+
+        self.assertEqual(extractor.extract_batch(2), [{'foo': 1}, {'bar': 2}])
+        self.assertEqual(extractor.extract_batch(2), [{'baz': 3}])
+        self.assertEqual(extractor.extract_batch(2), [])
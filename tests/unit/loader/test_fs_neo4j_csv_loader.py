@@ -3,17 +3,24 @@
 
 import collections
 import csv
+import json
 import logging
 import os
+import shutil
 import unittest
 from os import listdir
 from os.path import isfile, join
 
+from mock import MagicMock, patch
 from pyhocon import ConfigFactory
-from typing import Dict, Iterable, Any, Callable
+from typing import Dict, Iterable, Any, Callable, List
 
 from databuilder.job.base_job import Job
 from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.models.neo4j_csv_row import Neo4jCsvHeader, Neo4jCsvRow
+from databuilder.models.neo4j_csv_serde import Neo4jCsvSerializable
+from databuilder.utils.buffered_csv_writer import BufferedCsvWriter
+from databuilder.utils import csv_compression, neo4j_csv_manifest, stage_metrics
 from tests.unit.models.test_neo4j_csv_serde import Movie, Actor, City
 from operator import itemgetter
 
@@ -56,14 +63,195 @@ class TestFsNeo4jCSVLoader(unittest.TestCase):
                                               itemgetter('START_KEY', 'END_KEY'))
         self.assertEqual(expected_relations, actual_relations)
 
+    def test_load_batch(self) -> None:
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        contents = []
+        for batch in (False, True):
+            movies: List[Neo4jCsvSerializable] = [
+                Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego')]),
+                Movie('Sleepless in Seattle', [Actor('Meg Ryan')], [City('Seattle')])]
+            loader = FsNeo4jCSVLoader()
+            loader.init(self._conf)
+            if batch:
+                with patch.object(BufferedCsvWriter, 'writerow_values') as mock_writerow_values:
+                    loader.load_batch(movies)
+                # Rows of each file are written at once
+                mock_writerow_values.assert_not_called()
+            else:
+                for movie in movies:
+                    loader.load(movie)
+            loader.close()
+            contents.append({file_name: self._read(join(node_dir, file_name)) for file_name in listdir(node_dir)})
+            Job.closer.close()
+
+        # Same files and rows in the same order as loading records one by one
+        self.assertEqual(contents[0], contents[1])
+
+    def test_manifest(self) -> None:
+        actors = [Actor('Tom Cruise'), Actor('Meg Ryan')]
+        cities = [City('San Diego'), City('Oakland')]
+        movie = Movie('Top Gun', actors, cities)
+
+        loader = FsNeo4jCSVLoader()
+        loader.init(self._conf)
+        loader.load(movie)
+        loader.close()
+
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        with open(join(node_dir, neo4j_csv_manifest.MANIFEST_FILE_NAME), 'r') as f:
+            node_entries = sorted(json.load(f)['files'], key=itemgetter('file'))
+        self.assertEqual(node_entries, [
+            {'file': 'Actor_3.csv', 'header': ['KEY', 'LABEL', 'name'], 'row_count': 2, 'label': 'Actor'},
+            {'file': 'City_3.csv', 'header': ['KEY', 'LABEL', 'name'], 'row_count': 2, 'label': 'City'},
+            {'file': 'Movie_3.csv', 'header': ['KEY', 'LABEL', 'name'], 'row_count': 1, 'label': 'Movie'}])
+
+        relation_dir = self._conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH)
+        relation_entries = neo4j_csv_manifest.read_manifest(relation_dir)
+        self.assertIsNotNone(relation_entries)
+        entry = relation_entries[join(relation_dir, 'Movie_Actor_ACTOR.csv')]  # type: ignore
+        self.assertEqual(entry[neo4j_csv_manifest.ROW_COUNT], 2)
+        self.assertEqual((entry[neo4j_csv_manifest.START_LABEL], entry[neo4j_csv_manifest.END_LABEL],
+                          entry[neo4j_csv_manifest.TYPE]), ('Movie', 'Actor', 'ACTOR'))
+
+    def test_load_compressed(self) -> None:
+        actors = [Actor('Tom Cruise'), Actor('Meg Ryan')]
+        cities = [City('San Diego'), City('Oakland')]
+        movie = Movie('Top Gun', actors, cities)
+
+        loader = FsNeo4jCSVLoader()
+        loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.COMPRESSION: 'gzip'}).with_fallback(self._conf))
+        loader.load(movie)
+        loader.close()
+
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        self.assertEqual(sorted(f for f in listdir(node_dir) if f != neo4j_csv_manifest.MANIFEST_FILE_NAME),
+                         ['Actor_3.csv.gz', 'City_3.csv.gz', 'Movie_3.csv.gz'])
+
+        expected_node_path = '{}/../resources/fs_neo4j_csv_loader/nodes'\
+            .format(os.path.join(os.path.dirname(__file__)))
+        self.assertEqual(self._get_csv_rows(expected_node_path, itemgetter('KEY')),
+                         self._get_csv_rows(node_dir, itemgetter('KEY')))
+
+    def test_unsupported_compression(self) -> None:
+        loader = FsNeo4jCSVLoader()
+        with self.assertRaises(ValueError):
+            loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.COMPRESSION: 'zip'}).with_fallback(self._conf))
+
+    def test_partition(self) -> None:
+        # Loaders only delete their partition directories
+        for key in (FsNeo4jCSVLoader.NODE_DIR_PATH, FsNeo4jCSVLoader.RELATION_DIR_PATH):
+            self.addCleanup(shutil.rmtree, self._conf.get_string(key), True)
+
+        for partition, movie in enumerate([Movie('Top Gun', [Actor('Tom Cruise')], [City('San Diego')]),
+                                           Movie('Top Gun 2', [Actor('Tom Cruise')], [])]):
+            loader = FsNeo4jCSVLoader()
+            # Node and relation directories exist once the first partition is written
+            loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.PARTITION: partition}).with_fallback(self._conf))
+            loader.load(movie)
+            loader.close()
+
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        self.assertEqual(sorted(listdir(node_dir)), ['part-0000', 'part-0001'])
+        self.assertEqual(sorted(neo4j_csv_manifest.read_manifest(join(node_dir, 'part-0001')).keys()),  # type: ignore
+                         [join(node_dir, 'part-0001', 'Actor_3.csv'), join(node_dir, 'part-0001', 'Movie_3.csv')])
+
+        # Same partition cannot be written twice
+        loader = FsNeo4jCSVLoader()
+        with self.assertRaises(RuntimeError):
+            loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.PARTITION: 1}).with_fallback(self._conf))
+
+    def test_partition_out_of_range(self) -> None:
+        for key in (FsNeo4jCSVLoader.NODE_DIR_PATH, FsNeo4jCSVLoader.RELATION_DIR_PATH):
+            self.addCleanup(shutil.rmtree, self._conf.get_string(key), True)
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        # Left by a previous run of 3 partitions
+        stale_dir = neo4j_csv_manifest.get_partition_dir(node_dir, 2)
+        os.makedirs(stale_dir)
+
+        conf = ConfigFactory.from_dict({FsNeo4jCSVLoader.PARTITION: 0, FsNeo4jCSVLoader.NUM_PARTITIONS: 2}) \
+            .with_fallback(self._conf)
+        with self.assertRaises(RuntimeError):
+            FsNeo4jCSVLoader().init(conf)
+        self.assertFalse(os.path.exists(neo4j_csv_manifest.get_partition_dir(node_dir, 0)))
+
+        loader = FsNeo4jCSVLoader()
+        loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.FORCE_CREATE_DIR: True}).with_fallback(conf))
+        loader.close()
+        self.assertEqual(listdir(node_dir), ['part-0000'])
+
+    def test_load_neo4j_csv_row(self) -> None:
+        header = Neo4jCsvHeader(('LABEL', 'KEY', 'name'))
+        # Dict and row of the same header are written into the same file
+        rows = [Neo4jCsvRow(header, ('Actor', 'actor://Tom Cruise', 'Top Gun')),
+                {'KEY': 'actor://Meg Ryan', 'LABEL': 'Actor', 'name': 'Top Gun'}]
+
+        loader = FsNeo4jCSVLoader()
+        loader.init(self._conf)
+        for row in rows:
+            serializable = MagicMock()
+            serializable.next_node.side_effect = [row, None]
+            serializable.next_relation.return_value = None
+            loader.load(serializable)
+        loader.close()
+
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        with open(join(node_dir, 'Actor_3.csv'), 'r') as f:
+            self.assertEqual(f.read(), '"LABEL","KEY","name"\n'
+                                       '"Actor","actor://Tom Cruise","Top Gun"\n'
+                                       '"Actor","actor://Meg Ryan","Top Gun"\n')
+
+    def test_bytes_written(self) -> None:
+        metrics = stage_metrics.reset_job_metrics()
+        loader = FsNeo4jCSVLoader()
+        loader.init(self._conf)
+        loader.load(Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego')]))
+        loader.close()
+
+        # Rows without the header of each file
+        row_bytes = 0
+        for dir_path in (self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH),
+                         self._conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH)):
+            for file_name in listdir(dir_path):
+                if file_name.endswith('.csv'):
+                    with open(join(dir_path, file_name), 'r', newline='') as f:
+                        f.readline()
+                        row_bytes += len(f.read())
+        self.assertEqual(metrics.stage(stage_metrics.LOAD).bytes, row_bytes)
+
+    def test_dedupe(self) -> None:
+        movies = [Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego')]),
+                  Movie('Top Gun', [Actor('Tom Cruise')], [City('San Diego'), City('Oakland')])]
+
+        loader = FsNeo4jCSVLoader()
+        loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.DEDUPE: True}).with_fallback(self._conf))
+        for movie in movies:
+            loader.load(movie)
+        report = loader._deduper.get_report()  # type: ignore
+        loader.close()
+
+        self.assertEqual(report['suppressed_nodes'], {'Movie': 1, 'Actor': 1, 'City': 1})
+        self.assertEqual(report['suppressed_relations'], {'ACTOR': 1, 'FILMED_AT': 1})
+
+        # Same rows as loading a single movie
+        expected_node_path = '{}/../resources/fs_neo4j_csv_loader/nodes'\
+            .format(os.path.join(os.path.dirname(__file__)))
+        self.assertEqual(self._get_csv_rows(expected_node_path, itemgetter('KEY')),
+                         self._get_csv_rows(self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH),
+                                            itemgetter('KEY')))
+
+    def _read(self, path: str) -> str:
+        with open(path, 'r') as f:
+            return f.read()
+
     def _get_csv_rows(self,
                       path: str,
                       sorting_key_getter: Callable) -> Iterable[Dict[str, Any]]:
-        files = [join(path, f) for f in listdir(path) if isfile(join(path, f))]
+        files = [join(path, f) for f in listdir(path)
+                 if isfile(join(path, f)) and f != neo4j_csv_manifest.MANIFEST_FILE_NAME]
 
         result = []
         for f in files:
-            with open(f, 'r') as f_input:
+            with csv_compression.open_text(f) as f_input:
                 reader = csv.DictReader(f_input)
                 for row in reader:
                     result.append(collections.OrderedDict(sorted(row.items())))
@@ -0,0 +1,48 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+from collections.abc import Mapping
+
+from databuilder.models.neo4j_csv_row import Neo4jCsvHeader, Neo4jCsvRow
+from databuilder.models.neo4j_csv_serde import NODE_KEY, NODE_LABEL
+
+HEADER = Neo4jCsvHeader((NODE_LABEL, NODE_KEY, 'name', 'sort_order:UNQUOTED'))
+
+
+class TestNeo4jCsvRow(unittest.TestCase):
+
+    def test_mapping(self) -> None:
+        row = Neo4jCsvRow(HEADER, ('Column', 'column://a', 'a', 1))
+        expected = {NODE_LABEL: 'Column', NODE_KEY: 'column://a', 'name': 'a', 'sort_order:UNQUOTED': 1}
+
+        self.assertEqual(row, expected)
+        self.assertEqual(expected, row)
+        self.assertEqual(row.to_dict(), expected)
+        self.assertEqual(list(row.keys()), list(expected.keys()))
+        self.assertEqual(list(row.items()), list(expected.items()))
+        self.assertEqual(list(row.values()), list(expected.values()))
+        self.assertEqual(len(row), 4)
+        self.assertEqual(row['name'], 'a')
+        self.assertEqual(row.get('description', ''), '')
+        self.assertIn(NODE_KEY, row)
+        self.assertNotIn('description', row)
+        with self.assertRaises(KeyError):
+            row['description']
+        self.assertIsInstance(row, Mapping)
+
+    def test_slots(self) -> None:
+        row = Neo4jCsvRow(HEADER, ('Column', 'column://a', 'a', 1))
+
+        # Only the shared header and the values are held per row
+        self.assertEqual(Neo4jCsvRow.__slots__, ('header', 'row_values'))
+        self.assertFalse(hasattr(row, '__dict__'))
+        self.assertIs(row.header, HEADER)
+        with self.assertRaises(AttributeError):
+            row.name = 'a'  # type: ignore
+        with self.assertRaises(TypeError):
+            row['name'] = 'b'  # type: ignore
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@
 
 import unittest
 
-from typing import Union, Dict, Any, Iterable
+from mock import patch
+from typing import Union, Dict, Any, Iterable, List
 
 from databuilder.models.neo4j_csv_serde import (
     NODE_KEY, NODE_LABEL, RELATION_START_KEY, RELATION_START_LABEL,
@@ -14,6 +15,9 @@ from databuilder.models.neo4j_csv_serde import Neo4jCsvSerializable
 
 class TestSerialize(unittest.TestCase):
 
+    def setUp(self) -> None:
+        Neo4jCsvSerializable._validated.clear()
+
     def test_serialize(self) -> None:
         actors = [Actor('Tom Cruise'), Actor('Meg Ryan')]
         cities = [City('San Diego'), City('Oakland')]
@@ -56,6 +60,68 @@ class TestSerialize(unittest.TestCase):
         ]
         self.assertEqual(expected, actual)
 
+    def test_validation_cached(self) -> None:
+        nodes = [{NODE_KEY: 'column://{}'.format(i), NODE_LABEL: 'Column', 'name': 'col{}'.format(i)}
+                 for i in range(100)]
+        with patch.object(Neo4jCsvSerializable, '_validate') as mock_validate:
+            self.assertEqual(_drain(Nodes(nodes)), nodes)
+            # Once per label
+            self.assertEqual(mock_validate.call_count, 1)
+
+        with patch.object(Neo4jCsvSerializable, '_validate') as mock_validate, \
+                patch.object(Neo4jCsvSerializable, 'STRICT_VALIDATION', True):
+            self.assertEqual(_drain(Nodes(nodes)), nodes)
+            self.assertEqual(mock_validate.call_count, 100)
+
+    def test_validation_failure_after_cached(self) -> None:
+        _drain(Nodes([{NODE_KEY: 'column://a', NODE_LABEL: 'Column'}]))
+        # Different label value with the same header is validated
+        with self.assertRaises(RuntimeError):
+            _drain(Nodes([{NODE_KEY: 'column://a', NODE_LABEL: 'column'}]))
+        # Different header is validated
+        with self.assertRaises(RuntimeError):
+            _drain(Nodes([{NODE_KEY: 'column://a', 'label': 'Column'}]))
+        # Failed one is not cached
+        with self.assertRaises(RuntimeError):
+            _drain(Nodes([{NODE_KEY: 'column://a', NODE_LABEL: 'column'}]))
+
+    def test_validation_cached_wide_node(self) -> None:
+        # A wide node, e.g: table with many columns flattened into properties
+        nodes = [dict([(NODE_KEY, 'table://{}'.format(i)), (NODE_LABEL, 'Table')] +
+                      [('prop{}'.format(j), 'value') for j in range(500)]) for i in range(20)]
+        validate = Neo4jCsvSerializable._validate
+
+        with patch.object(Neo4jCsvSerializable, '_validate', autospec=True, side_effect=validate) as mock_validate:
+            self.assertEqual(_drain(Nodes(nodes)), nodes)
+            # Cached by label regardless of header width
+            self.assertEqual(mock_validate.call_count, 1)
+            self.assertEqual(Neo4jCsvSerializable._validated, {('Table',)})
+
+            # A cache hit still requires the required headers
+            with self.assertRaises(RuntimeError):
+                _drain(Nodes([{NODE_LABEL: 'Table', 'prop0': 'value'}]))
+            self.assertEqual(mock_validate.call_count, 2)
+
+
+class Nodes(Neo4jCsvSerializable):
+    def __init__(self, nodes: List[Dict[str, Any]]) -> None:
+        self._node_iter = iter(nodes)
+
+    def create_next_node(self) -> Union[Dict[str, Any], None]:
+        return next(self._node_iter, None)
+
+    def create_next_relation(self) -> Union[Dict[str, Any], None]:
+        return None
+
+
+def _drain(serializable: Neo4jCsvSerializable) -> List[Dict[str, Any]]:
+    result = []
+    node_row = serializable.next_node()
+    while node_row:
+        result.append(node_row)
+        node_row = serializable.next_node()
+    return result
+
 
 class Actor(object):
     LABEL = 'Actor'
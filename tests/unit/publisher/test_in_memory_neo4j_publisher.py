@@ -0,0 +1,89 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import tempfile
+import unittest
+
+from mock import patch, MagicMock
+from neo4j import GraphDatabase
+from pyhocon import ConfigFactory
+from typing import List
+
+from databuilder.job.base_job import Job
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.loader.in_memory_neo4j_loader import InMemoryNeo4jLoader
+from databuilder.publisher import neo4j_csv_publisher
+from databuilder.publisher.in_memory_neo4j_publisher import InMemoryNeo4jPublisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from tests.unit.models.test_neo4j_csv_serde import Movie, Actor, City
+
+
+class TestInMemoryNeo4jPublisher(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._publisher_conf = ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+             neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+             neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'})
+
+    def tearDown(self) -> None:
+        Job.closer.close()
+
+    def _movies(self) -> List[Movie]:
+        return [Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego'), City('Oakland')]),
+                Movie('Sleepless in Seattle', [Actor('Meg Ryan')], [City('Seattle')])]
+
+    def _publish(self, publisher: Neo4jCsvPublisher, conf: ConfigFactory) -> List[bytes]:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+
+            publisher.init(conf.with_fallback(self._publisher_conf))
+            publisher.publish()
+            return [c[0][0] for c in mock_transaction.run.call_args_list]
+
+    def _publish_through_csv(self) -> List[bytes]:
+        tmp_dir = tempfile.mkdtemp()
+        loader = FsNeo4jCSVLoader()
+        loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.NODE_DIR_PATH: '{}/nodes'.format(tmp_dir),
+                                             FsNeo4jCSVLoader.RELATION_DIR_PATH: '{}/relations'.format(tmp_dir),
+                                             FsNeo4jCSVLoader.FORCE_CREATE_DIR: True}))
+        for movie in self._movies():
+            loader.load(movie)
+        loader.close()
+
+        return self._publish(Neo4jCsvPublisher(), ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(tmp_dir),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(tmp_dir)}))
+
+    def _publish_in_memory(self, spill_threshold_bytes: int) -> List[bytes]:
+        loader = InMemoryNeo4jLoader()
+        loader.init(ConfigFactory.from_dict({InMemoryNeo4jLoader.SPILL_THRESHOLD_BYTES: spill_threshold_bytes}))
+        for movie in self._movies():
+            loader.load(movie)
+        loader.close()
+
+        return self._publish(InMemoryNeo4jPublisher(loader), ConfigFactory.from_dict({}))
+
+    def test_same_as_csv(self) -> None:
+        expected = sorted(self._publish_through_csv())
+        self.assertEqual(len(expected), 14)
+        self.assertEqual(sorted(self._publish_in_memory(spill_threshold_bytes=1024 * 1024)), expected)
+
+    def test_same_as_csv_with_spill(self) -> None:
+        expected = sorted(self._publish_through_csv())
+        self.assertEqual(sorted(self._publish_in_memory(spill_threshold_bytes=50)), expected)
+
+    def test_checkpoint_not_supported(self) -> None:
+        loader = InMemoryNeo4jLoader()
+        loader.init(ConfigFactory.from_dict({}))
+        with self.assertRaises(Exception):
+            self._publish(InMemoryNeo4jPublisher(loader), ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_CHECKPOINT_PATH: '{}/checkpoint'.format(tempfile.mkdtemp())}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from neo4j.exceptions import TransientError
+
+from databuilder.publisher.neo4j_commit_policy import AdaptiveCommitPolicy, is_memory_error
+
+
+class TestAdaptiveCommitPolicy(unittest.TestCase):
+
+    def test_should_commit(self) -> None:
+        policy = AdaptiveCommitPolicy(initial_size=10, min_size=1, max_size=100, target_latency_sec=0,
+                                      byte_budget=1000)
+        self.assertFalse(policy.should_commit(statements=9, num_bytes=999))
+        self.assertTrue(policy.should_commit(statements=10, num_bytes=0))
+        self.assertTrue(policy.should_commit(statements=1, num_bytes=1000))
+
+    def test_on_commit(self) -> None:
+        policy = AdaptiveCommitPolicy(initial_size=10, min_size=4, max_size=30, target_latency_sec=1.0,
+                                      byte_budget=0)
+        # Grows at most twice
+        policy.on_commit(statements=10, latency_sec=0.1)
+        self.assertEqual(policy.transaction_size, 20)
+        # Up to max size
+        policy.on_commit(statements=20, latency_sec=0.1)
+        self.assertEqual(policy.transaction_size, 30)
+        # Shrinks towards target
+        policy.on_commit(statements=30, latency_sec=1.5)
+        self.assertEqual(policy.transaction_size, 20)
+        # Transaction committed before reaching the size is ignored
+        policy.on_commit(statements=5, latency_sec=10)
+        self.assertEqual(policy.transaction_size, 20)
+        # Down to min size
+        policy.on_commit(statements=20, latency_sec=10)
+        policy.on_commit(statements=10, latency_sec=10)
+        policy.on_commit(statements=5, latency_sec=10)
+        self.assertEqual(policy.transaction_size, 4)
+
+    def test_fixed_size_without_target_latency(self) -> None:
+        policy = AdaptiveCommitPolicy(initial_size=10, min_size=1, max_size=100, target_latency_sec=0,
+                                      byte_budget=1000)
+        policy.on_commit(statements=10, latency_sec=100)
+        self.assertEqual(policy.transaction_size, 10)
+
+    def test_on_memory_error(self) -> None:
+        policy = AdaptiveCommitPolicy(initial_size=5, min_size=2, max_size=100, target_latency_sec=0,
+                                      byte_budget=0)
+        self.assertTrue(policy.on_memory_error())
+        self.assertEqual(policy.transaction_size, 2)
+        self.assertFalse(policy.on_memory_error())
+        self.assertEqual(policy.transaction_size, 2)
+
+    def test_is_memory_error(self) -> None:
+        error = TransientError('Out of memory')
+        error.code = 'Neo.TransientError.General.OutOfMemoryError'
+        self.assertTrue(is_memory_error(error))
+
+        error = TransientError('Deadlock')
+        error.code = 'Neo.TransientError.Transaction.DeadlockDetected'
+        self.assertFalse(is_memory_error(error))
+        self.assertFalse(is_memory_error(RuntimeError('Memory')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from databuilder.publisher.neo4j_content_hash_state import ContentHashState
+
+
+class TestContentHashState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, 'state.json')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._dir)
+
+    def test_update(self) -> None:
+        state = ContentHashState(self._path)
+        self.assertFalse(state.update(('Table', 'foo'), {'KEY': 'foo', 'name': 'foo'}))
+        self.assertFalse(state.update(('Table', 'bar'), {'KEY': 'bar', 'name': 'bar'}))
+        state.save()
+
+        state = ContentHashState(self._path)
+        self.assertTrue(state.update(('Table', 'foo'), {'KEY': 'foo', 'name': 'foo'}))
+        self.assertFalse(state.update(('Table', 'bar'), {'KEY': 'bar', 'name': 'baz'}))
+        self.assertFalse(state.update(('Column', 'foo'), {'KEY': 'foo', 'name': 'foo'}))
+
+    def test_not_saved(self) -> None:
+        state = ContentHashState(self._path)
+        state.update(('Table', 'foo'), {'KEY': 'foo'})
+
+        state = ContentHashState(self._path)
+        self.assertFalse(state.update(('Table', 'foo'), {'KEY': 'foo'}))
+
+    def test_missing_row_is_dropped(self) -> None:
+        state = ContentHashState(self._path)
+        state.update(('Table', 'foo'), {'KEY': 'foo'})
+        state.save()
+
+        # foo is not published
+        ContentHashState(self._path).save()
+
+        state = ContentHashState(self._path)
+        self.assertFalse(state.update(('Table', 'foo'), {'KEY': 'foo'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,15 +3,24 @@
 
 import logging
 import os
+import shutil
+import tempfile
 import unittest
 import uuid
 
 from mock import patch, MagicMock
 from neo4j import GraphDatabase
+from neo4j.exceptions import TransientError
 from pyhocon import ConfigFactory
+from typing import Any, Dict, Optional
 
+from databuilder.job.base_job import Job
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.models.table_metadata import ColumnMetadata, TableMetadata
 from databuilder.publisher import neo4j_csv_publisher
 from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from databuilder.utils import csv_compression, neo4j_csv_manifest, resource_pool
+from databuilder.utils.dedupe_cache import reset_dedupe_cache
 
 
 class TestPublish(unittest.TestCase):
@@ -52,6 +61,30 @@ class TestPublish(unittest.TestCase):
             # 2 node files, 1 relation file
             self.assertEqual(mock_commit.call_count, 1)
 
+    def test_close_driver(self) -> None:
+        conf = ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+             neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+             neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+             neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+        )
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            publisher = Neo4jCsvPublisher()
+            publisher.init(conf)
+            publisher.close()
+            # Closes the driver it created
+            mock_driver.return_value.close.assert_called_once()
+
+        with patch.object(GraphDatabase, 'driver') as mock_driver, resource_pool.shared_resources():
+            publisher = Neo4jCsvPublisher()
+            publisher.init(conf)
+            publisher.close()
+            # Driver shared from the pool is closed by the pool
+            mock_driver.return_value.close.assert_not_called()
+        mock_driver.return_value.close.assert_called_once()
+
     def test_preprocessor(self) -> None:
         with patch.object(GraphDatabase, 'driver') as mock_driver:
             mock_session = MagicMock()
@@ -88,6 +121,618 @@ class TestPublish(unittest.TestCase):
             # 2 node files, 1 relation file
             self.assertEqual(mock_commit.call_count, 1)
 
+    def test_publisher_unwind(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+
+            mock_run = MagicMock()
+            mock_transaction.run = mock_run
+            mock_commit = MagicMock()
+            mock_transaction.commit = mock_commit
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_USE_UNWIND: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # One UNWIND statement per file as each file has a single label and header. Each statement is committed
+            # in its own transaction, as the batch size is capped by the transaction size
+            self.assertEqual(mock_run.call_count, 3)
+            self.assertEqual(mock_commit.call_count, 4)
+
+            column_calls = [c for c in mock_run.call_args_list if b'MERGE (node:Column' in c[0][0]]
+            self.assertEqual(len(column_calls), 1)
+            stmt = column_calls[0][0][0].decode('utf-8')
+            self.assertTrue(stmt.startswith('UNWIND $batch AS row'))
+            self.assertIn('node.order_pos = row.order_pos', stmt)
+            params = column_calls[0][1]['parameters']
+            self.assertEqual(params['publish_tag'], 'foo')
+            self.assertEqual(params['batch'],
+                             [{'KEY': 'presto://gold.test_schema1/test_table1/test_id1', 'name': 'test_id1',
+                               'order_pos': 1, 'type': 'bigint'},
+                              {'KEY': 'presto://gold.test_schema1/test_table1/test_id2', 'name': 'test_id2',
+                               'order_pos': 2, 'type': 'bigint'}])
+
+    def test_publisher_unwind_batch_size(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+
+            mock_run = MagicMock()
+            mock_transaction.run = mock_run
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_USE_UNWIND: True,
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 2,
+                 neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 1,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # Batch size is capped by the transaction size of 1 row
+            self.assertEqual(mock_run.call_count, 6)
+            for call in mock_run.call_args_list:
+                self.assertEqual(len(call[1]['parameters']['batch']), 1)
+
+    def test_publisher_unwind_transaction_size(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_USE_UNWIND: True,
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 1,
+                 neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 2,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # Transactions of 2 rows: commits on 2nd, 4th and 6th statement, and at the end
+            self.assertEqual(mock_transaction.run.call_count, 6)
+            self.assertEqual(mock_transaction.commit.call_count, 4)
+
+    def test_publisher_concurrently(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+            mock_transaction.closed.return_value = False
+
+            mock_run = MagicMock()
+            mock_transaction.run = mock_run
+            mock_commit = MagicMock()
+            mock_transaction.commit = mock_commit
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY: 2,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            self.assertEqual(mock_run.call_count, 6)
+
+            # Table and Column node files, and 1 relation file are published in their own session
+            self.assertEqual(mock_commit.call_count, 3)
+            self.assertEqual(mock_session.close.call_count, 3)
+
+    def test_publisher_concurrently_retry(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+            mock_transaction.closed.return_value = False
+
+            mock_run = MagicMock()
+            mock_run.side_effect = [TransientError('Deadlock detected'), MagicMock(), MagicMock()]
+            mock_transaction.run = mock_run
+            mock_commit = MagicMock()
+            mock_transaction.commit = mock_commit
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY: 2,
+                 neo4j_csv_publisher.NEO4J_RETRY_BACKOFF_SEC: 0,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # First attempt fails on the first statement and second attempt publishes 2 relations
+            self.assertEqual(mock_run.call_count, 3)
+            self.assertTrue(mock_transaction.rollback.called)
+            self.assertEqual(mock_commit.call_count, 1)
+
+    def test_publisher_with_manifest(self) -> None:
+        node_dir = tempfile.mkdtemp()
+        try:
+            shutil.copy('{}/nodes/test_table.csv'.format(self._resource_path), node_dir)
+            # Label in manifest differs from the file, to confirm that the file is not scanned for index creation
+            neo4j_csv_manifest.write_manifest(node_dir, [{neo4j_csv_manifest.FILE: 'test_table.csv',
+                                                          neo4j_csv_manifest.HEADER: ['KEY', 'name', 'LABEL'],
+                                                          neo4j_csv_manifest.ROW_COUNT: 2,
+                                                          neo4j_csv_manifest.LABEL: 'Foo'}])
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver, \
+                    patch.object(Neo4jCsvPublisher, '_try_create_index') as mock_create_index:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                publisher = Neo4jCsvPublisher()
+
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: node_dir,
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                # Manifest is not published as a node file
+                self.assertEqual(mock_transaction.run.call_count, 2)
+                mock_create_index.assert_called_once_with('Foo')
+        finally:
+            shutil.rmtree(node_dir)
+
+    def test_publisher_compressed(self) -> None:
+        node_dir = tempfile.mkdtemp()
+        relation_dir = tempfile.mkdtemp()
+        try:
+            # Nodes compressed with gzip, relations with lzma
+            for src, dest in [('nodes/test_table.csv', '{}/test_table.csv.gz'.format(node_dir)),
+                              ('nodes/test_column.csv', '{}/test_column.csv.gz'.format(node_dir)),
+                              ('relations/test_edge_short.csv', '{}/test_edge_short.csv.xz'.format(relation_dir))]:
+                with open('{}/{}'.format(self._resource_path, src), 'r', encoding='utf8') as src_file, \
+                        csv_compression.open_text(dest, 'w') as dest_file:
+                    dest_file.write(src_file.read())
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                publisher = Neo4jCsvPublisher()
+
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: node_dir,
+                     neo4j_csv_publisher.RELATION_FILES_DIR: relation_dir,
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                # Same as uncompressed files
+                self.assertEqual(mock_transaction.run.call_count, 6)
+                statements = b' '.join(c[0][0] for c in mock_transaction.run.call_args_list)
+                self.assertIn(b'presto://gold.test_schema1/test_table1', statements)
+        finally:
+            shutil.rmtree(node_dir)
+            shutil.rmtree(relation_dir)
+
+    def test_publisher_partitions(self) -> None:
+        node_dir = tempfile.mkdtemp()
+        relation_dir = tempfile.mkdtemp()
+        try:
+            # Partitions have files of same name
+            for partition in range(2):
+                for src, dest_dir in [('nodes/test_table.csv', node_dir), ('nodes/test_column.csv', node_dir),
+                                      ('relations/test_edge_short.csv', relation_dir)]:
+                    partition_dir = neo4j_csv_manifest.get_partition_dir(dest_dir, partition)
+                    os.makedirs(partition_dir, exist_ok=True)
+                    shutil.copy('{}/{}'.format(self._resource_path, src), partition_dir)
+            shutil.copy('{}/nodes/test_table.csv'.format(self._resource_path), node_dir)
+
+            for concurrency in (1, 2):
+                with patch.object(GraphDatabase, 'driver') as mock_driver:
+                    mock_session = MagicMock()
+                    mock_driver.return_value.session.return_value = mock_session
+
+                    mock_transaction = MagicMock()
+                    mock_session.begin_transaction.return_value = mock_transaction
+
+                    publisher = Neo4jCsvPublisher()
+
+                    conf = ConfigFactory.from_dict(
+                        {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                         neo4j_csv_publisher.NODE_FILES_DIR: node_dir,
+                         neo4j_csv_publisher.RELATION_FILES_DIR: relation_dir,
+                         neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                         neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                         neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY: concurrency,
+                         neo4j_csv_publisher.NEO4J_SHARD_RELATIONS: True,
+                         neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                    )
+                    publisher.init(conf)
+                    self.assertEqual(len(publisher._node_files), 5)
+                    publisher.publish()
+
+                    # Twice the statements of test_publisher, plus the node file outside of partitions
+                    self.assertEqual(mock_transaction.run.call_count, 14)
+        finally:
+            shutil.rmtree(node_dir)
+            shutil.rmtree(relation_dir)
+
+    def test_publisher_record_format(self) -> None:
+        statements = {}
+        for record_format, unwind_batch_size in [('csv', 1), ('binary', 1), ('csv', 1000), ('binary', 1000)]:
+            base_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, base_dir)
+            self.addCleanup(Job.closer.close)
+            node_dir, relation_dir = os.path.join(base_dir, 'nodes'), os.path.join(base_dir, 'relations')
+
+            reset_dedupe_cache()
+            loader = FsNeo4jCSVLoader()
+            loader.init(ConfigFactory.from_dict({FsNeo4jCSVLoader.NODE_DIR_PATH: node_dir,
+                                                 FsNeo4jCSVLoader.RELATION_DIR_PATH: relation_dir,
+                                                 FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR: False,
+                                                 FsNeo4jCSVLoader.RECORD_FORMAT: record_format}))
+            for i in range(3):
+                # Unquoted is_view and sort_order, a quoted description with a quote and a newline
+                loader.load(TableMetadata('hive', 'gold', 'schema', 'table{}'.format(i), "it's a\ntable", [
+                    ColumnMetadata('col1', None, 'bigint', 0), ColumnMetadata('col2', 'foo', 'varchar', 1)],
+                    is_view=i == 1))
+            loader.close()
+            if record_format == 'binary':
+                self.assertEqual(sorted(os.listdir(node_dir))[0], 'Cluster_3.rec')
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = MagicMock()
+                mock_driver.return_value.session.return_value.begin_transaction.return_value = mock_transaction
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: node_dir,
+                     neo4j_csv_publisher.RELATION_FILES_DIR: relation_dir,
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY: 2,
+                     neo4j_csv_publisher.NEO4J_SHARD_RELATIONS: True,
+                     neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: unwind_batch_size,
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}))
+                publisher.publish()
+                statements[(record_format, unwind_batch_size)] = sorted(
+                    str(c) for c in mock_transaction.run.call_args_list)
+
+        # Same statements and parameters from CSV files and record files
+        self.assertTrue(statements[('csv', 1)])
+        self.assertEqual(statements[('csv', 1)], statements[('binary', 1)])
+        self.assertEqual(statements[('csv', 1000)], statements[('binary', 1000)])
+
+    def test_publisher_resume_from_checkpoint(self) -> None:
+        checkpoint_dir = tempfile.mkdtemp()
+        checkpoint_path = os.path.join(checkpoint_dir, 'checkpoint.json')
+        try:
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 2,
+                 neo4j_csv_publisher.NEO4J_CHECKPOINT_PATH: checkpoint_path,
+                 neo4j_csv_publisher.NEO4J_RESUME_FROM_CHECKPOINT: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                # Fails on the first relation after 4 node statements are committed
+                mock_transaction.run.side_effect = [MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                                    RuntimeError('Connection lost')]
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(conf)
+                self.assertRaises(RuntimeError, publisher.publish)
+                self.assertTrue(os.path.isfile(checkpoint_path))
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(conf)
+                publisher.publish()
+
+                # Only relations are published
+                self.assertEqual(mock_transaction.run.call_count, 2)
+                for call in mock_transaction.run.call_args_list:
+                    self.assertIn(b'MERGE (n1)-[r1:COLUMN]->(n2)', call[0][0])
+                self.assertFalse(os.path.isfile(checkpoint_path))
+        finally:
+            shutil.rmtree(checkpoint_dir)
+
+    def test_publisher_pipelined(self) -> None:
+        statements = []
+        for queue_size in (0, 1):
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                publisher = Neo4jCsvPublisher()
+
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 2,
+                     neo4j_csv_publisher.NEO4J_PIPELINE_QUEUE_SIZE: queue_size,
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                # Commits on 2nd, 4th and 6th statement, and at the end
+                self.assertEqual(mock_transaction.commit.call_count, 4)
+                statements.append([call[0][0] for call in mock_transaction.run.call_args_list])
+
+        # Same statements in the same order with and without the pipeline
+        self.assertEqual(len(statements[1]), 6)
+        self.assertEqual(statements[0], statements[1])
+
+    def test_publisher_pipelined_failure(self) -> None:
+        checkpoint_dir = tempfile.mkdtemp()
+        checkpoint_path = os.path.join(checkpoint_dir, 'checkpoint.json')
+        try:
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 2,
+                 neo4j_csv_publisher.NEO4J_PIPELINE_QUEUE_SIZE: 1,
+                 neo4j_csv_publisher.NEO4J_CHECKPOINT_PATH: checkpoint_path,
+                 neo4j_csv_publisher.NEO4J_RESUME_FROM_CHECKPOINT: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                # Writer fails on the first relation after 4 node statements are committed
+                mock_transaction.run.side_effect = [MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                                    RuntimeError('Connection lost')]
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(conf)
+                self.assertRaises(RuntimeError, publisher.publish)
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver, \
+                    patch.object(Neo4jCsvPublisher, 'create_relationship_merge_statement') as mock_create_stmt:
+                mock_session = MagicMock()
+                mock_driver.return_value.session.return_value = mock_session
+
+                mock_transaction = MagicMock()
+                mock_session.begin_transaction.return_value = mock_transaction
+
+                # Parser fails on the first relation
+                mock_create_stmt.side_effect = ValueError('Bad record')
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(conf)
+                self.assertRaises(ValueError, publisher.publish)
+
+                # Resumed from the checkpoint written by the writer thread, and no relation is published
+                self.assertEqual(mock_transaction.run.call_count, 0)
+        finally:
+            shutil.rmtree(checkpoint_dir)
+
+    def test_publisher_adaptive_transaction_memory_error(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+            mock_transaction.closed.return_value = False
+
+            memory_error = TransientError('Out of memory')
+            memory_error.code = 'Neo.TransientError.General.OutOfMemoryError'
+            # Third statement fails with out of memory
+            mock_transaction.run.side_effect = [MagicMock(), MagicMock(), memory_error] + [MagicMock()] * 6
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 4,
+                 neo4j_csv_publisher.NEO4J_TRANSACTION_BYTE_BUDGET: 1000000,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # First 2 statements are rolled back and executed again in transactions of 2 statements
+            self.assertEqual(mock_transaction.rollback.call_count, 1)
+            self.assertEqual(mock_transaction.run.call_count, 9)
+            self.assertEqual(mock_transaction.commit.call_count, 4)
+            self.assertEqual(publisher._count, 6)
+
+    def test_publisher_transaction_byte_budget(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_TRANSACTION_BYTE_BUDGET: 1,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # Every statement exceeds the byte budget, and the last empty transaction is committed at the end
+            self.assertEqual(mock_transaction.run.call_count, 4)
+            self.assertEqual(mock_transaction.commit.call_count, 5)
+
+    def _publish_with_content_hash(self, node_dir: str, state_path: str, use_unwind: bool) -> MagicMock:
+        def run(stmt: bytes, parameters: Optional[Dict[str, Any]]) -> MagicMock:
+            result = MagicMock()
+            if parameters:
+                result.single.return_value = {'count': len(parameters['batch'])}
+            return result
+
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+
+            mock_transaction = MagicMock()
+            mock_session.begin_transaction.return_value = mock_transaction
+            mock_transaction.run.side_effect = run
+
+            publisher = Neo4jCsvPublisher()
+
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: node_dir,
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_USE_UNWIND: use_unwind,
+                 neo4j_csv_publisher.NEO4J_CONTENT_HASH_STATE_PATH: state_path,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            publisher.publish()
+            return mock_transaction.run
+
+    def test_publisher_content_hash(self) -> None:
+        for use_unwind in (False, True):
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                node_dir = os.path.join(tmp_dir, 'nodes')
+                shutil.copytree('{}/nodes'.format(self._resource_path), node_dir)
+                state_path = os.path.join(tmp_dir, 'state.json')
+
+                # All rows are merged on the first publish
+                mock_run = self._publish_with_content_hash(node_dir, state_path, use_unwind)
+                self.assertEqual(mock_run.call_count, 6 if not use_unwind else 3)
+                self.assertTrue(os.path.isfile(state_path))
+
+                # All rows are touched on the second publish
+                mock_run = self._publish_with_content_hash(node_dir, state_path, use_unwind)
+                statements = [call[0][0].decode('utf-8') for call in mock_run.call_args_list]
+                self.assertEqual(len(statements), 3)
+                self.assertIn('MATCH (node:Table {key: row.KEY})\nSET node.published_tag = $publish_tag', statements[0])
+                self.assertIn('MATCH (node:Column {key: row.KEY})\nSET node.published_tag = $publish_tag',
+                              statements[1])
+                self.assertIn('r2.published_tag = $publish_tag', statements[2])
+
+                # Only the changed row is merged on the third publish
+                column_file = os.path.join(node_dir, 'test_column.csv')
+                with open(column_file, 'r') as f:
+                    content = f.read()
+                with open(column_file, 'w') as f:
+                    f.write(content.replace('"test_id2",2,"bigint"', '"test_id2",2,"varchar"'))
+
+                mock_run = self._publish_with_content_hash(node_dir, state_path, use_unwind)
+                statements = [call[0][0].decode('utf-8') for call in mock_run.call_args_list]
+                self.assertEqual(len(statements), 4)
+                merges = [stmt for stmt in statements if 'MERGE' in stmt]
+                self.assertEqual(len(merges), 1)
+                self.assertIn('Column', merges[0])
+            finally:
+                shutil.rmtree(tmp_dir)
+
+    def test_parse_unquoted_value(self) -> None:
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('1'), 1)
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('1.5'), 1.5)
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('True'), True)
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('false'), False)
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('"foo"'), 'foo')
+        self.assertEqual(neo4j_csv_publisher.parse_unquoted_value('bar'), 'bar')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,110 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from mock import patch, MagicMock
+from neo4j import GraphDatabase
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any, Dict, List, Tuple
+
+from databuilder.publisher import neo4j_csv_publisher, neo4j_load_csv_publisher
+from databuilder.publisher.neo4j_load_csv_publisher import Neo4jLoadCsvPublisher
+from databuilder.utils import stage_metrics
+
+
+class TestNeo4jLoadCsvPublisher(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._resource_path = '{}/../resources/csv_publisher' \
+            .format(os.path.join(os.path.dirname(__file__)))
+        self._import_dir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._import_dir)
+
+    def _publish(self) -> List[Tuple[str, str]]:
+        """
+        :return: Each LOAD CSV statement executed, and content of the file it loads
+        """
+        executed: List[Tuple[str, str]] = []
+
+        def run(stmt: str, parameters: Dict[str, Any]) -> MagicMock:
+            self.assertEqual(parameters, {'publish_tag': 'foo'})
+            url = re.search("FROM '(.*)' AS row", stmt).group(1)  # type: ignore
+            with open(os.path.join(self._import_dir, url[len('file:///'):]), 'r') as f:
+                executed.append((stmt, f.read()))
+            return MagicMock()
+
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_session = MagicMock()
+            mock_driver.return_value.session.return_value = mock_session
+            mock_session.run.side_effect = run
+
+            publisher = Neo4jLoadCsvPublisher()
+            publisher.init(self._get_conf())
+            publisher.publish()
+        return executed
+
+    def _get_conf(self) -> ConfigTree:
+        return ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+             neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+             neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+             neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo',
+             neo4j_load_csv_publisher.NEO4J_IMPORT_DIR: self._import_dir,
+             neo4j_load_csv_publisher.NEO4J_LOAD_CSV_PERIODIC_COMMIT: 100}
+        )
+
+    def test_publisher(self) -> None:
+        executed = self._publish()
+
+        # LOAD CSV for 2 node files and 1 relation file
+        self.assertEqual(len(executed), 3)
+
+        column_stmt, column_csv = [(stmt, content) for stmt, content in executed if 'node:Column' in stmt][0]
+        self.assertTrue(column_stmt.startswith('USING PERIODIC COMMIT 100\nLOAD CSV WITH HEADERS FROM'))
+        self.assertIn('node.order_pos = toInteger(row.order_pos)', column_stmt)
+        self.assertIn('node.published_tag = $publish_tag', column_stmt)
+        self.assertIn('ON MATCH SET', column_stmt)
+        self.assertEqual(column_csv.splitlines()[0], '"KEY","name","order_pos","type","LABEL"')
+
+        relation_stmt = [stmt for stmt, _ in executed if 'MATCH (n1:Table' in stmt][0]
+        self.assertIn('MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)', relation_stmt)
+        self.assertIn('r1.publisher_last_updated_epoch_ms = timestamp() , r2.published_tag = $publish_tag',
+                      relation_stmt)
+
+        # Converted files are removed
+        self.assertEqual(os.listdir(self._import_dir), [])
+
+    def test_publish_metrics(self) -> None:
+        metrics = stage_metrics.reset_job_metrics()
+        self._publish()
+
+        # A statement per converted file, and bytes of the files published
+        publish = metrics.stage(stage_metrics.PUBLISH)
+        self.assertEqual(publish.records, 3)
+        self.assertEqual(publish.bytes, sum(os.path.getsize(os.path.join(self._resource_path, sub_dir, file_name))
+                                            for sub_dir in ('nodes', 'relations')
+                                            for file_name in os.listdir(os.path.join(self._resource_path, sub_dir))))
+
+    def test_unsupported_config(self) -> None:
+        for key, value in ((neo4j_csv_publisher.NEO4J_CHECKPOINT_PATH, os.path.join(self._import_dir, 'checkpoint')),
+                           (neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY, 2),
+                           (neo4j_csv_publisher.NEO4J_USE_UNWIND, True),
+                           (neo4j_csv_publisher.NEO4J_PIPELINE_QUEUE_SIZE, 1),
+                           (neo4j_csv_publisher.NEO4J_TRANSACTION_BYTE_BUDGET, 1000),
+                           (neo4j_csv_publisher.NEO4J_CONTENT_HASH_STATE_PATH, os.path.join(self._import_dir, 'hash'))):
+            conf = ConfigFactory.from_dict({key: value}).with_fallback(self._get_conf())
+            with patch.object(GraphDatabase, 'driver'), self.assertRaisesRegex(Exception, 'does not support'):
+                Neo4jLoadCsvPublisher().init(conf)
+
+
+if __name__ == '__main__':
+    unittest.main()
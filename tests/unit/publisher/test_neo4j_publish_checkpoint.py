@@ -0,0 +1,52 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from databuilder.publisher.neo4j_publish_checkpoint import PublishCheckpoint
+
+
+class TestPublishCheckpoint(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, 'checkpoint.json')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._dir)
+
+    def test_resume(self) -> None:
+        checkpoint = PublishCheckpoint(path=self._path, publish_tag='foo', resume=True)
+        self.assertEqual(checkpoint.get_offset('/nodes/a.csv'), 0)
+
+        checkpoint.commit(completed_files=[], current_file='/nodes/a.csv', current_offset=10)
+        checkpoint.commit(completed_files=['/nodes/a.csv'], current_file='/nodes/b.csv', current_offset=3)
+
+        resumed = PublishCheckpoint(path=self._path, publish_tag='foo', resume=True)
+        self.assertIsNone(resumed.get_offset('/nodes/a.csv'))
+        self.assertEqual(resumed.get_offset('/nodes/b.csv'), 3)
+        self.assertEqual(resumed.get_offset('/nodes/c.csv'), 0)
+
+        resumed.remove()
+        self.assertFalse(os.path.exists(self._path))
+
+    def test_different_publish_tag(self) -> None:
+        checkpoint = PublishCheckpoint(path=self._path, publish_tag='foo', resume=False)
+        checkpoint.commit(completed_files=['/nodes/a.csv'], current_file=None, current_offset=0)
+
+        resumed = PublishCheckpoint(path=self._path, publish_tag='bar', resume=True)
+        self.assertEqual(resumed.get_offset('/nodes/a.csv'), 0)
+
+    def test_not_resume(self) -> None:
+        checkpoint = PublishCheckpoint(path=self._path, publish_tag='foo', resume=False)
+        checkpoint.commit(completed_files=['/nodes/a.csv'], current_file=None, current_offset=0)
+
+        restarted = PublishCheckpoint(path=self._path, publish_tag='foo', resume=False)
+        self.assertEqual(restarted.get_offset('/nodes/a.csv'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
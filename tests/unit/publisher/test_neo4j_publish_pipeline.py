@@ -0,0 +1,81 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import unittest
+
+from databuilder.publisher.neo4j_publish_pipeline import PublishPipeline
+
+
+class TestPublishPipeline(unittest.TestCase):
+
+    def test_items_in_order(self) -> None:
+        pipeline = PublishPipeline(queue_size=2)
+
+        def produce() -> None:
+            for i in range(10):
+                pipeline.put(i, rows=10)
+
+        pipeline.start(produce)
+        try:
+            self.assertEqual(list(pipeline.items()), list(range(10)))
+        finally:
+            pipeline.stop()
+
+        self.assertEqual(pipeline.statements, 10)
+        self.assertEqual(pipeline.rows, 100)
+
+    def test_backpressure(self) -> None:
+        pipeline = PublishPipeline(queue_size=2)
+        produced = []
+        blocked = threading.Event()
+
+        def produce() -> None:
+            for i in range(5):
+                if i == 2:
+                    blocked.set()
+                pipeline.put(i)
+                produced.append(i)
+
+        pipeline.start(produce)
+        try:
+            items = pipeline.items()
+            blocked.wait(timeout=5)
+            # Parser cannot get more than queue size ahead of the writer
+            self.assertLessEqual(len(produced), 2)
+            self.assertEqual(next(items), 0)
+            self.assertEqual(list(items), [1, 2, 3, 4])
+        finally:
+            pipeline.stop()
+
+    def test_parser_failure(self) -> None:
+        pipeline = PublishPipeline(queue_size=2)
+
+        def produce() -> None:
+            pipeline.put(0)
+            raise ValueError('Bad record')
+
+        pipeline.start(produce)
+        try:
+            items = pipeline.items()
+            self.assertEqual(next(items), 0)
+            self.assertRaises(ValueError, next, items)
+        finally:
+            pipeline.stop()
+
+    def test_writer_failure(self) -> None:
+        pipeline = PublishPipeline(queue_size=1)
+
+        def produce() -> None:
+            while True:
+                pipeline.put(0)
+
+        pipeline.start(produce)
+        next(pipeline.items())
+        # Parser blocked on the full queue stops once the writer stops
+        pipeline.stop()
+        self.assertFalse(pipeline._thread.is_alive())  # type: ignore
+
+
+if __name__ == '__main__':
+    unittest.main()
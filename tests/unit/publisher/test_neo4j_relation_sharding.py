@@ -0,0 +1,106 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zlib
+
+from mock import patch, MagicMock
+from neo4j import GraphDatabase
+from pyhocon import ConfigFactory
+from typing import Any, Dict, List
+
+from databuilder.publisher import neo4j_csv_publisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+
+
+class TestRelationSharding(unittest.TestCase):
+    """
+    Tests publishing relations sharded by start node key, where each session merges the relations of a shard.
+    """
+    CONCURRENCY = 4
+
+    def setUp(self) -> None:
+        self._relation_dir = tempfile.mkdtemp()
+        # 2 files of 100 relations from 20 tables to 10 tags
+        self._start_keys: List[str] = []
+        for i in range(2):
+            with open(os.path.join(self._relation_dir, 'relation{}.csv'.format(i)), 'w') as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+                writer.writerow(['START_LABEL', 'START_KEY', 'END_LABEL', 'END_KEY', 'TYPE', 'REVERSE_TYPE'])
+                for j in range(100):
+                    start_key = 'table{}'.format((i * 100 + j) % 20)
+                    self._start_keys.append(start_key)
+                    writer.writerow(['Table', start_key, 'Tag', 'tag{}'.format(j % 10), 'TAGGED_BY', 'TAG'])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._relation_dir)
+
+    def _publish(self, shard_relations: bool) -> Dict[Any, List[str]]:
+        """
+        :return: Start keys of the statements executed by each session, in the order they were executed
+        """
+        start_keys_by_session: Dict[Any, List[str]] = {}
+        lock = threading.Lock()
+
+        def create_session(*args: Any, **kwargs: Any) -> MagicMock:
+            session = MagicMock()
+
+            def run(stmt: bytes, parameters: Dict[str, Any]) -> MagicMock:
+                start_key = re.search(r"n1:Table {key: '(\w+)'}", stmt.decode('utf-8')).group(1)  # type: ignore
+                with lock:
+                    start_keys_by_session.setdefault(session, []).append(start_key)
+                return MagicMock()
+
+            session.begin_transaction.return_value.run.side_effect = run
+            session.begin_transaction.return_value.closed.return_value = False
+            return session
+
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_driver.return_value.session.side_effect = create_session
+
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.RELATION_FILES_DIR: self._relation_dir,
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_PUBLISH_CONCURRENCY: TestRelationSharding.CONCURRENCY,
+                 neo4j_csv_publisher.NEO4J_SHARD_RELATIONS: shard_relations,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo'}
+            )
+            publisher.init(conf)
+            publisher.publish()
+            return start_keys_by_session
+
+    def test_shard_relations(self) -> None:
+        start_keys_by_session = self._publish(shard_relations=True)
+
+        def get_shard(start_key: str) -> int:
+            return zlib.crc32(start_key.encode('utf-8')) % TestRelationSharding.CONCURRENCY
+
+        # A session per shard, which merges the relations whose start key hashes into the shard, in the order of
+        # relation files
+        expected: Dict[int, List[str]] = {}
+        for start_key in self._start_keys:
+            expected.setdefault(get_shard(start_key), []).append(start_key)
+        actual = {get_shard(start_keys[0]): start_keys for start_keys in start_keys_by_session.values()}
+        self.assertEqual(len(start_keys_by_session), len(expected))
+        self.assertEqual(actual, expected)
+        self.assertEqual({shard: len(start_keys) for shard, start_keys in actual.items()},
+                         {shard: len(start_keys) for shard, start_keys in expected.items()})
+
+    def test_without_sharding(self) -> None:
+        start_keys_by_session = self._publish(shard_relations=False)
+
+        # A session per relation file, which is at most 2 sessions regardless of concurrency
+        self.assertEqual(sorted(start_keys_by_session.values()), [self._start_keys[:100], self._start_keys[100:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,7 @@ from pyhocon import ConfigFactory
 from databuilder.publisher import neo4j_csv_publisher
 from databuilder.task import neo4j_staleness_removal_task
 from databuilder.task.neo4j_staleness_removal_task import Neo4jStalenessRemovalTask
+from databuilder.utils import resource_pool
 
 
 class TestRemoveStaleData(unittest.TestCase):
@@ -411,5 +412,31 @@ class TestRemoveStaleData(unittest.TestCase):
             session_mock.assert_not_called()
 
 
+    def test_close_driver(self) -> None:
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            task = Neo4jStalenessRemovalTask()
+            job_config = ConfigFactory.from_dict({
+                'job.identifier': 'remove_stale_data_job',
+                '{}.{}'.format(task.get_scope(), neo4j_staleness_removal_task.NEO4J_END_POINT_KEY):
+                    'foobar',
+                '{}.{}'.format(task.get_scope(), neo4j_staleness_removal_task.NEO4J_USER):
+                    'foo',
+                '{}.{}'.format(task.get_scope(), neo4j_staleness_removal_task.NEO4J_PASSWORD):
+                    'bar',
+                neo4j_csv_publisher.JOB_PUBLISH_TAG: 'foo',
+            })
+
+            task.init(job_config)
+            task.close()
+            mock_driver.return_value.close.assert_called_once()
+
+            # Driver shared from the pool is closed by the pool
+            with resource_pool.shared_resources():
+                task = Neo4jStalenessRemovalTask()
+                task.init(job_config)
+                task.close()
+                mock_driver.return_value.close.assert_called_once()
+            self.assertEqual(mock_driver.return_value.close.call_count, 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,135 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import itertools
+import threading
+import unittest
+
+from mock import MagicMock
+from pyhocon import ConfigFactory
+from typing import Any, Callable, Iterator, List, Optional
+
+from databuilder.job.base_job import Job
+from databuilder.task.pipelined_task import PipelinedTask
+from databuilder.task.task import DefaultTask
+
+
+class TestPipelinedTask(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.conf = ConfigFactory.from_dict({'task.queue_size': 2})
+        self.loaded: List[Any] = []
+        self.threads: List[str] = []
+
+    def _create_task(self,
+                     records: Iterator[Any],
+                     transform: Optional[Callable[[Any], Any]] = None,
+                     load: Optional[Callable[[Any], None]] = None,
+                     task_class: Any = PipelinedTask) -> DefaultTask:
+        def extract() -> Any:
+            self.threads.append(threading.current_thread().name)
+            return next(records, None)
+
+        def default_load(record: Any) -> None:
+            self.loaded.append(record)
+
+        extractor, transformer, loader = MagicMock(), MagicMock(), MagicMock()
+        extractor.get_scope.return_value = 'extractor.test'
+        transformer.get_scope.return_value = 'transformer.test'
+        loader.get_scope.return_value = 'loader.test'
+        extractor.extract.side_effect = extract
+        transformer.transform.side_effect = transform or (lambda record: record)
+        loader.load.side_effect = load or default_load
+        task = task_class(extractor=extractor, loader=loader, transformer=transformer)
+        task.init(self.conf)
+        return task
+
+    def _assert_closed(self, task: DefaultTask) -> None:
+        task.extractor.close.assert_called_once()  # type: ignore
+        task.transformer.close.assert_called_once()  # type: ignore
+        task.loader.close.assert_called_once()  # type: ignore
+
+    def test_run(self) -> None:
+        # Odd records are filtered out by transformer
+        task = self._create_task(iter(range(1, 101)), transform=lambda record: record * 10 if record % 2 else None)
+        task.run()
+
+        self.assertEqual(self.loaded, list(range(10, 1001, 20)))
+        self.assertEqual(set(self.threads), {'pipelined_task_extractor'})
+        self._assert_closed(task)
+
+    def test_extractor_failure(self) -> None:
+        def records() -> Iterator[int]:
+            yield 1
+            raise ValueError('foo')
+
+        task = self._create_task(records())
+        with self.assertRaises(ValueError):
+            task.run()
+        self._assert_closed(task)
+
+    def test_transformer_failure(self) -> None:
+        def transform(record: int) -> int:
+            if record == 5:
+                raise ValueError('foo')
+            return record
+
+        # Extractor does not end, and is stopped by the failure
+        task = self._create_task(itertools.count(1), transform=transform)
+        with self.assertRaises(ValueError):
+            task.run()
+        self.assertEqual(self.loaded, [1, 2, 3, 4][:len(self.loaded)])
+        self._assert_closed(task)
+
+    def test_loader_failure(self) -> None:
+        def load(record: int) -> None:
+            raise ValueError('foo')
+
+        task = self._create_task(itertools.count(1), load=load)
+        with self.assertRaises(ValueError):
+            task.run()
+        self._assert_closed(task)
+
+    def test_closer(self) -> None:
+        close = MagicMock()
+
+        def records() -> Iterator[int]:
+            # e.g: an extractor opening a connection on its first extract
+            Job.closer.register(close)
+            yield 1
+
+        task = self._create_task(records())
+        task.run()
+
+        # Registered on the extractor thread, but closed with the job
+        close.assert_not_called()
+        Job.closer.close()
+        close.assert_called_once()
+
+    def test_overlap(self) -> None:
+        for task_class, timeout, overlapped in ((PipelinedTask, 10.0, True), (DefaultTask, 0.1, False)):
+            second_extracted = threading.Event()
+            overlaps: List[bool] = []
+
+            def records() -> Iterator[int]:
+                yield 1
+                second_extracted.set()
+                yield 2
+
+            def load(record: int) -> None:
+                # Loading the first record waits for the second one to be extracted, which only happens if
+                # extraction goes on while loading
+                if record == 1:
+                    overlaps.append(second_extracted.wait(timeout))
+                self.loaded.append(record)
+
+            self.loaded = []
+            task = self._create_task(records(), load=load, task_class=task_class)
+            task.run()
+
+            self.assertEqual(self.loaded, [1, 2])
+            self.assertEqual(overlaps, [overlapped])
+
+
+if __name__ == '__main__':
+    unittest.main()
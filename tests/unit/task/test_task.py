@@ -0,0 +1,183 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any, List
+
+from databuilder.extractor.base_extractor import Extractor, iter_records, take_batch
+from databuilder.loader.base_loader import Loader
+from databuilder.task.task import DefaultTask
+from databuilder.transformer.base_transformer import NoopTransformer, Transformer
+from databuilder.utils import stage_metrics
+
+
+class _ListExtractor(Extractor):
+    def __init__(self, records: List[Any]) -> None:
+        self.records = records
+        self.batch_sizes: List[int] = []
+        self.closed = False
+
+    def init(self, conf: ConfigTree) -> None:
+        self._iter = iter(self.records)
+
+    def extract(self) -> Any:
+        return next(self._iter, None)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def get_scope(self) -> str:
+        return 'extractor.list'
+
+
+class _BatchListExtractor(_ListExtractor):
+    def init(self, conf: ConfigTree) -> None:
+        self._iter = iter_records(self.records)
+
+    def extract_batch(self, max_records: int) -> List[Any]:
+        self.batch_sizes.append(max_records)
+        return take_batch(self._iter, max_records)
+
+
+class _EvenTransformer(Transformer):
+    """
+    Filters out odd records
+    """
+    def init(self, conf: ConfigTree) -> None:
+        pass
+
+    def transform(self, record: Any) -> Any:
+        return record if record % 2 == 0 else None
+
+    def get_scope(self) -> str:
+        return 'transformer.even'
+
+
+class _BatchEvenTransformer(_EvenTransformer):
+    def transform_batch(self, records: List[Any]) -> List[Any]:
+        return [record for record in records if record % 2 == 0]
+
+
+class _ListLoader(Loader):
+    def __init__(self) -> None:
+        self.loaded: List[Any] = []
+        self.batches: List[List[Any]] = []
+
+    def init(self, conf: ConfigTree) -> None:
+        pass
+
+    def load(self, record: Any) -> None:
+        self.loaded.append(record)
+
+    def get_scope(self) -> str:
+        return 'loader.list'
+
+
+class _BatchListLoader(_ListLoader):
+    def load_batch(self, records: List[Any]) -> None:
+        self.batches.append(records)
+        self.loaded.extend(records)
+
+
+class TestDefaultTask(unittest.TestCase):
+
+    def _run(self, extractor: Extractor, transformer: Transformer, loader: Loader) -> DefaultTask:
+        task = DefaultTask(extractor=extractor, transformer=transformer, loader=loader)
+        task.init(ConfigFactory.from_dict({'task.batch_size': 3}))
+        task.run()
+        return task
+
+    def test_run_batches(self) -> None:
+        extractor, loader = _BatchListExtractor(list(range(1, 9))), _BatchListLoader()
+        task = self._run(extractor, _BatchEvenTransformer(), loader)
+
+        self.assertTrue(task.is_batch_supported())
+        self.assertEqual(loader.loaded, [2, 4, 6, 8])
+        # [1, 2, 3], [4, 5, 6], [7, 8] then empty, all of at most batch size
+        self.assertEqual(extractor.batch_sizes, [3, 3, 3, 3])
+        self.assertEqual(loader.batches, [[2], [4, 6], [8]])
+        self.assertTrue(extractor.closed)
+
+    def test_run_batches_stage_metrics(self) -> None:
+        metrics = stage_metrics.reset_job_metrics()
+        self._run(_BatchListExtractor(list(range(1, 9))), _BatchEvenTransformer(), _BatchListLoader())
+
+        # A call per batch, where the last extract call returns no record
+        extract, load = metrics.stage(stage_metrics.EXTRACT), metrics.stage(stage_metrics.LOAD)
+        self.assertEqual((extract.calls, extract.records), (4, 8))
+        self.assertEqual(metrics.stage(stage_metrics.TRANSFORM).records, 8)
+        self.assertEqual((load.calls, load.records), (3, 4))
+
+    def test_run_batches_with_noop_transformer(self) -> None:
+        loader = _BatchListLoader()
+        task = self._run(_BatchListExtractor([1, 2, 3, 4]), NoopTransformer(), loader)
+
+        self.assertTrue(task.is_batch_supported())
+        self.assertEqual(loader.batches, [[1, 2, 3], [4]])
+
+    def test_run_single_records_unless_all_support_batches(self) -> None:
+        extractor, loader = _BatchListExtractor(list(range(1, 9))), _ListLoader()
+        task = self._run(extractor, _BatchEvenTransformer(), loader)
+
+        self.assertFalse(task.is_batch_supported())
+        self.assertEqual(loader.loaded, [2, 4, 6, 8])
+        self.assertEqual(extractor.batch_sizes, [])
+        self.assertTrue(extractor.closed)
+
+    def test_default_batch_methods(self) -> None:
+        extractor = _ListExtractor([1, 2, 3, 0, 4])
+        extractor.init(ConfigFactory.from_dict({}))
+        loader = _ListLoader()
+
+        # Extraction ends at a falsy record, as in DefaultTask
+        self.assertEqual(extractor.extract_batch(2), [1, 2])
+        self.assertEqual(extractor.extract_batch(2), [3])
+        self.assertEqual(_EvenTransformer().transform_batch([1, 2, 3, 4]), [2, 4])
+        loader.load_batch([1, 2])
+        self.assertEqual(loader.loaded, [1, 2])
+
+    def test_take_batch(self) -> None:
+        source = iter([1, 2, 3, None, 4])
+        records = iter_records(source)
+
+        self.assertEqual(take_batch(records, 2), [1, 2])
+        self.assertEqual(take_batch(records, 2), [3])
+        self.assertEqual(take_batch(records, 2), [])
+        self.assertEqual(take_batch(records, 2), [])
+        # Records after the falsy record are not read
+        self.assertEqual(list(source), [4])
+
+    def test_calls_per_batch(self) -> None:
+        """
+        Extractor and loader are called once per batch instead of once per record
+        """
+        class _CountingLoader(_BatchListLoader):
+            def __init__(self) -> None:
+                super(_CountingLoader, self).__init__()
+                self.load_calls = 0
+
+            def load(self, record: Any) -> None:
+                self.load_calls += 1
+                super(_CountingLoader, self).load(record)
+
+        class _SingleRecordLoader(_CountingLoader):
+            load_batch = Loader.load_batch
+
+        records = list(range(1, 301))
+        single_extractor, single_loader = _BatchListExtractor(records), _SingleRecordLoader()
+        self._run(single_extractor, _BatchEvenTransformer(), single_loader)
+        batch_extractor, batch_loader = _BatchListExtractor(records), _CountingLoader()
+        self._run(batch_extractor, _BatchEvenTransformer(), batch_loader)
+
+        self.assertEqual(batch_loader.loaded, single_loader.loaded)
+        self.assertEqual(batch_loader.loaded, list(range(2, 301, 2)))
+        self.assertEqual((len(single_extractor.batch_sizes), single_loader.load_calls), (0, 150))
+        # 100 batches of 3 records, then an empty one
+        self.assertEqual(len(batch_extractor.batch_sizes), 101)
+        self.assertEqual((len(batch_loader.batches), batch_loader.load_calls), (100, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@ import json
 import shutil
 import tempfile
 import unittest
-from mock import patch
+from mock import ANY, patch
 
 from pyhocon import ConfigTree, ConfigFactory
 from typing import Any
@@ -15,6 +15,7 @@ from databuilder.job.job import DefaultJob
 from databuilder.loader.base_loader import Loader
 from databuilder.task.task import DefaultTask
 from databuilder.transformer.base_transformer import Transformer
+from databuilder.utils.dedupe_cache import get_dedupe_cache
 
 
 class TestJob(unittest.TestCase):
@@ -62,10 +63,14 @@ class TestJobNoTransform(unittest.TestCase):
 
     def test_job(self) -> None:
         task = DefaultTask(SuperHeroExtractor(), SuperHeroLoader())
+        get_dedupe_cache().is_duplicate('Clark Kent')
 
         job = DefaultJob(self.conf, task)
         job.launch()
 
+        # The job starts and ends with an empty de-dupe cache
+        self.assertEqual(len(get_dedupe_cache()), 0)
+
         expected_list = ['{"hero": "Super man", "name": "Clark Kent"}',
                          '{"hero": "Bat man", "name": "Bruce Wayne"}']
         with open(self.dest_file_name, 'r') as file:
@@ -104,6 +109,44 @@ class TestJobStatsd(unittest.TestCase):
                 self.assertFalse(file.readline())
 
             self.assertEqual(mock_statsd.return_value.incr.call_count, 1)
+            mock_statsd.return_value.timing.assert_any_call('extract.total', ANY)
+            mock_statsd.return_value.gauge.assert_any_call('load.records', 2)
+
+
+class TestJobMetrics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir_path = tempfile.mkdtemp()
+        self.dest_file_name = '{}/superhero.json'.format(self.temp_dir_path)
+        self.metrics_file_name = '{}/metrics.json'.format(self.temp_dir_path)
+        self.conf = ConfigFactory.from_dict(
+            {'loader.superhero.dest_file': self.dest_file_name,
+             'job.metrics_json_path': self.metrics_file_name})
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir_path)
+
+    def test_job(self) -> None:
+        task = DefaultTask(SuperHeroExtractor(),
+                           SuperHeroLoader(),
+                           transformer=SuperHeroReverseNameTransformer())
+
+        job = DefaultJob(self.conf, task)
+        job.launch()
+
+        with open(self.metrics_file_name, 'r') as file:
+            metrics = json.load(file)
+
+        stages = metrics['stages']
+        self.assertEqual(set(stages), {'extract', 'transform', 'load', 'publish'})
+        # Last extract call returns no record
+        self.assertEqual(stages['extract']['calls'], 3)
+        self.assertEqual(stages['extract']['records'], 2)
+        self.assertEqual(stages['transform']['records'], 2)
+        self.assertEqual(stages['load']['calls'], 2)
+        self.assertEqual(stages['publish']['calls'], 1)
+        self.assertGreaterEqual(metrics['elapsed_sec'], stages['load']['total_sec'])
+        self.assertGreater(stages['load']['p99_sec'], 0)
 
 
 class SuperHeroExtractor(Extractor):
@@ -0,0 +1,117 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import unittest
+
+from mock import MagicMock
+from pyhocon import ConfigTree
+from typing import Any, List, Optional
+
+from databuilder.job.base_job import Job
+from databuilder.job.job_graph import JobGraph
+from databuilder.utils import resource_pool
+
+
+class _RecordingJob(Job):
+    """
+    Records when it starts and finishes, and the Neo4j driver it gets
+    """
+
+    def __init__(self,
+                 name: str,
+                 events: List[str],
+                 barrier: Optional[threading.Barrier] = None,
+                 error: Optional[Exception] = None) -> None:
+        self.name = name
+        self.events = events
+        self.barrier = barrier
+        self.error = error
+        self.driver: Any = None
+        self.closed = False
+
+    def init(self, conf: ConfigTree) -> None:
+        pass
+
+    def launch(self) -> None:
+        self.events.append('start {}'.format(self.name))
+        self.driver, _ = resource_pool.get_or_create(('neo4j', 'bolt://localhost:7687'), MagicMock)
+        Job.closer.register(self._close)
+        if self.barrier:
+            # Waits for the other job of the barrier, which only passes if they run concurrently
+            self.barrier.wait(timeout=5)
+        if self.error:
+            raise self.error
+        Job.closer.close()
+        self.events.append('finish {}'.format(self.name))
+
+    def _close(self) -> None:
+        self.closed = True
+
+
+class TestJobGraph(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.events: List[str] = []
+
+    def test_launch(self) -> None:
+        barrier = threading.Barrier(2)
+        extract1 = _RecordingJob('extract1', self.events, barrier)
+        extract2 = _RecordingJob('extract2', self.events, barrier)
+        search = _RecordingJob('search', self.events)
+        JobGraph() \
+            .add_job('search', search, depends_on=['extract1', 'extract2']) \
+            .add_job('extract1', extract1) \
+            .add_job('extract2', extract2) \
+            .launch()
+
+        self.assertEqual(sorted(self.events[:2]), ['start extract1', 'start extract2'])
+        self.assertEqual(self.events[-2:], ['start search', 'finish search'])
+        # A driver is shared by all jobs, and closed once they are finished
+        self.assertIs(extract1.driver, search.driver)
+        self.assertIs(extract2.driver, search.driver)
+        search.driver.close.assert_called_once()
+        # Each job closes what it registered to Job.closer
+        self.assertTrue(extract1.closed and extract2.closed and search.closed)
+
+    def test_launch_serially(self) -> None:
+        graph = JobGraph(max_concurrency=1)
+        for name in ['a', 'b', 'c']:
+            graph.add_job(name, _RecordingJob(name, self.events))
+        graph.launch()
+
+        self.assertEqual(len(self.events), 6)
+        for i in range(0, 6, 2):
+            self.assertEqual(self.events[i].split()[1], self.events[i + 1].split()[1])
+
+    def test_failed_job(self) -> None:
+        error = RuntimeError('extract failed')
+        graph = JobGraph() \
+            .add_job('extract', _RecordingJob('extract', self.events, error=error)) \
+            .add_job('other', _RecordingJob('other', self.events)) \
+            .add_job('search', _RecordingJob('search', self.events), depends_on=['extract'])
+
+        with self.assertRaises(RuntimeError) as context:
+            graph.launch()
+
+        self.assertIs(context.exception, error)
+        self.assertNotIn('start search', self.events)
+
+    def test_invalid_graph(self) -> None:
+        with self.assertRaises(ValueError):
+            JobGraph().add_job('a', _RecordingJob('a', self.events)).add_job('a', _RecordingJob('a', self.events))
+
+        with self.assertRaises(ValueError):
+            JobGraph().add_job('a', _RecordingJob('a', self.events), depends_on=['b']).launch()
+
+        with self.assertRaises(ValueError):
+            JobGraph() \
+                .add_job('a', _RecordingJob('a', self.events), depends_on=['b']) \
+                .add_job('b', _RecordingJob('b', self.events), depends_on=['a']) \
+                .launch()
+
+        self.assertEqual(self.events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
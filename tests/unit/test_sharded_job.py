@@ -0,0 +1,145 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any, Dict, List, Mapping
+
+from databuilder.extractor.base_extractor import Extractor
+from databuilder.job.sharded_job import ShardedJob
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.loader.generic_loader import GenericLoader
+from databuilder.models.table_metadata import TableMetadata
+from databuilder.publisher.base_publisher import Publisher
+from databuilder.task.task import DefaultTask
+from databuilder.utils import neo4j_csv_manifest, stage_metrics
+
+
+class _SchemaTableExtractor(Extractor):
+    """
+    Extracts TABLES_PER_SCHEMA tables of each schema in the config
+    """
+    TABLES_PER_SCHEMA = 3
+
+    def init(self, conf: ConfigTree) -> None:
+        schemas = conf.get_list('schemas')
+        if 'broken' in schemas:
+            raise RuntimeError('Failed to extract schema broken')
+        self._iter = iter([TableMetadata('hive', 'gold', schema, 'table_{}'.format(i), None)
+                           for schema in schemas for i in range(_SchemaTableExtractor.TABLES_PER_SCHEMA)])
+
+    def extract(self) -> Any:
+        return next(self._iter, None)
+
+    def get_scope(self) -> str:
+        return 'extractor.schema_table'
+
+
+def _create_task() -> DefaultTask:
+    return DefaultTask(extractor=_SchemaTableExtractor(), loader=FsNeo4jCSVLoader())
+
+
+def _create_generic_loader_task() -> DefaultTask:
+    return DefaultTask(extractor=_SchemaTableExtractor(), loader=GenericLoader())
+
+
+def _shard_by_schema(conf: ConfigTree) -> List[Mapping[str, Any]]:
+    schemas = conf.get_list('job.test.schemas')
+    return [{'extractor.schema_table.schemas': schemas[i:i + 2]} for i in range(0, len(schemas), 2)]
+
+
+class _TableCountPublisher(Publisher):
+    """
+    Counts Table rows in each partition from its manifest
+    """
+    def __init__(self) -> None:
+        super(_TableCountPublisher, self).__init__()
+        self.table_counts: Dict[str, int] = {}
+
+    def init(self, conf: ConfigTree) -> None:
+        self._node_dir = conf.get_string('node_files_directory')
+
+    def publish_impl(self) -> None:
+        for partition_dir in neo4j_csv_manifest.list_partition_dirs(self._node_dir):
+            manifest = neo4j_csv_manifest.read_manifest(partition_dir) or {}
+            self.table_counts[os.path.basename(partition_dir)] = \
+                sum(entry[neo4j_csv_manifest.ROW_COUNT] for entry in manifest.values()
+                    if entry[neo4j_csv_manifest.LABEL] == TableMetadata.TABLE_NODE_LABEL)
+
+    def get_scope(self) -> str:
+        return 'publisher.table_count'
+
+
+class TestShardedJob(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir_path = tempfile.mkdtemp()
+        self.node_dir = os.path.join(self.temp_dir_path, 'nodes')
+        self.relation_dir = os.path.join(self.temp_dir_path, 'relations')
+        self.conf = ConfigFactory.from_dict({
+            'job.num_processes': 2,
+            'job.test.schemas': ['a', 'b', 'c', 'd', 'e'],
+            'loader.filesystem_csv_neo4j.node_dir_path': self.node_dir,
+            'loader.filesystem_csv_neo4j.relationship_dir_path': self.relation_dir,
+            'publisher.table_count.node_files_directory': self.node_dir,
+        })
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir_path)
+
+    def test_launch(self) -> None:
+        publisher = _TableCountPublisher()
+        ShardedJob(conf=self.conf, task_factory=_create_task, shard_func=_shard_by_schema,
+                   publisher=publisher).launch()
+
+        # A partition per shard of two schemas, published once all shards are finished
+        self.assertEqual(publisher.table_counts, {'part-0000': 6, 'part-0001': 6, 'part-0002': 3})
+        self.assertEqual(neo4j_csv_manifest.list_partition_dirs(self.node_dir), [])
+        self.assertEqual(neo4j_csv_manifest.list_partition_dirs(self.relation_dir), [])
+
+        # Stages of all shards are in the metrics of the job
+        metrics = stage_metrics.get_job_metrics()
+        self.assertEqual(metrics.stage(stage_metrics.EXTRACT).records, 15)
+        self.assertEqual(metrics.stage(stage_metrics.LOAD).records, 15)
+        self.assertGreater(metrics.stage(stage_metrics.LOAD).bytes, 0)
+        self.assertEqual(metrics.stage(stage_metrics.PUBLISH).calls, 1)
+
+    def test_launch_failed_shard(self) -> None:
+        conf = ConfigFactory.from_dict({'job.test.schemas': ['a', 'b', 'broken']}).with_fallback(self.conf)
+        publisher = _TableCountPublisher()
+        job = ShardedJob(conf=conf, task_factory=_create_task, shard_func=_shard_by_schema, publisher=publisher)
+
+        with self.assertRaises(RuntimeError):
+            job.launch()
+
+        self.assertEqual(publisher.table_counts, {})
+        self.assertEqual(neo4j_csv_manifest.list_partition_dirs(self.node_dir), [])
+
+    def test_requires_partitioned_loader(self) -> None:
+        job = ShardedJob(conf=self.conf,
+                         task_factory=_create_generic_loader_task,
+                         shard_func=_shard_by_schema)
+
+        with self.assertRaises(ValueError):
+            job.launch()
+
+    def test_existing_partition(self) -> None:
+        # Left by a crashed run of more shards
+        stale_dir = neo4j_csv_manifest.get_partition_dir(self.node_dir, 5)
+        os.makedirs(stale_dir)
+        publisher = _TableCountPublisher()
+        job = ShardedJob(conf=self.conf, task_factory=_create_task, shard_func=_shard_by_schema, publisher=publisher)
+
+        with self.assertRaises(RuntimeError):
+            job.launch()
+
+        self.assertEqual(publisher.table_counts, {})
+        self.assertEqual(neo4j_csv_manifest.list_partition_dirs(self.node_dir), [stale_dir])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,10 @@
 import unittest
 
 from mock import MagicMock
-from pyhocon import ConfigFactory
+from pyhocon import ConfigFactory, ConfigTree
+from typing import Any
 
-from databuilder.transformer.base_transformer import ChainedTransformer
+from databuilder.transformer.base_transformer import ChainedTransformer, Transformer
 
 
 class TestChainedTransformer(unittest.TestCase):
@@ -53,3 +54,25 @@ class TestChainedTransformer(unittest.TestCase):
         mock_transformer1.transform.assert_called_once()
         mock_transformer2.init.assert_called_once()
         mock_transformer2.transform.assert_called_once()
+
+    def test_transform_batch(self) -> None:
+
+        class _AddTransformer(Transformer):
+            def __init__(self, value: int) -> None:
+                self.value = value
+
+            def init(self, conf: ConfigTree) -> None:
+                pass
+
+            def transform(self, record: Any) -> Any:
+                # Filters out odd records
+                return record + self.value if record % 2 == 0 else None
+
+            def get_scope(self) -> str:
+                return 'transformer.add'
+
+        chained_transformer = ChainedTransformer(transformers=[_AddTransformer(2), _AddTransformer(1)])
+        chained_transformer.init(conf=ConfigFactory.from_dict({}))
+
+        self.assertEqual(chained_transformer.transform_batch([0, 1, 2, 3, 4]), [3, 5, 7])
+        self.assertEqual(chained_transformer.transform_batch([1, 3]), [])
@@ -0,0 +1,92 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from databuilder.utils.buffered_csv_writer import BufferedCsvWriter
+
+
+class TestBufferedCsvWriter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp()
+        self._rows = [{'KEY': 'key{}'.format(i), 'name': 'name "{}"'.format(i), 'sort_order': i, 'LABEL': 'Column'}
+                      for i in range(5000)]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._dir)
+
+    def _write_with_dict_writer(self, path: str) -> None:
+        with open(path, 'w', encoding='utf8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self._rows[0].keys()), quoting=csv.QUOTE_NONNUMERIC)
+            writer.writeheader()
+            for row in self._rows:
+                writer.writerow(row)
+
+    def _write_with_buffered_writer(self, path: str, byte_budget: int) -> BufferedCsvWriter:
+        writer = BufferedCsvWriter(path, fieldnames=list(self._rows[0].keys()), byte_budget=byte_budget)
+        for row in self._rows:
+            writer.writerow(row)
+        writer.close()
+        return writer
+
+    def _read(self, path: str) -> str:
+        with open(path, 'r', encoding='utf8') as f:
+            return f.read()
+
+    def test_same_as_dict_writer(self) -> None:
+        expected_path = os.path.join(self._dir, 'expected.csv')
+        self._write_with_dict_writer(expected_path)
+
+        for byte_budget in (0, 100, 1024 * 1024):
+            path = os.path.join(self._dir, 'actual_{}.csv'.format(byte_budget))
+            writer = self._write_with_buffered_writer(path, byte_budget)
+            self.assertEqual(self._read(path), self._read(expected_path))
+            self.assertEqual(writer.rows, len(self._rows))
+
+    def test_buffer(self) -> None:
+        path = os.path.join(self._dir, 'test.csv')
+        writer = BufferedCsvWriter(path, fieldnames=['KEY'], byte_budget=1024 * 1024)
+        writer.writerow({'KEY': 'foo'})
+        # Buffered until flushed
+        self.assertNotIn('foo', self._read(path))
+        writer.close()
+        self.assertEqual(self._read(path), '"KEY"\n"foo"\n')
+
+    def test_writes_in_bulk(self) -> None:
+        path = os.path.join(self._dir, 'test.csv')
+        writer = BufferedCsvWriter(path, fieldnames=list(self._rows[0].keys()), byte_budget=1024 * 1024)
+        file_write = writer._file.write
+        with patch.object(writer._file, 'write', side_effect=file_write) as mock_write:
+            for row in self._rows:
+                writer.writerow(row)
+            writer.close()
+
+        # First 1000 rows, before average row size is known, and then the rest that fits in the byte budget
+        self.assertEqual(mock_write.call_count, 2)
+        self.assertEqual(writer.rows, len(self._rows))
+
+    def test_writerows_values(self) -> None:
+        expected_path = os.path.join(self._dir, 'expected.csv')
+        self._write_with_dict_writer(expected_path)
+        header = list(self._rows[0].keys())
+
+        for byte_budget in (0, 100, 1024 * 1024):
+            path = os.path.join(self._dir, 'actual_{}.csv'.format(byte_budget))
+            writer = BufferedCsvWriter(path, fieldnames=header, byte_budget=byte_budget)
+            values = [writer.get_values(row) for row in self._rows]
+            writer.writerows_values(values[:10])
+            writer.writerows_values(values[10:])
+            writer.close()
+            self.assertEqual(self._read(path), self._read(expected_path))
+            self.assertEqual(writer.rows, len(self._rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import unittest
+
+from mock import MagicMock
+
+from databuilder.utils.closer import ThreadLocalCloser
+
+
+class TestThreadLocalCloser(unittest.TestCase):
+
+    def test_close_per_thread(self) -> None:
+        closer = ThreadLocalCloser()
+        main_close, thread_close = MagicMock(), MagicMock()
+        closer.register(main_close)
+
+        def _run() -> None:
+            closer.register(thread_close)
+            closer.close()
+
+        thread = threading.Thread(target=_run)
+        thread.start()
+        thread.join()
+
+        thread_close.assert_called_once()
+        main_close.assert_not_called()
+
+        closer.close()
+        main_close.assert_called_once()
+
+    def test_bind(self) -> None:
+        closer = ThreadLocalCloser()
+        bound_close, thread_close = MagicMock(), MagicMock()
+        register = closer.bind(closer.register)
+
+        def _run() -> None:
+            register(bound_close)
+            # Registering on the thread itself is not affected
+            closer.register(thread_close)
+            closer.close()
+
+        thread = threading.Thread(target=_run)
+        thread.start()
+        thread.join()
+
+        # Registered by the bound function on the thread, but closed along with the thread that bound it
+        thread_close.assert_called_once()
+        bound_close.assert_not_called()
+        closer.close()
+        bound_close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import unittest
+
+from databuilder.utils.dedupe_cache import DedupeCache, get_dedupe_cache, reset_dedupe_cache
+
+
+class TestDedupeCache(unittest.TestCase):
+
+    def test_is_duplicate(self) -> None:
+        cache = DedupeCache()
+        self.assertFalse(cache.is_duplicate(('Tag', 'foo')))
+        self.assertTrue(cache.is_duplicate(('Tag', 'foo')))
+        self.assertFalse(cache.is_duplicate(('User', 'foo')))
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_eviction(self) -> None:
+        cache = DedupeCache(max_size=2)
+        cache.is_duplicate('a')
+        cache.is_duplicate('b')
+        # Seen again, so that b is the least recently seen
+        cache.is_duplicate('a')
+        cache.is_duplicate('c')
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertTrue(cache.is_duplicate('a'))
+        self.assertFalse(cache.is_duplicate('b'))
+
+    def test_reset(self) -> None:
+        get_dedupe_cache().is_duplicate('a')
+        cache = reset_dedupe_cache(max_size=10)
+
+        self.assertIs(cache, get_dedupe_cache())
+        self.assertFalse(get_dedupe_cache().is_duplicate('a'))
+        self.assertEqual(cache.hits, 0)
+
+    def test_cache_per_thread(self) -> None:
+        cache = reset_dedupe_cache()
+        caches = []
+        thread = threading.Thread(target=lambda: caches.append(get_dedupe_cache()))
+        thread.start()
+        thread.join()
+
+        # Jobs running concurrently on threads do not share a cache
+        self.assertIsNot(caches[0], cache)
+        self.assertIs(get_dedupe_cache(), cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
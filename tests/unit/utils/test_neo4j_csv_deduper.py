@@ -0,0 +1,64 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from databuilder.models.neo4j_csv_serde import NODE_LABEL, NODE_KEY, \
+    RELATION_START_LABEL, RELATION_END_LABEL, RELATION_START_KEY, RELATION_END_KEY, RELATION_TYPE, \
+    RELATION_REVERSE_TYPE
+from databuilder.utils.neo4j_csv_deduper import Neo4jCsvDeduper
+
+
+def _user(email: str) -> dict:
+    return {NODE_LABEL: 'User', NODE_KEY: email, 'email': email}
+
+
+def _read(email: str, table: str) -> dict:
+    return {RELATION_START_LABEL: 'Table', RELATION_END_LABEL: 'User', RELATION_START_KEY: table,
+            RELATION_END_KEY: email, RELATION_TYPE: 'READ_BY', RELATION_REVERSE_TYPE: 'READ'}
+
+
+class TestNeo4jCsvDeduper(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.spill_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spill_dir, True)
+
+    def test_dedupe(self) -> None:
+        deduper = Neo4jCsvDeduper(max_keys_in_memory=100)
+
+        self.assertFalse(deduper.is_duplicate_node(_user('foo')))
+        self.assertTrue(deduper.is_duplicate_node(_user('foo')))
+        self.assertFalse(deduper.is_duplicate_node({NODE_LABEL: 'Tag', NODE_KEY: 'foo'}))
+
+        self.assertFalse(deduper.is_duplicate_relation(_read('foo', 'table1')))
+        self.assertTrue(deduper.is_duplicate_relation(_read('foo', 'table1')))
+        self.assertFalse(deduper.is_duplicate_relation(_read('foo', 'table2')))
+
+        self.assertEqual(deduper.get_report(), {'suppressed_nodes': {'User': 1},
+                                                'suppressed_relations': {'READ_BY': 1},
+                                                'spilled_keys': 0})
+        deduper.close()
+
+    def test_spill(self) -> None:
+        deduper = Neo4jCsvDeduper(max_keys_in_memory=2, spill_dir=self.spill_dir)
+
+        emails = ['user{}'.format(i) for i in range(5)]
+        self.assertEqual([deduper.is_duplicate_node(_user(email)) for email in emails], [False] * 5)
+        # Keys on disk and in memory are both found
+        self.assertEqual([deduper.is_duplicate_node(_user(email)) for email in emails], [True] * 5)
+
+        report = deduper.get_report()
+        self.assertEqual(report['suppressed_nodes'], {'User': 5})
+        self.assertEqual(report['spilled_keys'], 3)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+
+        deduper.close()
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
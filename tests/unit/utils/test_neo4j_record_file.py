@@ -0,0 +1,66 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from typing import List, Tuple
+
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from databuilder.utils import neo4j_record_file
+from databuilder.utils.neo4j_record_file import BufferedRecordFileWriter
+
+
+class TestNeo4jRecordFile(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._dir)
+
+    def _write(self, file_name: str, rows: List[Tuple], byte_budget: int = 1024 * 1024) -> str:
+        path = os.path.join(self._dir, file_name)
+        writer = BufferedRecordFileWriter(path, ('KEY', 'name', 'sort_order:UNQUOTED'), byte_budget=byte_budget)
+        for row in rows:
+            writer.writerow_values(row)
+        writer.close()
+        return path
+
+    def test_read_rows(self) -> None:
+        rows = [('key1', "it's a\n\"name\"", 1), ('key2', None, 1.5), ('key3', '', True)]
+        for file_name, byte_budget in [('foo.rec', 1024 * 1024), ('foo.rec.gz', 1024 * 1024), ('bar.rec', 0)]:
+            path = self._write(file_name, rows, byte_budget)
+            self.assertTrue(neo4j_record_file.is_record_file(path))
+
+            with neo4j_record_file.read_rows(path) as (header, actual):
+                self.assertEqual(header, ['KEY', 'name', 'sort_order:UNQUOTED'])
+                # Values keep their type
+                self.assertEqual(list(actual), rows)
+
+        self.assertFalse(neo4j_record_file.is_record_file('foo.csv.gz'))
+
+    def test_non_primitive_value(self) -> None:
+        path = self._write('foo.rec', [('key1', datetime.date(2020, 1, 2), 1)])
+        with neo4j_record_file.read_rows(path) as (_, rows):
+            self.assertEqual(list(rows), [('key1', '2020-01-02', 1)])
+
+    def test_not_record_file(self) -> None:
+        path = os.path.join(self._dir, 'foo.rec')
+        with open(path, 'w') as f:
+            f.write('"KEY","name"\n')
+        with self.assertRaises(Exception):
+            with neo4j_record_file.read_rows(path):
+                pass
+
+    def test_publisher_records(self) -> None:
+        path = self._write('foo.rec', [('key1', None, 1), ('key2', 2, None)])
+        with Neo4jCsvPublisher()._read_records(path) as records:
+            # Same as CSV, except unquoted values that keep their type
+            self.assertEqual(list(records), [{'KEY': 'key1', 'name': '', 'sort_order:UNQUOTED': 1},
+                                             {'KEY': 'key2', 'name': '2', 'sort_order:UNQUOTED': None}])
+
+
+if __name__ == '__main__':
+    unittest.main()
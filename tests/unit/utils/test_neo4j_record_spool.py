@@ -0,0 +1,78 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import io
+import os
+import unittest
+
+from databuilder.utils import neo4j_csv_manifest
+from databuilder.utils.neo4j_record_spool import Neo4jRecordSpool
+
+
+class TestNeo4jRecordSpool(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._nodes = [{'KEY': 'key{}'.format(i), 'LABEL': 'Column', 'name': 'name "{}"'.format(i),
+                        'sort_order:UNQUOTED': i, 'description': None if i % 2 else 'line1\nline2'}
+                       for i in range(100)]
+
+    def _csv_round_trip(self) -> list:
+        csv_file = io.StringIO()
+        writer = csv.DictWriter(csv_file, fieldnames=list(self._nodes[0].keys()), quoting=csv.QUOTE_NONNUMERIC)
+        writer.writeheader()
+        writer.writerows(self._nodes)
+        csv_file.seek(0)
+        return [dict(r) for r in csv.DictReader(csv_file)]
+
+    def test_read_in_memory(self) -> None:
+        spool = Neo4jRecordSpool(spill_threshold_bytes=1024 * 1024)
+        for node in self._nodes:
+            spool.add_node(node)
+
+        self.assertEqual(spool.get_node_groups(), ['nodes/Column_5'])
+        self.assertEqual(spool.spilled_rows, 0)
+        # Same as written into and read from CSV file
+        self.assertEqual(list(spool.read('nodes/Column_5')), self._csv_round_trip())
+        spool.close()
+
+    def test_spill(self) -> None:
+        spool = Neo4jRecordSpool(spill_threshold_bytes=500)
+        for node in self._nodes:
+            spool.add_node(node)
+        spool.add_relation({'START_KEY': 'key0', 'START_LABEL': 'Column', 'END_KEY': 'key1', 'END_LABEL': 'Column',
+                            'TYPE': 'NEXT', 'REVERSE_TYPE': 'PREVIOUS'})
+
+        self.assertGreater(spool.spilled_rows, 0)
+        spill_dir = spool._spill_dir
+        self.assertTrue(spill_dir and os.path.isdir(spill_dir))
+
+        # Spilled rows are followed by rows in memory, in the order they were added
+        self.assertEqual(list(spool.read('nodes/Column_5')), self._csv_round_trip())
+        self.assertEqual(spool.get_relation_groups(), ['relations/Column_Column_NEXT_6'])
+        manifest = spool.get_manifest()
+        self.assertEqual(manifest['nodes/Column_5'][neo4j_csv_manifest.ROW_COUNT], 100)
+        self.assertEqual(manifest['relations/Column_Column_NEXT_6'][neo4j_csv_manifest.TYPE], 'NEXT')
+
+        spool.close()
+        self.assertFalse(os.path.exists(spill_dir))  # type: ignore
+
+    def test_relation_groups_of_different_headers(self) -> None:
+        spool = Neo4jRecordSpool(spill_threshold_bytes=1024 * 1024)
+        relation = {'START_KEY': 'table', 'START_LABEL': 'Table', 'END_KEY': 'column', 'END_LABEL': 'Column',
+                    'TYPE': 'COLUMN', 'REVERSE_TYPE': 'COLUMN_OF'}
+        relation_with_badge = dict(relation, badge='pii')
+        spool.add_relation(relation)
+        spool.add_relation(relation_with_badge)
+
+        # A group per header, even of the same relation type
+        self.assertEqual(spool.get_relation_groups(), ['relations/Table_Column_COLUMN_6',
+                                                       'relations/Table_Column_COLUMN_7'])
+        self.assertEqual(list(spool.read('relations/Table_Column_COLUMN_6')), [relation])
+        self.assertEqual(list(spool.read('relations/Table_Column_COLUMN_7')), [relation_with_badge])
+        self.assertEqual(len(spool.get_manifest()), 2)
+        spool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
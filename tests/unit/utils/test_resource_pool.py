@@ -0,0 +1,49 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from mock import MagicMock
+
+from databuilder.utils import resource_pool
+
+
+class TestResourcePool(unittest.TestCase):
+
+    def test_not_shared(self) -> None:
+        first, is_shared = resource_pool.get_or_create('neo4j', MagicMock)
+        second, _ = resource_pool.get_or_create('neo4j', MagicMock)
+
+        self.assertFalse(is_shared)
+        self.assertIsNot(first, second)
+
+    def test_shared(self) -> None:
+        with resource_pool.shared_resources() as pool:
+            first, is_shared = resource_pool.get_or_create('neo4j', MagicMock)
+            second, _ = resource_pool.get_or_create('neo4j', MagicMock)
+            other, _ = resource_pool.get_or_create('es', MagicMock)
+
+            self.assertTrue(is_shared)
+            self.assertIs(first, second)
+            self.assertIsNot(first, other)
+            self.assertEqual(len(pool), 2)
+            first.close.assert_not_called()
+
+        first.close.assert_called_once()
+        other.close.assert_called_once()
+        self.assertFalse(resource_pool.get_or_create('neo4j', MagicMock)[1])
+
+    def test_nested(self) -> None:
+        with resource_pool.shared_resources() as outer:
+            with resource_pool.shared_resources() as inner:
+                resource, _ = resource_pool.get_or_create('neo4j', MagicMock)
+
+            # Closed by the outer context
+            self.assertIs(inner, outer)
+            resource.close.assert_not_called()
+
+        resource.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# Copyright Contributors to the Amundsen project.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import unittest
+
+from mock import MagicMock
+
+from databuilder.utils.stage_metrics import JobMetrics, StageMetrics, get_job_metrics, reset_job_metrics
+
+
+class TestStageMetrics(unittest.TestCase):
+
+    def test_call(self) -> None:
+        stage = StageMetrics()
+
+        self.assertEqual(stage.call(lambda a, b: a + b, 1, 2), 3)
+        with self.assertRaises(ZeroDivisionError):
+            stage.call(lambda: 1 / 0)
+
+        # Failed calls are timed too
+        self.assertEqual(stage.calls, 2)
+        self.assertGreater(stage.total_sec, 0)
+        self.assertGreaterEqual(stage.total_sec, stage.max_sec)
+
+    def test_percentile(self) -> None:
+        stage = StageMetrics(max_samples=1000)
+        for i in range(1, 1001):
+            stage.add_call(i / 1000)
+
+        self.assertAlmostEqual(stage.percentile(50), 0.501)
+        self.assertAlmostEqual(stage.percentile(99), 0.991)
+        self.assertAlmostEqual(stage.percentile(100), 1.0)
+        self.assertEqual(StageMetrics().percentile(50), 0.0)
+
+    def test_bounded_samples(self) -> None:
+        stage = StageMetrics(max_samples=100)
+        for i in range(10000):
+            stage.add_call(i % 100 / 100)
+
+        self.assertEqual(stage.calls, 10000)
+        self.assertEqual(len(stage._samples), 100)
+        self.assertAlmostEqual(stage.total_sec, 4950)
+        self.assertAlmostEqual(stage.max_sec, 0.99)
+
+    def test_to_dict(self) -> None:
+        stage = StageMetrics()
+        stage.add_call(2.0)
+        stage.add_records(10)
+        stage.add_bytes(100)
+
+        self.assertEqual(stage.to_dict(), {'calls': 1, 'records': 10, 'bytes': 100, 'total_sec': 2.0, 'max_sec': 2.0,
+                                           'records_per_sec': 5.0, 'p50_sec': 2.0, 'p95_sec': 2.0, 'p99_sec': 2.0})
+
+    def test_merge(self) -> None:
+        stage, other = StageMetrics(max_samples=100), StageMetrics(max_samples=100)
+        for i in range(300):
+            stage.add_call(0.1)
+        for i in range(100):
+            other.add_call(0.5)
+        stage.add_records(30)
+        other.add_records(10)
+        other.add_bytes(100)
+        stage.merge(other)
+
+        self.assertEqual((stage.calls, stage.records, stage.bytes), (400, 40, 100))
+        self.assertAlmostEqual(stage.total_sec, 80)
+        self.assertAlmostEqual(stage.max_sec, 0.5)
+        # Sample is bounded, and drawn in proportion to calls
+        self.assertEqual(len(stage._samples), 100)
+        self.assertEqual(stage._samples.count(0.5), 25)
+        self.assertAlmostEqual(stage.percentile(50), 0.1)
+        self.assertAlmostEqual(stage.percentile(95), 0.5)
+
+
+class TestJobMetrics(unittest.TestCase):
+
+    def test_send_statsd(self) -> None:
+        metrics = JobMetrics()
+        metrics.stage('extract').add_call(0.5)
+        metrics.stage('extract').add_records(3)
+        statsd = MagicMock()
+        metrics.send_statsd(statsd)
+
+        statsd.timing.assert_any_call('extract.total', 500.0)
+        statsd.timing.assert_any_call('extract.p95', 500.0)
+        statsd.gauge.assert_any_call('extract.records', 3)
+        statsd.gauge.assert_any_call('extract.bytes', 0)
+
+    def test_merge(self) -> None:
+        metrics, shard_metrics = JobMetrics(), JobMetrics()
+        metrics.stage('publish').add_call(1.0)
+        shard_metrics.stage('extract').add_records(3)
+        metrics.merge(shard_metrics.get_stages())
+        metrics.merge(shard_metrics.get_stages())
+
+        self.assertEqual(sorted(metrics.to_dict()['stages']), ['extract', 'publish'])
+        self.assertEqual(metrics.stage('extract').records, 6)
+
+    def test_metrics_per_thread(self) -> None:
+        metrics = reset_job_metrics()
+        thread_metrics = []
+        thread = threading.Thread(target=lambda: thread_metrics.append(get_job_metrics()))
+        thread.start()
+        thread.join()
+
+        self.assertIs(get_job_metrics(), metrics)
+        self.assertIsNot(thread_metrics[0], metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()